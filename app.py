@@ -25,15 +25,31 @@ import plotly.express as px
 from plotly.subplots import make_subplots
 import matplotlib.pyplot as plt
 import seaborn as sns
-from src.embeddings.modelos_nlp_db import search
+from src.embeddings.modelos_nlp_db import search, obtener_modelo, MODEL_NAME, DIMENSION_PCA, CANDIDATOS_SEARCH, CATALOGOS_FINGERPRINT
+from src.embeddings.snapshot_modelo import modo_offline, activar_modo_offline
+from src.utils.instrumentacion import (
+    logger,
+    instrumentar,
+    medir_etapa,
+    configurar_logging,
+    iniciar_servidor_metricas
+)
+from src.utils.almacen_sesiones import AlmacenResultados
+from src.utils.historial_resultados import HistorialResultados
+from src.utils.precalculo import Precalculador
 
 # Importar funciones de visualización
 import sys
 # sys.path.insert(0, '/home/claude')
+from src.visualization.render_estatico import RENDER_ESTATICO
+from src.visualization.imagenes import IMAGENES, FORMATO_IMAGEN, codificar_figura
+from src.visualization.agregados import obtener_agregados
+from src.visualization.plotlyjs import figura_html
+from src.utils.estaticos import rutas_estaticas
+from src.utils.logos import url_logo, ruta_logo_ods, html_logo_ods, css_logos, NUMEROS_ODS
 from src.visualization.visualizaciones_ods import (
     cargar_datos,
     viz_1_distribucion_por_ods,
-    viz_2_heatmap_ods_ranking,
     viz_3_scatter_3d_interactivo,
     viz_4_radar_chart_ods,
     viz_5_sunburst_jerarquia,
@@ -41,7 +57,6 @@ from src.visualization.visualizaciones_ods import (
     viz_7_streamgraph_similaridad,
     viz_8_violin_plot_ods,
     viz_9_dashboard_metricas,
-    viz_10_matriz_transicion,
     analisis_estadistico
 )
 
@@ -49,42 +64,21 @@ from src.visualization.visualizaciones_ods import (
 # CONFIGURACIÓN GLOBAL
 # ============================================================================
 import os
-import base64
+import sqlite3
+import time
+from concurrent.futures import CancelledError
+from functools import partial, wraps
 
 levels = ['ODS_ID','META_ID','INDICADOR_ID']
 
-
-def convertir_logo_a_base64(logo_path):
-    """Convierte un logo a base64 para incrustar en HTML"""
-    # try:
-    #     rutas_posibles = [
-    #         logo_path,
-    #         os.path.join(os.path.dirname(__file__), logo_path),
-    #         os.path.join('/mnt/user-data/outputs', logo_path),
-    #     ]
-        
-    #     for ruta in rutas_posibles:
-    #         if os.path.exists(ruta):
-    #             with open(ruta, "rb") as image_file:
-    #                 encoded = base64.b64encode(image_file.read()).decode()
-    #                 return f"data:image/png;base64,{encoded}"
-        
-    #     print(f"⚠️  Logo no encontrado: {logo_path}")
-    #     return ""
-    # except Exception as e:
-    #     print(f"⚠️  Error al cargar logo: {e}")
-    #     return ""
-    ruta = Path('config/institucional/logos')
-    with open(Path(f'{ruta}/{logo_path}'), "rb") as image_file:
-      encoded = base64.b64encode(image_file.read()).decode()
-      return f"data:image/png;base64,{encoded}"
+# Parámetros de las visualizaciones por nivel: (id_lvl, score, rank, titulo)
+NIVEL_ODS = ('ODS_ID', 'ods_similaridad_cos_normalized', 'ods_rank', 'ODS')
 
 
-
-# Cargar logos una sola vez al iniciar
+# Logos servidos como archivos estáticos (URL versionada, cache del navegador)
 print("Cargando logos institucionales...")
-LOGO_GOBIERNO = convertir_logo_a_base64("/institucional/GOBIERNO-DE-COLOMBIA_HORIZONTAL.webp")
-LOGO_FONDO = convertir_logo_a_base64("/institucional/LOGO MPTF (ESP).webp")
+LOGO_GOBIERNO = url_logo("institucional/GOBIERNO-DE-COLOMBIA_HORIZONTAL.webp")
+LOGO_FONDO = url_logo("institucional/LOGO MPTF (ESP).webp")
 
 
 if LOGO_GOBIERNO and LOGO_FONDO:
@@ -93,25 +87,9 @@ else:
     print("⚠️  Algunos logos no se pudieron cargar")
 
 dict_logos = {
-  'gobierno': convertir_logo_a_base64("/institucional/GOBIERNO-DE-COLOMBIA_HORIZONTAL.webp"),
-  'fondo_un': convertir_logo_a_base64("/institucional/LOGO MPTF (ESP).webp"),
-  'ods_1': convertir_logo_a_base64("/ods/S-WEB-Goal-01.webp"),
-  'ods_2': convertir_logo_a_base64("/ods/S-WEB-Goal-02.webp"),
-  'ods_3': convertir_logo_a_base64("/ods/S-WEB-Goal-03.webp"),
-  'ods_4': convertir_logo_a_base64("/ods/S-WEB-Goal-04.webp"),
-  'ods_5': convertir_logo_a_base64("/ods/S-WEB-Goal-05.webp"),
-  'ods_6': convertir_logo_a_base64("/ods/S-WEB-Goal-06.webp"),
-  'ods_7': convertir_logo_a_base64("/ods/S-WEB-Goal-07.webp"),
-  'ods_8': convertir_logo_a_base64("/ods/S-WEB-Goal-08.webp"),
-  'ods_9': convertir_logo_a_base64("/ods/S-WEB-Goal-09.webp"),
-  'ods_10': convertir_logo_a_base64("/ods/S-WEB-Goal-10.webp"),
-  'ods_11': convertir_logo_a_base64("/ods/S-WEB-Goal-11.webp"),
-  'ods_12': convertir_logo_a_base64("/ods/S-WEB-Goal-12.webp"),
-  'ods_13': convertir_logo_a_base64("/ods/S-WEB-Goal-13.webp"),
-  'ods_14': convertir_logo_a_base64("/ods/S-WEB-Goal-14.webp"),
-  'ods_15': convertir_logo_a_base64("/ods/S-WEB-Goal-15.webp"),
-  'ods_16': convertir_logo_a_base64("/ods/S-WEB-Goal-16.webp"),
-  'ods_17': convertir_logo_a_base64("/ods/S-WEB-Goal-17.webp"),  
+  'gobierno': LOGO_GOBIERNO,
+  'fondo_un': LOGO_FONDO,
+  **{f'ods_{n}': url_logo(ruta_logo_ods(n)) for n in NUMEROS_ODS},
 }
 
 # Ruta al archivo de datos
@@ -218,28 +196,202 @@ h1, h2, h3 {
 # ============================================================================
 
 def plotly_to_html(fig):
-    """Convierte figura Plotly a HTML para mostrar en Gradio"""
-    return fig.to_html(include_plotlyjs='cdn', full_html=False)
+    """Convierte figura Plotly a HTML para mostrar en Gradio (plotly.js servido localmente)"""
+    return figura_html(fig)
+
+def imagen_to_file(contenido, filename):
+    """Publica bytes de imagen ya codificados con nombre por contenido (sin pisar a otras sesiones)"""
+    return IMAGENES.publicar(contenido, FORMATO_IMAGEN, Path(filename).stem)
 
 def matplotlib_to_file(fig, filename):
-    """Convierte figura Matplotlib a archivo temporal"""
-    import tempfile
-    import os
-    
-    # Crear directorio temporal si no existe
-    temp_dir = tempfile.gettempdir()
-    filepath = os.path.join(temp_dir, filename)
-    
-    # Guardar la figura
-    fig.savefig(filepath, format='png', dpi=150, bbox_inches='tight')
+    """Codifica figura Matplotlib en memoria y la publica con nombre por contenido"""
+    contenido = codificar_figura(fig, FORMATO_IMAGEN)
     plt.close(fig)
-    
-    return filepath
+    return imagen_to_file(contenido, filename)
+
+# ============================================================================
+# CONSULTA Y PAGINACIÓN DE RESULTADOS
+# ============================================================================
+
+def _lista_por_tabla(variable, tipo):
+    """
+    Lista de 9 valores (uno por tabla de `search`) desde una variable de
+    entorno separada por comas; una posición vacía es None (todas las filas /
+    sin umbral) y la variable vacía o ausente, None
+    """
+    valor = os.environ.get(variable, '').strip()
+    if not valor:
+        return None
+    partes = [parte.strip() for parte in valor.split(',')]
+    if len(partes) != 9:
+        raise ValueError(f'{variable} debe tener 9 valores separados por comas (tiene {len(partes)})')
+    return [tipo(parte) if parte else None for parte in partes]
+
+
+# Top-K y similaridad mínima por tabla para la consulta, p. ej.
+# VOCES_ODS_TOPS_K="5,10,10,1,1,1,1,1,1" y VOCES_ODS_UMBRALES=",,0.5,,,,,,"
+# (sin definir = valores de TOPS_K_SEARCH / UMBRALES_SEARCH en modelos_nlp_db)
+TOPS_K_CONSULTA = _lista_por_tabla('VOCES_ODS_TOPS_K', int)
+UMBRALES_CONSULTA = _lista_por_tabla('VOCES_ODS_UMBRALES', float)
+
+# Filas por página que se envían al navegador en cada tabla de resultados
+PAGINA_FILAS = int(os.environ.get('VOCES_ODS_PAGINA_FILAS', '20'))
+
+# Posición (en la salida de search, sin la consulta) de las tablas con
+# controles de paginación: ODS, METAS, INDICADORES y BDL_ODS
+TABLAS_PAGINADAS = [0, 1, 2, 9]
+
+
+# Tablas completas de cada consulta, guardadas en el servidor; el navegador
+# solo conserva su handle (gr.State)
+ALMACEN_RESULTADOS = AlmacenResultados(
+    ttl_segundos=int(os.environ.get('VOCES_ODS_RESULTADOS_TTL', '1800')),
+    max_bytes=int(os.environ.get('VOCES_ODS_RESULTADOS_MAX_MB', '512')) * 2**20,
+)
+
+# Historial persistente (SQLite) de todas las clasificaciones: una consulta
+# repetida se lee de aquí en lugar de recalcularse (ruta vacía lo desactiva).
+# El archivo se crea con la primera consulta, no al importar el módulo
+RUTA_HISTORIAL = os.environ.get('VOCES_ODS_HISTORIAL', 'data/historial/resultados.sqlite3')
+HISTORIAL = HistorialResultados(RUTA_HISTORIAL, modelo=MODEL_NAME) if RUTA_HISTORIAL else None
+
+
+# Precálculo opcional de todas las pestañas tras cada consulta
+# (VOCES_ODS_PRECALCULO_WORKERS = hilos del pool; 0 lo desactiva)
+PRECALCULO_WORKERS = int(os.environ.get('VOCES_ODS_PRECALCULO_WORKERS', '0'))
+PRECALCULO = Precalculador(max_workers=PRECALCULO_WORKERS or 1)
+
+# Manejadores registrados por `desde_sesion`: nombre -> (función original, posiciones)
+MANEJADORES_SESION = {}
+
+
+def desde_sesion(*posiciones):
+    """
+    Decorador para manejadores de pestañas: reciben el handle de la consulta
+    y la función decorada recibe las tablas en `posiciones` (orden de salida
+    de search, sin la consulta). La función original queda en `__wrapped__`.
+
+    Si la pestaña se precalculó para la consulta vigente, devuelve ese
+    resultado (esperando a que termine si aún está en curso).
+    """
+    def decorador(funcion):
+        MANEJADORES_SESION[funcion.__name__] = (funcion, posiciones)
+
+        @wraps(funcion)
+        def envoltura(handle):
+            futuro = PRECALCULO.obtener(handle, funcion.__name__)
+            if futuro is not None:
+                try:
+                    with medir_etapa('espera_precalculo'):
+                        return futuro.result()
+                except CancelledError:
+                    pass
+                except Exception as e:
+                    logger.warning('precalculo fallido, se calcula de nuevo',
+                                   extra={'campos': {'manejador': funcion.__name__, 'error': repr(e)}})
+            tablas = ALMACEN_RESULTADOS.obtener(handle)
+            if tablas is None:
+                raise gr.Error("No hay resultados para esta sesión o expiraron. Ejecuta de nuevo la consulta.")
+            # Sin copias: las visualizaciones no modifican el DataFrame que reciben,
+            # así que las pestañas de una sesión comparten las tablas del almacén
+            return funcion(*[tablas[pos] for pos in posiciones])
+        return envoltura
+    return decorador
+
+
+def precalcular(handle, tablas):
+    """Programa en el pool el render de todas las pestañas para la consulta del handle."""
+    tareas = {
+        nombre: partial(funcion, *[tablas[pos] for pos in posiciones])
+        for nombre, (funcion, posiciones) in MANEJADORES_SESION.items()
+    }
+    return PRECALCULO.programar(handle, tareas)
+
+
+def liberar_sesion(handle):
+    """Libera tablas y precálculos de una sesión cerrada."""
+    PRECALCULO.cancelar(handle)
+    ALMACEN_RESULTADOS.eliminar(handle)
+
+
+def paginar(df, pagina, filas=PAGINA_FILAS):
+    """Devuelve (filas de la página, página ajustada al rango, texto de estado)"""
+    total = len(df)
+    n_paginas = max(1, -(-total // filas))
+    pagina = min(max(int(pagina), 1), n_paginas)
+    inicio = (pagina - 1) * filas
+    return df.iloc[inicio:inicio + filas], pagina, f"Página {pagina} de {n_paginas} · {total} filas"
+
+
+def _parametros_consulta():
+    # Dimensión reducida, dos etapas y catálogos (un Excel editado cambia su
+    # fingerprint) cambian los resultados: entran en la huella
+    return {'tops_k': TOPS_K_CONSULTA, 'umbrales': UMBRALES_CONSULTA,
+            'dimension_pca': DIMENSION_PCA, 'candidatos': CANDIDATOS_SEARCH,
+            'catalogos': CATALOGOS_FINGERPRINT}
+
+
+def consultar_historial(query):
+    """Tablas de una clasificación ya guardada en HISTORIAL, o None"""
+    if HISTORIAL is None:
+        return None
+    try:
+        with medir_etapa('historial_lectura'):
+            return HISTORIAL.obtener(query, _parametros_consulta())
+    except sqlite3.Error as e:
+        logger.warning('historial no disponible', extra={'campos': {'error': repr(e)}})
+        return None
+
+
+def guardar_historial(query, tablas):
+    """Persiste el resultado en HISTORIAL; un fallo del historial no interrumpe la consulta"""
+    if HISTORIAL is None:
+        return
+    try:
+        with medir_etapa('historial_escritura'):
+            HISTORIAL.guardar(query, tablas, _parametros_consulta())
+    except sqlite3.Error as e:
+        logger.warning('no se pudo guardar en el historial', extra={'campos': {'error': repr(e)}})
+
+
+def consultar(query, handle=None):
+    """
+    Ejecuta `search` y guarda las tablas completas en ALMACEN_RESULTADOS bajo
+    el handle de la sesión (se reutiliza si ya existe); al navegador solo
+    viajan el handle y la primera página de cada tabla.
+    """
+    tablas = consultar_historial(query)
+    if tablas is None:
+        resultado = search(query, tops_k=TOPS_K_CONSULTA, umbrales=UMBRALES_CONSULTA)
+        tablas = list(resultado[1:])
+        guardar_historial(query, tablas)
+    handle = ALMACEN_RESULTADOS.guardar(tablas, handle)
+    if PRECALCULO_WORKERS:
+        # Cancela lo pendiente de la consulta anterior de esta sesión
+        precalcular(handle, tablas)
+    else:
+        PRECALCULO.cancelar(handle)
+    with medir_etapa('paginacion'):
+        paginas = [paginar(df, 1) for df in tablas]
+    estados = [paginas[pos][2] for pos in TABLAS_PAGINADAS]
+    return (query, *[p[0] for p in paginas], handle,
+            *[1] * len(TABLAS_PAGINADAS), *estados)
+
+
+def cambiar_pagina(posicion, delta, handle, pagina):
+    """Mueve la tabla `posicion` `delta` páginas usando las tablas guardadas en el servidor"""
+    tablas = ALMACEN_RESULTADOS.obtener(handle)
+    if not tablas:
+        return pd.DataFrame(), 1, ""
+    return paginar(tablas[posicion], pagina + delta)
+
 
 # ============================================================================
 # FUNCIONES PARA CADA PESTAÑA
 # ============================================================================
 
+@instrumentar('tab_inicio')
+@desde_sesion(0, 1, 2)
 def tab_inicio(df_ods, df_metas, df_indicador):
 # def tab_inicio():
     """Pestaña de inicio con resumen general"""
@@ -258,7 +410,6 @@ def tab_inicio(df_ods, df_metas, df_indicador):
     
     # Top 4 ODS
     top_ods = df_ods.nsmallest(4, 'ods_rank')[['ODS_ID','ods_rank','OBJETIVO','ods_similaridad_cos_normalized']]
-    top_ods['logo_id'] = top_ods['ODS_ID'].apply(lambda _: f"ods_{_}") 
     # top_ods = df_ods.groupby('ODS_ID').agg({
     #     'ods_similaridad_cos_normalized': 'mean'
     # }).sort_values('ods_similaridad_cos_normalized', ascending=False).head(3)[['ods_similaridad_cos_normalized']]
@@ -273,7 +424,6 @@ def tab_inicio(df_ods, df_metas, df_indicador):
       top_metas_lcl = df_metas[df_metas.ODS_ID == i]
       top_metas_lcl = top_metas_lcl.nsmallest(2, 'meta_rank')[['META_ID','meta_rank','META','meta_similaridad_cos_normalized', 'ODS_ID']]
       top_metas = pd.concat([top_metas, top_metas_lcl], axis=0)
-    top_metas['logo_id'] = top_metas['ODS_ID'].apply(lambda _: f"ods_{_}")
     # top_metas = df_metas.groupby('META_ID').agg({
     #     'meta_similaridad_cos_normalized': 'mean'
     # }).sort_values('meta_similaridad_cos_normalized', ascending=False).head(5)[['META_ID','META','meta_similaridad_cos_normalized']]
@@ -284,7 +434,6 @@ def tab_inicio(df_ods, df_metas, df_indicador):
       top_indicador_lcl = df_indicador[df_indicador.ODS_ID == i]
       top_indicador_lcl = top_indicador_lcl.nsmallest(2, 'indicador_rank')[['INDICADOR_ID', 'indicador_rank', 'INDICADOR', 'indicador_similaridad_cos_normalized', 'ODS_ID']]
       top_indicador = pd.concat([top_indicador, top_indicador_lcl], axis=0)
-    top_indicador['logo_id'] = top_indicador['ODS_ID'].apply(lambda _: f"ods_{_}")
     
     
     html = f"""
@@ -342,9 +491,7 @@ def tab_inicio(df_ods, df_metas, df_indicador):
                 <tbody>
                     {''.join([f'''<tr>
                         <td style="padding: 10px; border-bottom: 1px solid #ddd;">{row['ods_rank']}</td>
-                        <td style="padding: 10px; border-bottom: 1px solid #ddd;"><img src="{dict_logos[row['logo_id']]}" 
-                                                                                    alt="ODS {row['ODS_ID']}" 
-                                                                                    class="logo-ods-tbl"></td>
+                        <td style="padding: 10px; border-bottom: 1px solid #ddd;">{html_logo_ods(row['ODS_ID'], f"ODS {row['ODS_ID']}")}</td>
                         <td style="padding: 10px; border-bottom: 1px solid #ddd;"><strong>{row['ODS_ID']}</strong></td>
                         <td style="padding: 10px; border-bottom: 1px solid #ddd; text-align: center;">{row['OBJETIVO']}</td>
                         <td style="padding: 10px; border-bottom: 1px solid #ddd; text-align: right;">{row['ods_similaridad_cos_normalized']:.4f}</td>
@@ -369,9 +516,7 @@ def tab_inicio(df_ods, df_metas, df_indicador):
                 <tbody>
                     {''.join([f'''<tr>
                         <td style="padding: 10px; border-bottom: 1px solid #ddd;">{row['meta_rank']}</td>
-                        <td style="padding: 10px; border-bottom: 1px solid #ddd;"><img src="{dict_logos[row['logo_id']]}" 
-                                                                                    alt="ODS {row['ODS_ID']}" 
-                                                                                    class="logo-ods-tbl"></td>
+                        <td style="padding: 10px; border-bottom: 1px solid #ddd;">{html_logo_ods(row['ODS_ID'], f"ODS {row['ODS_ID']}")}</td>
                         <td style="padding: 10px; border-bottom: 1px solid #ddd;"><strong>{row['META_ID']}</strong></td>
                         <td style="padding: 10px; border-bottom: 1px solid #ddd; text-align: center;">{row['META']}</td>
                         <td style="padding: 10px; border-bottom: 1px solid #ddd; text-align: right;">{row['meta_similaridad_cos_normalized']:.4f}</td>
@@ -396,9 +541,7 @@ def tab_inicio(df_ods, df_metas, df_indicador):
                 <tbody>
                     {''.join([f'''<tr>
                         <td style="padding: 10px; border-bottom: 1px solid #ddd;">{row['indicador_rank']}</td>
-                        <td style="padding: 10px; border-bottom: 1px solid #ddd;"><img src="{dict_logos[row['logo_id']]}" 
-                                                                                    alt="ODS {row['ODS_ID']}" 
-                                                                                    class="logo-ods-tbl"></td>
+                        <td style="padding: 10px; border-bottom: 1px solid #ddd;">{html_logo_ods(row['ODS_ID'], f"ODS {row['ODS_ID']}")}</td>
                         <td style="padding: 10px; border-bottom: 1px solid #ddd;"><strong>{row['INDICADOR_ID']}</strong></td>
                         <td style="padding: 10px; border-bottom: 1px solid #ddd; text-align: center;">{row['INDICADOR']}</td>
                         <td style="padding: 10px; border-bottom: 1px solid #ddd; text-align: right;">{row['indicador_similaridad_cos_normalized']:.4f}</td>
@@ -429,15 +572,18 @@ def tab_inicio(df_ods, df_metas, df_indicador):
     """
     return html
 
+@instrumentar('tab_viz1')
+@desde_sesion(0, 1, 2)
 def tab_viz1(df_ods, df_metas, df_indicador):
 # def tab_viz1():
     """Visualización 1: Box Plot por ODS"""
     if not DATOS_CARGADOS:
         return None, "⚠️ Error: No se pudieron cargar los datos."
     
-    fig1 = viz_1_distribucion_por_ods(df_ods, 'ODS_ID', 'ods_similaridad_cos_normalized', 'ODS')
-    fig2 = viz_1_distribucion_por_ods(df_metas, 'META_ID', 'meta_similaridad_cos_normalized', 'META')
-    fig3 = viz_1_distribucion_por_ods(df_indicador, 'INDICADOR_ID', 'indicador_similaridad_cos_normalized', 'INDICADOR')
+    with medir_etapa('render'):
+        fig1 = viz_1_distribucion_por_ods(df_ods, 'ODS_ID', 'ods_similaridad_cos_normalized', 'ODS')
+        fig2 = viz_1_distribucion_por_ods(df_metas, 'META_ID', 'meta_similaridad_cos_normalized', 'META')
+        fig3 = viz_1_distribucion_por_ods(df_indicador, 'INDICADOR_ID', 'indicador_similaridad_cos_normalized', 'INDICADOR')
     
     explicacion = """
     ## 📦 Diagrama de Caja por ODS
@@ -463,14 +609,18 @@ def tab_viz1(df_ods, df_metas, df_indicador):
     
     return fig1, fig2, fig3, explicacion
 
+@instrumentar('tab_viz2')
+@desde_sesion(0)
 def tab_viz2(df_global):
 # def tab_viz2():
     """Visualización 2: Heatmap ODS × Ranking"""
     if not DATOS_CARGADOS:
         return None, "⚠️ Error: No se pudieron cargar los datos."
     
-    fig = viz_2_heatmap_ods_ranking(df_global)
-    filepath = matplotlib_to_file(fig, 'viz2_heatmap.png')
+    with medir_etapa('render'):
+        imagen = RENDER_ESTATICO.renderizar('viz_2', df_global, *NIVEL_ODS)
+    with medir_etapa('publicar_imagen'):
+        filepath = imagen_to_file(imagen, 'viz2_heatmap.png')
     
     explicacion = """
     ## 🔥 Mapa de Calor: ODS × Ranking
@@ -496,13 +646,16 @@ def tab_viz2(df_global):
     
     return filepath, explicacion
 
+@instrumentar('tab_viz3')
+@desde_sesion(0)
 def tab_viz3(df_global):
 # def tab_viz3():
     """Visualización 3: Scatter 3D Interactivo"""
     if not DATOS_CARGADOS:
         return None, "⚠️ Error: No se pudieron cargar los datos."
     
-    fig = viz_3_scatter_3d_interactivo(df_global)
+    with medir_etapa('render'):
+        fig = viz_3_scatter_3d_interactivo(df_global, *NIVEL_ODS)
     
     explicacion = """
     ## 🌐 Gráfico 3D Interactivo
@@ -533,13 +686,16 @@ def tab_viz3(df_global):
     
     return fig, explicacion
 
+@instrumentar('tab_viz4')
+@desde_sesion(0)
 def tab_viz4(df_global):
 # def tab_viz4():
     """Visualización 4: Radar Chart"""
     if not DATOS_CARGADOS:
         return None, "⚠️ Error: No se pudieron cargar los datos."
     
-    fig = viz_4_radar_chart_ods(df_global)
+    with medir_etapa('render'):
+        fig = viz_4_radar_chart_ods(df_global, *NIVEL_ODS)
     
     explicacion = """
     ## 🕸️ Gráfico de Radar (Perfil ODS)
@@ -565,13 +721,16 @@ def tab_viz4(df_global):
     
     return fig, explicacion
 
+@instrumentar('tab_viz5')
+@desde_sesion(0)
 def tab_viz5(df_global):
 # def tab_viz5():
     """Visualización 5: Sunburst"""
     if not DATOS_CARGADOS:
         return None, "⚠️ Error: No se pudieron cargar los datos."
     
-    fig = viz_5_sunburst_jerarquia(df_global)
+    with medir_etapa('render'):
+        fig = viz_5_sunburst_jerarquia(df_global, *NIVEL_ODS)
     
     explicacion = """
     ## ☀️ Diagrama de Sol (Sunburst)
@@ -600,13 +759,16 @@ def tab_viz5(df_global):
     
     return fig, explicacion
 
+@instrumentar('tab_viz6')
+@desde_sesion(0)
 def tab_viz6(df_global):
 # def tab_viz6():
     """Visualización 6: Top Indicadores por ODS"""
     if not DATOS_CARGADOS:
         return None, "⚠️ Error: No se pudieron cargar los datos."
     
-    fig = viz_6_top_indicadores_por_ods(df_global, top_n=5)
+    with medir_etapa('render'):
+        fig = viz_6_top_indicadores_por_ods(df_global, *NIVEL_ODS, top_n=5)
     
     explicacion = """
     ## 🏆 Top 5 Indicadores por ODS
@@ -631,13 +793,16 @@ def tab_viz6(df_global):
     
     return fig, explicacion
 
+@instrumentar('tab_viz7')
+@desde_sesion(0)
 def tab_viz7(df_global):
 # def tab_viz7():
     """Visualización 7: Stream Graph"""
     if not DATOS_CARGADOS:
         return None, "⚠️ Error: No se pudieron cargar los datos."
     
-    fig = viz_7_streamgraph_similaridad(df_global)
+    with medir_etapa('render'):
+        fig = viz_7_streamgraph_similaridad(df_global, *NIVEL_ODS)
     
     explicacion = """
     ## 🌊 Gráfico de Flujo (Stream Graph)
@@ -663,13 +828,16 @@ def tab_viz7(df_global):
     
     return fig, explicacion
 
+@instrumentar('tab_viz8')
+@desde_sesion(0)
 def tab_viz8(df_global):
 # def tab_viz8():
     """Visualización 8: Violin Plot"""
     if not DATOS_CARGADOS:
         return None, "⚠️ Error: No se pudieron cargar los datos."
     
-    fig = viz_8_violin_plot_ods(df_global)
+    with medir_etapa('render'):
+        fig = viz_8_violin_plot_ods(df_global, *NIVEL_ODS)
     
     explicacion = """
     ## 🎻 Gráfico de Violín
@@ -699,13 +867,16 @@ def tab_viz8(df_global):
     
     return fig, explicacion
 
+@instrumentar('tab_viz9')
+@desde_sesion(0)
 def tab_viz9(df_global):
 # def tab_viz9():
     """Visualización 9: Dashboard Integrado"""
     if not DATOS_CARGADOS:
         return None, "⚠️ Error: No se pudieron cargar los datos."
     
-    fig = viz_9_dashboard_metricas(df_global)
+    with medir_etapa('render'):
+        fig = viz_9_dashboard_metricas(df_global, *NIVEL_ODS)
     
     explicacion = """
     ## 📊 Dashboard Integrado (4 Paneles)
@@ -733,14 +904,18 @@ def tab_viz9(df_global):
     
     return fig, explicacion
 
+@instrumentar('tab_viz10')
+@desde_sesion(0)
 def tab_viz10(df_global):
 # def tab_viz10():
     """Visualización 10: Matriz de Transición"""
     if not DATOS_CARGADOS:
         return None, "⚠️ Error: No se pudieron cargar los datos."
     
-    fig = viz_10_matriz_transicion(df_global)
-    filepath = matplotlib_to_file(fig, 'viz10_matriz_transicion.png')
+    with medir_etapa('render'):
+        imagen = RENDER_ESTATICO.renderizar('viz_10', df_global, *NIVEL_ODS)
+    with medir_etapa('publicar_imagen'):
+        filepath = imagen_to_file(imagen, 'viz10_matriz_transicion.png')
     
     explicacion = """
     ## 🔀 Matriz de Transición por Cuartiles
@@ -766,27 +941,27 @@ def tab_viz10(df_global):
     
     return filepath, explicacion
 
+@instrumentar('tab_estadisticas')
+@desde_sesion(0)
 def tab_estadisticas(df_global):
 # def tab_estadisticas():
     """Pestaña con análisis estadístico detallado"""
     if not DATOS_CARGADOS:
         return "⚠️ Error: No se pudieron cargar los datos."
     
-    # Estadísticas globales
-    stats = df_global['similaridad_cos'].describe()
-    correlacion = df_global['rank'].corr(df_global['similaridad_cos'])
-    
-    # Por ODS
-    stats_ods = df_global.groupby('ods_id')['similaridad_cos'].agg([
-        ('count', 'count'),
-        ('mean', 'mean'),
-        ('std', 'std'),
-        ('min', 'min'),
-        ('max', 'max')
-    ]).round(4)
-    
-    # Top 50
-    top_50_ods = df_global.nsmallest(50, 'rank')['ods_id'].value_counts()
+    with medir_etapa('estadisticas'):
+        agregados = obtener_agregados(df_global, 'ODS_ID', 'ods_similaridad_cos', 'ods_rank')
+        
+        # Estadísticas globales
+        stats = agregados.global_
+        correlacion = agregados.correlacion
+        
+        # Por ODS
+        stats_ods = agregados.por_grupo.round(4)
+        
+        # Top 50
+        # IDs categóricos: value_counts incluiría las categorías no observadas con 0
+        top_50_ods = agregados.top['ODS_ID'].value_counts()[lambda conteos: conteos > 0]
     
     html = f"""
     <div style="font-family: Arial, sans-serif; padding: 20px;">
@@ -908,7 +1083,7 @@ def crear_app():
             secondary_hue="orange",
             neutral_hue="slate"
         ),
-        css=CUSTOM_CSS
+        css=CUSTOM_CSS + css_logos()
     ) as app:
 
         gr.HTML(f"""
@@ -916,7 +1091,8 @@ def crear_app():
             <div style="flex: 0 0 auto;">
                 <img src="{dict_logos['gobierno']}" 
                      alt="Gobierno de Colombia" 
-                     class="logo-institucional">
+                     class="logo-institucional"
+                     decoding="async">
             </div>
             <div class="titulo-institucional">
                 <h1></h1>
@@ -925,7 +1101,8 @@ def crear_app():
             <div style="flex: 0 0 auto;">
                 <img src="{dict_logos['fondo_un']}" 
                      alt="Fondo Multidonante de las Naciones Unidas" 
-                     class="logo-institucional">
+                     class="logo-institucional"
+                     decoding="async">
             </div>
         </div>
         """)
@@ -970,8 +1147,28 @@ def crear_app():
                   # query_in.render()
                   # indicador, indicador_norm, query, pilares, estrategias, categorias = search()
 
-                
-                btn.click(search, query_in, [query_out,ods,meta,indicador,genero,poblacional,etnico,pilar,estrategia,categoria,bdl_ods])
+                # Handle de la última consulta (las tablas quedan en ALMACEN_RESULTADOS)
+                # y controles de paginación de las tablas largas
+                tablas_resultado = gr.State(time_to_live=ALMACEN_RESULTADOS.ttl_segundos,
+                                            delete_callback=liberar_sesion)
+                tablas_ui = [ods, meta, indicador, genero, poblacional, etnico, pilar, estrategia, categoria, bdl_ods]
+                paginas, estados_pagina = [], []
+                with gr.Row():
+                  for pos in TABLAS_PAGINADAS:
+                    with gr.Column(min_width=160):
+                      gr.Markdown(f"**{tablas_ui[pos].label}**")
+                      pagina = gr.State(1)
+                      estado = gr.Markdown()
+                      with gr.Row():
+                        anterior = gr.Button("◀", size="sm")
+                        siguiente = gr.Button("▶", size="sm")
+                      salidas_pagina = [tablas_ui[pos], pagina, estado]
+                      anterior.click(partial(cambiar_pagina, pos, -1), [tablas_resultado, pagina], salidas_pagina)
+                      siguiente.click(partial(cambiar_pagina, pos, 1), [tablas_resultado, pagina], salidas_pagina)
+                      paginas.append(pagina)
+                      estados_pagina.append(estado)
+
+                btn.click(consultar, [query_in, tablas_resultado], [query_out, *tablas_ui, tablas_resultado, *paginas, *estados_pagina])
                 # btn.click(cara_utility, [a_valu, trials], cara_output)
             """    
             with gr.Tab('CONSULTA ESPECIALIZADA'):
@@ -1008,6 +1205,10 @@ def crear_app():
                   with gr.Row():
                     bdl_ods_esp = gr.Dataframe(value=pd.DataFrame(), label="ODS")
 
+                # Handle de la consulta: las pestañas de visualización leen las tablas del servidor
+                resultado_esp = gr.State(time_to_live=ALMACEN_RESULTADOS.ttl_segundos,
+                                         delete_callback=liberar_sesion)
+
                 # PESTAÑA: INICIO
                 with gr.Tab("🏠 Inicio"):
                     html_inicio_ods = gr.HTML() #tab_inicio(ods.value)
@@ -1016,7 +1217,7 @@ def crear_app():
                     btn0 = gr.Button("🔄 Generar Metricas Iniciales", variant="primary")
                     btn0.click(
                         fn=tab_inicio,
-                        inputs=[ods_esp,meta_esp,indicador_esp],
+                        inputs=[resultado_esp],
                         outputs=[html_inicio_ods]
                     )
                     
@@ -1043,7 +1244,7 @@ def crear_app():
                     
                     btn1.click(
                         fn=tab_viz1,
-                        inputs=[ods_esp, meta_esp, indicador_esp],
+                        inputs=[resultado_esp],
                         outputs=[plot1_1, plot1_2, plot1_3, exp1]
                     )
                 
@@ -1058,7 +1259,7 @@ def crear_app():
                     btn2 = gr.Button("🔄 Generar Visualización", variant="primary")
                     btn2.click(
                         fn=tab_viz2,
-                        inputs=[ods],
+                        inputs=[resultado_esp],
                         outputs=[img2, exp2]
                     )
                 
@@ -1073,7 +1274,7 @@ def crear_app():
                     btn3 = gr.Button("🔄 Generar Visualización", variant="primary")
                     btn3.click(
                         fn=tab_viz3,
-                        inputs=[ods],
+                        inputs=[resultado_esp],
                         outputs=[plot3, exp3]
                     )
                 
@@ -1088,7 +1289,7 @@ def crear_app():
                     btn4 = gr.Button("🔄 Generar Visualización", variant="primary")
                     btn4.click(
                         fn=tab_viz4,
-                        inputs=[ods],
+                        inputs=[resultado_esp],
                         outputs=[plot4, exp4]
                     )
                 
@@ -1103,7 +1304,7 @@ def crear_app():
                     btn5 = gr.Button("🔄 Generar Visualización", variant="primary")
                     btn5.click(
                         fn=tab_viz5,
-                        inputs=[ods],
+                        inputs=[resultado_esp],
                         outputs=[plot5, exp5]
                     )
                 
@@ -1118,7 +1319,7 @@ def crear_app():
                     btn6 = gr.Button("🔄 Generar Visualización", variant="primary")
                     btn6.click(
                         fn=tab_viz6,
-                        inputs=[ods],
+                        inputs=[resultado_esp],
                         outputs=[plot6, exp6]
                     )
                 
@@ -1133,7 +1334,7 @@ def crear_app():
                     btn7 = gr.Button("🔄 Generar Visualización", variant="primary")
                     btn7.click(
                         fn=tab_viz7,
-                        inputs=[ods],
+                        inputs=[resultado_esp],
                         outputs=[plot7, exp7]
                     )
                 
@@ -1148,7 +1349,7 @@ def crear_app():
                     btn8 = gr.Button("🔄 Generar Visualización", variant="primary")
                     btn8.click(
                         fn=tab_viz8,
-                        inputs=[ods],
+                        inputs=[resultado_esp],
                         outputs=[plot8, exp8]
                     )
                 
@@ -1163,7 +1364,7 @@ def crear_app():
                     btn9 = gr.Button("🔄 Generar Visualización", variant="primary")
                     btn9.click(
                         fn=tab_viz9,
-                        inputs=[ods],
+                        inputs=[resultado_esp],
                         outputs=[plot9, exp9]
                     )
                 
@@ -1178,7 +1379,7 @@ def crear_app():
                     btn10 = gr.Button("🔄 Generar Visualización", variant="primary")
                     btn10.click(
                         fn=tab_viz10,
-                        inputs=[ods],
+                        inputs=[resultado_esp],
                         outputs=[img10, exp10]
                     )
                 
@@ -1189,11 +1390,11 @@ def crear_app():
                     btn11 = gr.Button("🔄 Generar Estadísticas", variant="primary")
                     btn11.click(
                         fn=tab_estadisticas,
-                        inputs=[ods],
+                        inputs=[resultado_esp],
                         outputs=[html_stats]
                     )
                   
-                btn_esp.click(search, query_in_esp, [query_out_esp,ods_esp,meta_esp,indicador_esp,genero_esp,poblacional_esp,etnico_esp,pilar_esp,estrategia_esp,categoria_esp,bdl_ods_esp])
+                btn_esp.click(lambda q, h: consultar(q, h)[:12], [query_in_esp, resultado_esp], [query_out_esp,ods_esp,meta_esp,indicador_esp,genero_esp,poblacional_esp,etnico_esp,pilar_esp,estrategia_esp,categoria_esp,bdl_ods_esp,resultado_esp])
             """
                 
           
@@ -1232,8 +1433,30 @@ if __name__ == "__main__":
     print("CREANDO APLICACIÓN...")
     print("="*70)
     
+    # Logs estructurados y endpoint local de métricas (formato Prometheus)
+    configurar_logging()
+    puerto_metricas = int(os.environ.get('VOCES_ODS_METRICAS_PUERTO', '9464'))
+    if puerto_metricas:
+        try:
+            iniciar_servidor_metricas(puerto_metricas)
+            print(f"📈 Métricas: http://127.0.0.1:{puerto_metricas}/metrics")
+        except OSError as e:
+            print(f"⚠️  No se pudo iniciar el endpoint de métricas: {e}")
+    
+    # Con snapshot local del modelo: sin red (hub, analytics ni enlace público)
+    # y el modelo cargado antes de la primera petición
+    OFFLINE = modo_offline(MODEL_NAME)
+    if OFFLINE:
+        activar_modo_offline()
+        inicio_modelo = time.perf_counter()
+        obtener_modelo(MODEL_NAME)
+        print(f"🧠 Modelo listo sin red (snapshot local) en {time.perf_counter() - inicio_modelo:.1f} s")
+    
     app = crear_app()
     
+    # Workers de render de los heatmaps listos antes de la primera petición
+    RENDER_ESTATICO.calentar()
+    
     print("\n✓ Aplicación creada exitosamente")
     print("\n" + "="*70)
     print("INICIANDO SERVIDOR WEB...")
@@ -1247,8 +1470,10 @@ if __name__ == "__main__":
     app.launch(
         # server_name="0.0.0.0",  # Permite acceso desde cualquier IP
         # server_port=7860,        # Puerto por defecto
-        share=True,             # Cambiar a True para URL pública
+        share=not OFFLINE,      # URL pública (requiere red)
         show_error=True,         # Mostrar errores en la interfaz
         # quiet=False              # Mostrar logs en consola
-        debug=True               # Modo debug para desarrollo
+        debug=True,              # Modo debug para desarrollo
+        # plotly.js y logos como archivos estáticos con cache de larga duración
+        app_kwargs={'routes': rutas_estaticas()},
     )
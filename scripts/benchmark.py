@@ -0,0 +1,306 @@
+"""
+BENCHMARK OFFLINE - LATENCIA Y THROUGHPUT
+=========================================
+
+Mide sobre catálogos sintéticos de tamaño configurable:
+- Latencia y throughput de `search()` (una iniciativa por llamada)
+- Filas/s de la clasificación en lote (`clasificar_lote`)
+- Tiempo de construcción del cache de embeddings (`construir_cache`)
+- Tiempo de render de cada función `viz_*` por nivel (ODS, META, INDICADOR)
+- Construcción + serialización JSON de las gráficas armadas con
+  `nueva_figura`: ruta ligera (dicts) frente a `go.Figure` validado
+
+Usa `CodificadorHash` en lugar de instructor-large, por lo que corre sin
+red ni GPU y es reproducible. Los resultados se escriben en JSON para
+comparar corridas.
+
+Uso:
+    python -m scripts.benchmark --filas 244 10000 --consultas 20 \\
+        --salida resultados/benchmark.json
+    python -m scripts.benchmark --filas 244 --comparar resultados/benchmark.json
+"""
+
+import argparse
+import json
+import platform
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+
+from src.embeddings.codificador_hash import CodificadorHash
+from src.embeddings import modelos_nlp_db
+from src.embeddings.modelos_nlp_db import (
+    search,
+    clasificar_lote,
+    construir_cache,
+    establecer_modelo,
+    establecer_catalogos,
+    INSTRUC_BASES,
+)
+from src.utils.sinteticos import generar_catalogos, generar_consultas
+from src.visualization import visualizaciones_ods as viz
+from src.visualization import figuras_rapidas
+from src.visualization.cache_figuras import CACHE_FIGURAS
+
+# (id_lvl, score, rank, titulo, posición del frame en la salida de search)
+NIVELES = {
+    'ODS': ('ODS_ID', 'ods_similaridad_cos_normalized', 'ods_rank', 'ODS', 1),
+    'META': ('META_ID', 'meta_similaridad_cos_normalized', 'meta_rank', 'META', 2),
+    'INDICADOR': ('INDICADOR_ID', 'indicador_similaridad_cos_normalized', 'indicador_rank', 'INDICADOR', 3),
+}
+
+VIZ = {
+    'viz_1': lambda df, l, s, r, t: viz.viz_1_distribucion_por_ods(df, l, s, t),
+    'viz_2': viz.viz_2_heatmap_ods_ranking,
+    'viz_3': viz.viz_3_scatter_3d_interactivo,
+    'viz_4': viz.viz_4_radar_chart_ods,
+    'viz_5': viz.viz_5_sunburst_jerarquia,
+    'viz_6': lambda df, l, s, r, t: viz.viz_6_top_indicadores_por_ods(df, l, s, r, t, top_n=5),
+    'viz_7': viz.viz_7_streamgraph_similaridad,
+    'viz_8': viz.viz_8_violin_plot_ods,
+    'viz_9': viz.viz_9_dashboard_metricas,
+    'viz_10': viz.viz_10_matriz_transicion,
+}
+
+# Visualizaciones construidas con `nueva_figura` (admiten las dos rutas)
+VIZ_LIGERAS = ['viz_1', 'viz_3', 'viz_4', 'viz_7', 'viz_8']
+
+
+# ============================================================================
+# UTILIDADES DE MEDICIÓN
+# ============================================================================
+
+def resumen(tiempos):
+    """Estadísticos de una lista de duraciones (segundos)."""
+    t = np.asarray(tiempos, dtype=float)
+    if t.size == 0:
+        return {'n': 0}
+    return {
+        'n': int(t.size),
+        'media_s': float(t.mean()),
+        'p50_s': float(np.percentile(t, 50)),
+        'p95_s': float(np.percentile(t, 95)),
+        'min_s': float(t.min()),
+        'max_s': float(t.max()),
+    }
+
+
+def cronometrar(funcion, *args, **kwargs):
+    inicio = time.perf_counter()
+    resultado = funcion(*args, **kwargs)
+    return time.perf_counter() - inicio, resultado
+
+
+# ============================================================================
+# BENCHMARKS
+# ============================================================================
+
+def bench_search(consultas, calentamiento=2):
+    for q in consultas[:calentamiento]:
+        search(q)
+    tiempos = []
+    resultado = None
+    inicio = time.perf_counter()
+    for q in consultas:
+        t, resultado = cronometrar(search, q)
+        tiempos.append(t)
+    total = time.perf_counter() - inicio
+    datos = resumen(tiempos)
+    datos['consultas_s'] = len(consultas) / total if total else None
+    return datos, resultado
+
+
+def bench_lote(textos):
+    t, res_dfs = cronometrar(clasificar_lote, textos)
+    return {
+        'iniciativas': len(textos),
+        'duracion_s': t,
+        'iniciativas_s': len(textos) / t if t else None,
+        'filas_resultado': int(sum(len(df) for df in res_dfs)),
+    }
+
+
+def bench_cache(textos, dimension):
+    with tempfile.TemporaryDirectory() as tmp:
+        ruta = str(Path(tmp) / 'cache_benchmark.npz')
+        t, _ = cronometrar(construir_cache, ruta, textos, INSTRUC_BASES[2])
+    return {'textos': len(textos), 'dimension': dimension, 'duracion_s': t,
+            'textos_s': len(textos) / t if t else None}
+
+
+def bench_viz(resultado, repeticiones):
+    datos = {}
+    for nivel, (id_lvl, score, rank, titulo, pos) in NIVELES.items():
+        df_nivel = resultado[pos]
+        for nombre, funcion in VIZ.items():
+            tiempos = []
+            error = None
+            for _ in range(repeticiones):
+                df = df_nivel.copy()
+                try:
+                    t, fig = cronometrar(funcion, df, id_lvl, score, rank, titulo)
+                except Exception as e:
+                    error = f'{type(e).__name__}: {e}'
+                    break
+                tiempos.append(t)
+                if isinstance(fig, plt.Figure):
+                    plt.close(fig)
+            datos[f'{nombre}/{nivel}'] = dict(resumen(tiempos), filas=len(df_nivel), error=error)
+    return datos
+
+
+def bench_figuras(resultado, repeticiones):
+    """Construcción y `to_json()` (lo que hace gr.Plot) con y sin validación de plotly."""
+    datos = {}
+    ligeras = figuras_rapidas.FIGURAS_LIGERAS
+    try:
+        for nivel, (id_lvl, score, rank, titulo, pos) in NIVELES.items():
+            df = resultado[pos]
+            for nombre in VIZ_LIGERAS:
+                rutas = {}
+                for ruta, activa in (('validada', False), ('ligera', True)):
+                    figuras_rapidas.FIGURAS_LIGERAS = activa
+                    construccion, serializacion = [], []
+                    try:
+                        for _ in range(repeticiones):
+                            t, fig = cronometrar(VIZ[nombre], df, id_lvl, score, rank, titulo)
+                            construccion.append(t)
+                            t, carga = cronometrar(fig.to_json)
+                            serializacion.append(t)
+                    except Exception as e:
+                        rutas[ruta] = {'error': f'{type(e).__name__}: {e}'}
+                        continue
+                    rutas[ruta] = {'construccion': resumen(construccion),
+                                   'serializacion': resumen(serializacion),
+                                   'bytes': len(carga)}
+                datos[f'{nombre}/{nivel}'] = rutas
+    finally:
+        figuras_rapidas.FIGURAS_LIGERAS = ligeras
+    for clave, rutas in datos.items():
+        if all('construccion' in r for r in rutas.values()):
+            a = rutas['validada']['construccion']['p50_s'] + rutas['validada']['serializacion']['p50_s']
+            b = rutas['ligera']['construccion']['p50_s'] + rutas['ligera']['serializacion']['p50_s']
+            print(f"   {clave:22s} validada {a * 1000:8.2f} ms  ligera {b * 1000:8.2f} ms  (x{a / b:.1f})")
+    return datos
+
+
+def ejecutar(filas, args):
+    dfs, embeddings = generar_catalogos(filas, dimension=args.dimension, semilla=args.semilla)
+    establecer_catalogos(dfs, embeddings)
+    consultas = generar_consultas(args.consultas, semilla=args.semilla)
+
+    print(f"\n[{filas} filas] search() x {len(consultas)}...")
+    datos_search, resultado = bench_search(consultas)
+    print(f"   p50={datos_search['p50_s'] * 1000:.1f} ms  p95={datos_search['p95_s'] * 1000:.1f} ms")
+
+    print(f"[{filas} filas] clasificar_lote() x {args.lote}...")
+    datos_lote = bench_lote(generar_consultas(args.lote, semilla=args.semilla + 1))
+    print(f"   {datos_lote['iniciativas_s']:.1f} iniciativas/s")
+
+    textos_cache = modelos_nlp_db.textos_catalogos(dfs)[2][:args.filas_cache]
+    print(f"[{filas} filas] construir_cache() x {len(textos_cache)} textos...")
+    datos_cache = bench_cache(textos_cache, args.dimension)
+    print(f"   {datos_cache['duracion_s']:.2f} s")
+
+    print(f"[{filas} filas] viz_* x {args.repeticiones_viz}...")
+    datos_viz = bench_viz(resultado, args.repeticiones_viz)
+
+    print(f"[{filas} filas] figuras ligeras vs go.Figure x {args.repeticiones_viz}...")
+    datos_figuras = bench_figuras(resultado, args.repeticiones_viz)
+
+    return {
+        'filas_indicador': filas,
+        'filas_meta': len(dfs[1]),
+        'search': datos_search,
+        'lote': datos_lote,
+        'cache': datos_cache,
+        'viz': datos_viz,
+        'figuras': datos_figuras,
+    }
+
+
+# ============================================================================
+# COMPARACIÓN ENTRE CORRIDAS
+# ============================================================================
+
+def _aplanar(resultados):
+    plano = {}
+    for r in resultados:
+        base = r['filas_indicador']
+        plano[f'{base}/search p50'] = r['search'].get('p50_s')
+        plano[f'{base}/lote iniciativas_s'] = r['lote'].get('iniciativas_s')
+        plano[f'{base}/cache'] = r['cache'].get('duracion_s')
+        for nombre, d in r['viz'].items():
+            plano[f'{base}/{nombre} p50'] = d.get('p50_s')
+        for nombre, rutas in r.get('figuras', {}).items():
+            for ruta, d in rutas.items():
+                plano[f'{base}/{nombre} {ruta} p50'] = d.get('construccion', {}).get('p50_s')
+    return plano
+
+
+def comparar(actual, ruta_anterior):
+    with open(ruta_anterior, encoding='utf-8') as f:
+        anterior = json.load(f)
+    previo = _aplanar(anterior['resultados'])
+    nuevo = _aplanar(actual['resultados'])
+    print("\n" + "=" * 70)
+    print(f"COMPARACIÓN CONTRA {ruta_anterior}")
+    print("=" * 70)
+    for clave in sorted(set(previo) & set(nuevo)):
+        a, b = previo[clave], nuevo[clave]
+        if a and b:
+            print(f"   {clave:45s} {a:12.5f} -> {b:12.5f}  (x{b / a:.2f})")
+
+
+# ============================================================================
+# EJECUCIÓN
+# ============================================================================
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark offline de search(), lote, cache y visualizaciones.')
+    parser.add_argument('--filas', type=int, nargs='+', default=[244], help='Tamaños del catálogo de indicadores (244 a 1000000).')
+    parser.add_argument('--consultas', type=int, default=20, help='Consultas por tamaño para search().')
+    parser.add_argument('--lote', type=int, default=500, help='Iniciativas para clasificar_lote().')
+    parser.add_argument('--filas-cache', type=int, default=2000, help='Textos a codificar para medir construir_cache().')
+    parser.add_argument('--repeticiones-viz', type=int, default=3, help='Repeticiones por visualización.')
+    parser.add_argument('--dimension', type=int, default=768, help='Dimensión de los embeddings.')
+    parser.add_argument('--semilla', type=int, default=0)
+    parser.add_argument('--salida', default=None, help='Ruta del JSON de resultados.')
+    parser.add_argument('--comparar', default=None, help='JSON de una corrida anterior para comparar.')
+    args = parser.parse_args()
+
+    establecer_modelo(CodificadorHash(dimension=args.dimension))
+    # Se mide el costo de construir cada figura, no el del cache
+    CACHE_FIGURAS.activa = False
+
+    salida = {
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'entorno': {
+            'python': platform.python_version(),
+            'plataforma': platform.platform(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+        },
+        'parametros': vars(args),
+        'resultados': [ejecutar(filas, args) for filas in args.filas],
+    }
+
+    ruta = Path(args.salida or f"benchmark_{datetime.now():%Y%m%d_%H%M%S}.json")
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    with open(ruta, 'w', encoding='utf-8') as f:
+        json.dump(salida, f, ensure_ascii=False, indent=2)
+    print(f"\n✓ Resultados guardados en {ruta}")
+
+    if args.comparar:
+        comparar(salida, args.comparar)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+CONSTRUCCIÓN INCREMENTAL DEL CUBO MUNICIPIO × ODS × META
+========================================================
+
+Clasifica las iniciativas PATR por lotes con `clasificar_lote` y acumula
+la tabla de METAS en un `CuboResultados` (`src.utils.cubo_resultados`).
+Si el archivo del cubo ya existe se carga y se amplía: las iniciativas
+cuyo ID ya está en el cubo se descartan antes de clasificar, así que
+volver a correr con un CSV que creció solo clasifica y suma las filas
+nuevas (con cualquier `--lote`).
+
+La entrada es un CSV o Excel con las columnas ID, INICIATIVAS y MUNICIPIO
+(el formato de `load_data`). Con `--sinteticas N` se generan N
+iniciativas y se usan `CodificadorHash` y catálogos sintéticos.
+
+Uso:
+    python -m scripts.construir_cubo --entrada patr.csv --cubo data/cubo/cubo.npz
+    python -m scripts.construir_cubo --sinteticas 50000 --lote 5000 --cubo /tmp/cubo.npz
+"""
+
+import argparse
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from src.embeddings.modelos_nlp_db import clasificar_lote, establecer_modelo, establecer_catalogos
+from src.utils.cubo_resultados import CuboResultados, filas_cubo
+
+
+def lotes_entrada(ruta, tamano):
+    ruta = Path(ruta)
+    if ruta.suffix.lower() in ('.xlsx', '.xls'):
+        df = pd.read_excel(ruta)
+        for inicio in range(0, len(df), tamano):
+            yield df.iloc[inicio:inicio + tamano].reset_index(drop=True)
+    else:
+        for chunk in pd.read_csv(ruta, chunksize=tamano):
+            yield chunk.reset_index(drop=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Construye o amplía el cubo municipio × ODS × META.')
+    parser.add_argument('--entrada', default=None, help='CSV/Excel con ID, INICIATIVAS y MUNICIPIO.')
+    parser.add_argument('--sinteticas', type=int, default=0, help='Generar N iniciativas y catálogos sintéticos (offline).')
+    parser.add_argument('--cubo', default='data/cubo/cubo_resultados.npz', help='Archivo del cubo (se amplía si existe).')
+    parser.add_argument('--lote', type=int, default=2000, help='Iniciativas por lote de clasificación.')
+    parser.add_argument('--semilla', type=int, default=0)
+    args = parser.parse_args()
+
+    if args.sinteticas:
+        from src.embeddings.codificador_hash import CodificadorHash
+        from src.utils.sinteticos import generar_catalogos, generar_iniciativas
+        establecer_modelo(CodificadorHash())
+        establecer_catalogos(*generar_catalogos(semilla=args.semilla))
+        patr = generar_iniciativas(args.sinteticas, semilla=args.semilla)
+        lotes = (patr.iloc[i:i + args.lote].reset_index(drop=True) for i in range(0, len(patr), args.lote))
+    elif args.entrada:
+        lotes = lotes_entrada(args.entrada, args.lote)
+    else:
+        parser.error('indica --entrada o --sinteticas')
+
+    ruta_cubo = Path(args.cubo)
+    cubo = CuboResultados.cargar(ruta_cubo) if ruta_cubo.exists() else CuboResultados()
+    print(f"Cubo: {cubo.resumen()}")
+
+    inicio = time.perf_counter()
+    for i, iniciativas in enumerate(lotes, 1):
+        leidas = len(iniciativas)
+        iniciativas = iniciativas.drop_duplicates('ID')
+        iniciativas = iniciativas[~cubo.incorporadas(iniciativas['ID'])].reset_index(drop=True)
+        if iniciativas.empty:
+            print(f"  lote {i}: {leidas} iniciativas ya incorporadas, se omite")
+            continue
+        t0 = time.perf_counter()
+        df_metas = clasificar_lote(iniciativas['INICIATIVAS'].astype(str).tolist())[1]
+        t1 = time.perf_counter()
+        cubo.agregar(filas_cubo(df_metas, iniciativas))
+        print(f"  lote {i}: {len(iniciativas)} iniciativas nuevas de {leidas} · clasificación {t1 - t0:.1f} s · "
+              f"cubo {(time.perf_counter() - t1) * 1000:.0f} ms")
+
+    ruta_cubo.parent.mkdir(parents=True, exist_ok=True)
+    cubo.guardar(ruta_cubo)
+    resumen = cubo.resumen()
+    print(f"✓ Cubo: {resumen['filas']} filas · {resumen['municipios']} municipios · {resumen['metas']} metas · "
+          f"{resumen['bytes'] / 2**20:.1f} MB en memoria ({time.perf_counter() - inicio:.1f} s)")
+
+    for por in (['ODS_ID'], ['MUNICIPIO', 'ODS_ID']):
+        t0 = time.perf_counter()
+        tabla = cubo.consultar(por=por)
+        print(f"  consultar(por={por}): {len(tabla)} grupos en {(time.perf_counter() - t0) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+"""
+CONSTRUCCIÓN DE LA PROYECCIÓN PCA (DIMENSIÓN REDUCIDA)
+======================================================
+
+Ajusta la proyección lineal d → 128/256 sobre los embeddings de los nueve
+catálogos y de iniciativas históricas (codificadas con la instrucción de
+cada tabla), la guarda junto a los caches .npz (`data/embeddings/pca<k>_*.npz`
++ sidecar JSON) y reporta, por catálogo, el recall@k de la búsqueda
+reducida frente a la búsqueda en dimensión completa, más memoria de la
+matriz apilada y tiempo de la multiplicación por consulta.
+
+Las iniciativas salen del historial SQLite de la app (`VOCES_ODS_HISTORIAL`)
+y/o de un Excel/CSV con columna INICIATIVAS. Una fracción se reserva para
+medir el recall y no entra en el ajuste.
+
+Para usar la proyección en la app: `VOCES_ODS_PCA=256`.
+
+Uso:
+    python -m scripts.construir_pca --iniciativas data/raw/iniciativas.xlsx
+    python -m scripts.construir_pca --dimensiones 128 256 --max-iniciativas 5000
+    python -m scripts.construir_pca --sinteticos 2000 --destino /tmp/pca   # sin modelo ni Excel
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.embeddings.modelos_nlp_db import (
+    CATALOGOS_FINGERPRINT,
+    CATALOGOS_OUT_DIR,
+    CATALOGOS_PREFIJO_CACHE,
+    INSTRUC_INICIATIVAS,
+    MODEL_NAME,
+    cargar_catalogos,
+    compute_embeddings,
+    make_text_pairs,
+    obtener_modelo,
+    ruta_proyeccion,
+    save_cache,
+)
+from src.embeddings.proyeccion_pca import DIMENSIONES_PCA, KS_RECALL, ajustar_proyeccion, evaluar_recall, proyectar
+
+RUTA_HISTORIAL = os.environ.get('VOCES_ODS_HISTORIAL', 'data/historial/resultados.sqlite3')
+
+
+# ============================================================================
+# INICIATIVAS HISTÓRICAS
+# ============================================================================
+
+def textos_historial(ruta):
+    """Consultas guardadas en el historial de la app (vacío si no existe)."""
+    if not Path(ruta).is_file():
+        return []
+    con = sqlite3.connect(ruta)
+    try:
+        return [fila[0] for fila in con.execute('SELECT consulta FROM consultas')]
+    except sqlite3.OperationalError:
+        return []
+    finally:
+        con.close()
+
+
+def textos_archivo(ruta, columna='INICIATIVAS'):
+    tabla = pd.read_csv(ruta) if str(ruta).lower().endswith('.csv') else pd.read_excel(ruta)
+    return tabla[columna].dropna().astype(str).tolist()
+
+
+def codificar_iniciativas(textos, batch_size):
+    """Un bloque (n x d) por tabla, cada uno con la instrucción de iniciativas de esa tabla."""
+    modelo = obtener_modelo(MODEL_NAME)
+    bloques = []
+    for instruccion in INSTRUC_INICIATIVAS:
+        emb = compute_embeddings(modelo, make_text_pairs(instruccion, textos), batch_size=batch_size, normalize=True)
+        bloques.append(emb.cpu().numpy() if hasattr(emb, 'cpu') else np.asarray(emb, dtype=np.float32))
+    return bloques
+
+
+# ============================================================================
+# REPORTE
+# ============================================================================
+
+def milisegundos_matmul(consultas, matriz, repeticiones=20):
+    """Mediana del producto (9 x d) · (d x N) de `search`, en ms."""
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        consultas @ matriz.T
+        tiempos.append(time.perf_counter() - inicio)
+    return float(np.median(tiempos) * 1000)
+
+
+def imprimir_reporte(reporte, ks):
+    filas = []
+    for nombre, por_dimension in reporte['recall'].items():
+        fila = {'catalogo': nombre, 'filas': reporte['filas'][nombre]}
+        for dimension, recalls in por_dimension.items():
+            for k in ks:
+                fila[f'{dimension}d@{k}'] = recalls.get(str(k))
+        filas.append(fila)
+    print(pd.DataFrame(filas).to_string(index=False, float_format=lambda v: f'{v:.3f}', na_rep='-'))
+    print()
+    for dimension, costo in reporte['costo'].items():
+        print(f"{dimension:>5}d: matriz {costo['mb']:.2f} MB · matmul {costo['ms']:.3f} ms/consulta"
+              + (f" · energía {costo['energia']:.3f}" if 'energia' in costo else ''))
+
+
+# ============================================================================
+# MAIN
+# ============================================================================
+
+def main():
+    parser = argparse.ArgumentParser(description='Ajusta la proyección PCA de los embeddings y reporta recall@k.')
+    parser.add_argument('--dimensiones', type=int, nargs='+', default=list(DIMENSIONES_PCA))
+    parser.add_argument('--historial', default=RUTA_HISTORIAL, help='SQLite del historial de la app.')
+    parser.add_argument('--iniciativas', default=None, help='Excel/CSV con columna INICIATIVAS.')
+    parser.add_argument('--max-iniciativas', type=int, default=5000)
+    parser.add_argument('--fraccion-evaluacion', type=float, default=0.2,
+                        help='Iniciativas reservadas para medir el recall (no entran en el ajuste).')
+    parser.add_argument('--k', type=int, nargs='+', default=list(KS_RECALL))
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--destino', default=None, help=f'Directorio de salida (por defecto {CATALOGOS_OUT_DIR}).')
+    parser.add_argument('--sinteticos', type=int, default=0,
+                        help='N iniciativas y catálogos sintéticos con CodificadorHash (no guarda salvo con --destino).')
+    parser.add_argument('--semilla', type=int, default=0)
+    parser.add_argument('--reporte', default=None, help='Escribe el reporte en JSON.')
+    args = parser.parse_args()
+
+    if args.sinteticos:
+        from src.embeddings.codificador_hash import CodificadorHash
+        from src.embeddings.modelos_nlp_db import establecer_catalogos, establecer_modelo
+        from src.utils.sinteticos import generar_catalogos, generar_consultas
+        codificador = CodificadorHash()
+        establecer_modelo(codificador)
+        establecer_catalogos(*generar_catalogos(semilla=args.semilla, codificador=codificador))
+        textos = generar_consultas(args.sinteticos, semilla=args.semilla + 1)
+    else:
+        textos = textos_historial(args.historial)
+        if args.iniciativas:
+            textos += textos_archivo(args.iniciativas)
+    catalogos = cargar_catalogos(dimension_pca=None)
+
+    textos = list(dict.fromkeys(t.strip() for t in textos if t and t.strip()))
+    rng = np.random.default_rng(args.semilla)
+    if len(textos) > args.max_iniciativas:
+        textos = [textos[i] for i in np.sort(rng.choice(len(textos), args.max_iniciativas, replace=False))]
+    if len(textos) < 10:
+        parser.error(f'se necesitan al menos 10 iniciativas históricas para medir el recall (hay {len(textos)}); '
+                     'use --iniciativas o --historial')
+
+    print(f"Codificando {len(textos)} iniciativas x {len(INSTRUC_INICIATIVAS)} instrucciones...")
+    bloques = codificar_iniciativas(textos, args.batch_size)
+    evaluacion = rng.random(len(textos)) < args.fraccion_evaluacion
+    muestras = np.vstack([catalogos['matriz']] + [bloque[~evaluacion] for bloque in bloques])
+    print(f"Ajuste sobre {len(muestras)} vectores ({len(catalogos['matriz'])} de catálogos); "
+          f"recall sobre {int(evaluacion.sum())} iniciativas reservadas")
+
+    matriz = catalogos['matriz']
+    consultas = np.vstack([bloque[:1] for bloque in bloques])
+    reporte = {
+        'modelo': MODEL_NAME,
+        'iniciativas': len(textos),
+        'evaluacion': int(evaluacion.sum()),
+        'filas': {nombre: fin - inicio for nombre, (inicio, fin) in zip(CATALOGOS_PREFIJO_CACHE, catalogos['offsets'])},
+        'recall': {nombre: {} for nombre in CATALOGOS_PREFIJO_CACHE},
+        'costo': {str(matriz.shape[1]): {'mb': matriz.nbytes / 2**20, 'ms': milisegundos_matmul(consultas, matriz)}},
+    }
+    destino = args.destino or (None if args.sinteticos else CATALOGOS_OUT_DIR)
+
+    for dimension in args.dimensiones:
+        inicio = time.perf_counter()
+        componentes, energia = ajustar_proyeccion(muestras, dimension)
+        recall = {}
+        for nombre, bloque, (a, b) in zip(CATALOGOS_PREFIJO_CACHE, bloques, catalogos['offsets']):
+            recall[nombre] = {str(k): v for k, v in evaluar_recall(bloque[evaluacion], matriz[a:b], componentes, args.k).items()}
+            reporte['recall'][nombre][str(dimension)] = recall[nombre]
+        reducida = proyectar(matriz, componentes)
+        reporte['costo'][str(dimension)] = {'mb': reducida.nbytes / 2**20, 'energia': energia,
+                                            'ms': milisegundos_matmul(proyectar(consultas, componentes), reducida)}
+        if destino is not None:
+            ruta = ruta_proyeccion(dimension, destino)
+            Path(ruta).parent.mkdir(parents=True, exist_ok=True)
+            save_cache(str(ruta), {
+                'model_name': MODEL_NAME,
+                'dimension': dimension,
+                'dimension_original': int(matriz.shape[1]),
+                'energia': energia,
+                'filas_catalogo': int(len(matriz)),
+                'fingerprints': CATALOGOS_FINGERPRINT,
+                'iniciativas_ajuste': int((~evaluacion).sum()),
+                'recall': recall,
+                'creado': datetime.now().isoformat(timespec='seconds'),
+            }, componentes)
+            print(f"✓ {dimension}d guardada en {ruta} ({time.perf_counter() - inicio:.1f} s)")
+
+    print()
+    imprimir_reporte(reporte, args.k)
+    if args.reporte:
+        Path(args.reporte).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.reporte, 'w', encoding='utf-8') as f:
+            json.dump(reporte, f, ensure_ascii=False, indent=2)
+        print(f"\nReporte: {args.reporte}")
+
+
+if __name__ == "__main__":
+    main()
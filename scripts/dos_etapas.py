@@ -0,0 +1,139 @@
+"""
+AJUSTE DE LA RECUPERACIÓN EN DOS ETAPAS
+=======================================
+
+Compara, para varios tamaños del conjunto de candidatos, la latencia de
+`search()` en dos etapas (dimensión reducida → re-rank exacto) contra la
+búsqueda exacta en dimensión completa y contra la dimensión reducida en
+una sola etapa:
+
+- p50 de la solicitud completa y de cada etapa (`primera_etapa`,
+  `segunda_etapa`, o `cos_sim` en una etapa), tomados del desglose que
+  registra `medir_etapa`;
+- exactitud por tabla: fracción del top-K exacto que devuelve cada modo
+  (solo tablas cuyo top-K es menor que el catálogo).
+
+Por defecto usa catálogos sintéticos codificados con `CodificadorHash` y
+ajusta la proyección al vuelo; con `--reales` usa los catálogos y la
+proyección guardada (`python -m scripts.construir_pca`).
+
+Uso:
+    python -m scripts.dos_etapas --filas 100000 --candidatos 50 200 1000
+    python -m scripts.dos_etapas --reales --dimension 256 --candidatos 20 50
+"""
+
+import argparse
+import logging
+
+import numpy as np
+import pandas as pd
+
+from src.embeddings import modelos_nlp_db
+from src.embeddings.modelos_nlp_db import CATALOGOS_PREFIJO_CACHE, search
+from src.embeddings.proyeccion_pca import ajustar_proyeccion
+from src.utils.instrumentacion import logger
+from src.utils.sinteticos import generar_consultas
+
+ETAPAS = ['codificacion', 'cos_sim', 'primera_etapa', 'segunda_etapa', 'ranking', 'construccion_frames', 'minmax', 'merge_bdl']
+
+
+class CapturaEtapas(logging.Handler):
+    """Guarda el desglose por etapa de cada solicitud `search`."""
+
+    def __init__(self):
+        super().__init__(logging.INFO)
+        self.solicitudes = []
+
+    def emit(self, record):
+        campos = getattr(record, 'campos', None) or {}
+        if campos.get('operacion') == 'search' and 'etapas' in campos:
+            self.solicitudes.append(dict(campos['etapas'], total=campos['duracion_s']))
+
+
+def similaridades(resultado, idx):
+    """Similaridades coseno devueltas para la tabla `idx` (primera columna float32)."""
+    df = resultado[idx + 1]
+    return df[df.select_dtypes('float32').columns[0]].to_numpy()
+
+
+def fraccion_exacta(resultado, exacto, idx, tolerancia=1e-5):
+    """
+    Fracción del top-K exacto recuperada, comparando similaridades y no IDs:
+    con empates (textos repetidos) cualquier fila con la misma similaridad
+    que la K-ésima exacta es igual de válida.
+    """
+    obtenidas, esperadas = similaridades(resultado, idx), similaridades(exacto, idx)
+    k = len(esperadas)
+    return float((obtenidas[:k] >= esperadas[-1] - tolerancia).sum() / k)
+
+
+def medir(consultas, captura, **kwargs):
+    search(consultas[0], **kwargs)   # calentamiento
+    captura.solicitudes.clear()
+    resultados = [search(q, **kwargs) for q in consultas]
+    tiempos = pd.DataFrame(captura.solicitudes)
+    return resultados, {etapa: float(tiempos[etapa].median() * 1000) for etapa in ['total'] + ETAPAS if etapa in tiempos}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Latencia y exactitud de search() en dos etapas.')
+    parser.add_argument('--candidatos', type=int, nargs='+', default=[20, 50, 200, 1000])
+    parser.add_argument('--top-k', type=int, default=10, help='Top-K de ODS, metas e indicadores (enfoques y PDET: 1).')
+    parser.add_argument('--dimension', type=int, default=256, help='Dimensión de la proyección.')
+    parser.add_argument('--consultas', type=int, default=50)
+    parser.add_argument('--filas', type=int, default=10000, help='Indicadores del catálogo sintético.')
+    parser.add_argument('--reales', action='store_true', help='Catálogos reales y proyección guardada.')
+    parser.add_argument('--semilla', type=int, default=0)
+    args = parser.parse_args()
+
+    captura = CapturaEtapas()
+    logger.addHandler(captura)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+    consultas = generar_consultas(args.consultas, semilla=args.semilla + 1)
+    if args.reales:
+        catalogos = modelos_nlp_db.cargar_catalogos(dimension_pca=args.dimension)
+        if catalogos.get('proyeccion') is None:
+            parser.error(f'no hay proyección de {args.dimension}d; constrúyela con python -m scripts.construir_pca')
+    else:
+        from src.embeddings.codificador_hash import CodificadorHash
+        from src.utils.sinteticos import generar_catalogos
+        codificador = CodificadorHash()
+        modelos_nlp_db.establecer_modelo(codificador)
+        print(f"Codificando catálogo sintético de {args.filas} indicadores...")
+        dfs, embeddings = generar_catalogos(args.filas, semilla=args.semilla, codificador=codificador)
+        componentes, energia = ajustar_proyeccion(np.vstack(embeddings), args.dimension)
+        modelos_nlp_db.establecer_catalogos(dfs, embeddings, proyeccion={'componentes': componentes, 'meta': {}})
+        catalogos = modelos_nlp_db.cargar_catalogos()
+        print(f"Proyección {args.dimension}d ajustada (energía {energia:.3f})")
+
+    offsets = catalogos['offsets']
+    tops_k = [args.top_k] * 3 + [1] * 6
+    evaluadas = [idx for idx, (inicio, fin) in enumerate(offsets) if tops_k[idx] < fin - inicio]
+    # Con más candidatos que filas, la segunda etapa calcula el coseno exacto de todo el catálogo
+    exactos, tiempos = medir(consultas, captura, tops_k=tops_k, candidatos=len(catalogos['matriz']))
+    modos = {'exacto': tiempos}
+    exactitud = {'exacto': {idx: 1.0 for idx in evaluadas}}
+
+    # Una etapa en dimensión reducida: solo latencia (sus similaridades no son
+    # las exactas; su recall lo reporta scripts.construir_pca)
+    _, modos['reducida'] = medir(consultas, captura, tops_k=tops_k, candidatos=0)
+    for candidatos in args.candidatos:
+        etiqueta = f'{candidatos} candidatos'
+        resultados, modos[etiqueta] = medir(consultas, captura, tops_k=tops_k, candidatos=candidatos)
+        exactitud[etiqueta] = {
+            idx: float(np.mean([fraccion_exacta(r, e, idx) for r, e in zip(resultados, exactos)]))
+            for idx in evaluadas
+        }
+
+    print(f"\nLatencia p50 (ms) sobre {len(consultas)} consultas, top-K={args.top_k}:")
+    print(pd.DataFrame(modos).T.to_string(float_format=lambda v: f'{v:.2f}', na_rep='-'))
+    print("\nFracción del top-K exacto recuperada:")
+    tabla = pd.DataFrame(exactitud).T
+    tabla.columns = [f'{CATALOGOS_PREFIJO_CACHE[idx]} ({offsets[idx][1] - offsets[idx][0]})' for idx in evaluadas]
+    print(tabla.to_string(float_format=lambda v: f'{v:.3f}'))
+
+
+if __name__ == "__main__":
+    main()
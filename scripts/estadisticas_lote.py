@@ -0,0 +1,90 @@
+"""
+ANÁLISIS ESTADÍSTICO EN STREAMING
+=================================
+
+`analisis_estadistico` sobre resultados que no caben en memoria, con
+`EstadisticasOnline` (`src.visualization.estadisticas_online`) alimentado
+lote a lote desde:
+
+- `--resultados`: una exportación de resultados (directorio de particiones
+  Parquet, Parquet, Arrow, CSV o tabla markdown) con las columnas del
+  nivel (p. ej. ODS_ID, ods_similaridad_cos, ods_rank);
+- `--entrada` / `--sinteticas`: iniciativas que se clasifican por lotes
+  con `clasificar_lote`; cada lote se resume y se descarta. Con
+  `--parquet-salida` además se escribe como partición (`parte-00001.parquet`)
+  para repetir el análisis sin volver a clasificar.
+
+Uso:
+    python -m scripts.estadisticas_lote --resultados resultados/ods/ --nivel ODS
+    python -m scripts.estadisticas_lote --entrada patr.csv --nivel META --lote 5000
+    python -m scripts.estadisticas_lote --sinteticas 100000 --parquet-salida /tmp/ods
+"""
+
+import argparse
+import time
+from pathlib import Path
+
+from src.embeddings.modelos_nlp_db import clasificar_lote, establecer_modelo, establecer_catalogos
+from src.utils.carga_resultados import leer_por_lotes
+from src.visualization.visualizaciones_ods import analisis_estadistico_online
+from scripts.construir_cubo import lotes_entrada
+
+# Nivel -> (id_lvl, score, rank, posición en la salida de clasificar_lote)
+NIVELES = {
+    'ODS': ('ODS_ID', 'ods_similaridad_cos', 'ods_rank', 0),
+    'META': ('META_ID', 'meta_similaridad_cos', 'meta_rank', 1),
+    'INDICADOR': ('INDICADOR_ID', 'indicador_similaridad_cos', 'indicador_rank', 2),
+}
+
+
+def lotes_clasificados(lotes_iniciativas, posicion, parquet_salida=None):
+    """Clasifica cada lote de iniciativas y devuelve la tabla del nivel."""
+    if parquet_salida:
+        Path(parquet_salida).mkdir(parents=True, exist_ok=True)
+    filas = 0
+    for i, iniciativas in enumerate(lotes_iniciativas, 1):
+        t0 = time.perf_counter()
+        df = clasificar_lote(iniciativas['INICIATIVAS'].astype(str).tolist())[posicion]
+        filas += len(df)
+        if parquet_salida:
+            df.to_parquet(Path(parquet_salida) / f'parte-{i:05d}.parquet', index=False)
+        print(f"  lote {i}: {len(iniciativas)} iniciativas · {len(df)} filas · {time.perf_counter() - t0:.1f} s "
+              f"(acumulado {filas} filas)")
+        yield df
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Análisis estadístico por lotes (memoria acotada).')
+    parser.add_argument('--resultados', default=None, help='Exportación de resultados (Parquet, Arrow, CSV o markdown).')
+    parser.add_argument('--entrada', default=None, help='CSV/Excel con ID, INICIATIVAS y MUNICIPIO.')
+    parser.add_argument('--sinteticas', type=int, default=0, help='Generar N iniciativas y catálogos sintéticos (offline).')
+    parser.add_argument('--nivel', choices=list(NIVELES), default='ODS')
+    parser.add_argument('--lote', type=int, default=5000, help='Iniciativas (o filas Parquet) por lote.')
+    parser.add_argument('--parquet-salida', default=None, help='Directorio donde guardar cada lote clasificado.')
+    parser.add_argument('--semilla', type=int, default=0)
+    args = parser.parse_args()
+
+    id_lvl, score, rank, posicion = NIVELES[args.nivel]
+    if args.resultados:
+        lotes = leer_por_lotes(args.resultados, columnas=[id_lvl, score, rank], filas_lote=args.lote * 100)
+    else:
+        if args.sinteticas:
+            from src.embeddings.codificador_hash import CodificadorHash
+            from src.utils.sinteticos import generar_catalogos, generar_iniciativas
+            establecer_modelo(CodificadorHash())
+            establecer_catalogos(*generar_catalogos(semilla=args.semilla))
+            patr = generar_iniciativas(args.sinteticas, semilla=args.semilla)
+            iniciativas = (patr.iloc[i:i + args.lote] for i in range(0, len(patr), args.lote))
+        elif args.entrada:
+            iniciativas = lotes_entrada(args.entrada, args.lote)
+        else:
+            parser.error('indica --resultados, --entrada o --sinteticas')
+        lotes = lotes_clasificados(iniciativas, posicion, args.parquet_salida)
+
+    inicio = time.perf_counter()
+    analisis_estadistico_online(lotes, id_lvl, score, rank)
+    print(f"\n✓ Análisis en {time.perf_counter() - inicio:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
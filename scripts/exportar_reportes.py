@@ -0,0 +1,92 @@
+"""
+EXPORTACIÓN DE REPORTES EN LOTE
+===============================
+
+Clasifica muchas iniciativas con `clasificar_lote` (todos los ODS por
+iniciativa) y exporta las diez visualizaciones de cada una como un
+reporte independiente, en paralelo (`src.visualization.exportacion`):
+
+- `--formato html`: un archivo autocontenido por iniciativa.
+- `--formato zip`: un ZIP por iniciativa con `index.html`, un plotly.js
+  compartido por todas sus figuras y los heatmaps en PNG.
+
+Las iniciativas se leen de un archivo de texto (una por línea) o de una
+columna de un CSV/Excel. Con `--sinteticas N` se generan N iniciativas y
+se usan `CodificadorHash` y catálogos sintéticos (sin red ni GPU).
+
+Uso:
+    python -m scripts.exportar_reportes --entrada iniciativas.txt --salida reportes/
+    python -m scripts.exportar_reportes --entrada patr.xlsx --columna INICIATIVA \\
+        --formato zip --workers 4 --limite 60
+    python -m scripts.exportar_reportes --sinteticas 20 --salida /tmp/reportes
+"""
+
+import argparse
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from src.embeddings.modelos_nlp_db import clasificar_lote, establecer_modelo, establecer_catalogos
+from src.visualization.exportacion import FORMATOS_REPORTE, exportar_reportes, reportes_desde_lote
+
+# Top-K por tabla para el lote: todos los ODS (clasificar_lote recorta al
+# tamaño del catálogo); las demás tablas no se usan en los reportes
+TOPS_K_REPORTES = [10**6, 1, 1, 1, 1, 1, 1, 1, 1]
+
+
+def leer_iniciativas(ruta, columna=None):
+    ruta = Path(ruta)
+    if ruta.suffix.lower() in ('.csv', '.xlsx', '.xls'):
+        df = pd.read_csv(ruta) if ruta.suffix.lower() == '.csv' else pd.read_excel(ruta)
+        columna = columna or df.columns[0]
+        return [str(t).strip() for t in df[columna].dropna() if str(t).strip()]
+    with open(ruta, encoding='utf-8') as f:
+        return [linea.strip() for linea in f if linea.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Exporta un reporte de visualizaciones por iniciativa, en paralelo.')
+    parser.add_argument('--entrada', default=None, help='Archivo .txt (una iniciativa por línea), .csv o .xlsx.')
+    parser.add_argument('--columna', default=None, help='Columna con el texto en CSV/Excel (por defecto la primera).')
+    parser.add_argument('--sinteticas', type=int, default=0, help='Generar N iniciativas y catálogos sintéticos (offline).')
+    parser.add_argument('--salida', default='reportes', help='Directorio de los reportes.')
+    parser.add_argument('--formato', choices=FORMATOS_REPORTE, default='html')
+    parser.add_argument('--workers', type=int, default=None, help='Procesos del pool (por defecto, núcleos; 0 = sin pool).')
+    parser.add_argument('--limite', type=float, default=120.0, help='Presupuesto de tiempo por reporte (s).')
+    parser.add_argument('--semilla', type=int, default=0)
+    args = parser.parse_args()
+
+    if args.sinteticas:
+        from src.embeddings.codificador_hash import CodificadorHash
+        from src.utils.sinteticos import generar_catalogos, generar_consultas
+        establecer_modelo(CodificadorHash())
+        establecer_catalogos(*generar_catalogos(semilla=args.semilla))
+        textos = generar_consultas(args.sinteticas, semilla=args.semilla)
+    elif args.entrada:
+        textos = leer_iniciativas(args.entrada, args.columna)
+    else:
+        parser.error('indica --entrada o --sinteticas')
+
+    inicio = time.perf_counter()
+    print(f"Clasificando {len(textos)} iniciativas...")
+    df_ods = clasificar_lote(textos, tops_k=TOPS_K_REPORTES)[0]
+    reportes = reportes_desde_lote(df_ods, textos)
+    print(f"✓ Clasificación: {time.perf_counter() - inicio:.1f} s")
+
+    print(f"Exportando {len(reportes)} reportes ({args.formato}) en {args.salida}...")
+    resultados = exportar_reportes(
+        reportes, args.salida, formato=args.formato, workers=args.workers, limite_segundos=args.limite,
+    )
+    estados = pd.Series([r['estado'] for r in resultados]).value_counts()
+    total = sum(r.get('bytes', 0) for r in resultados)
+    print(f"✓ {estados.get('ok', 0)}/{len(resultados)} reportes ({total / 2**20:.1f} MB) "
+          f"en {time.perf_counter() - inicio:.1f} s")
+    for estado, n in estados.items():
+        if estado != 'ok':
+            print(f"⚠️  {n} reportes con estado {estado}")
+    print(f"  Índice: {Path(args.salida) / 'indice.json'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+CONSULTA DEL HISTORIAL DE CLASIFICACIONES
+=========================================
+
+Lectura del historial SQLite que guarda la app (`VOCES_ODS_HISTORIAL`,
+por defecto data/historial/resultados.sqlite3) sin recalcular nada:
+
+- `--consulta TEXTO`: resultado guardado de una iniciativa (top ODS, metas
+  e indicadores);
+- `--ods`, `--meta`, `--indicador`, `--municipio`, `--max-rank`: consultas
+  guardadas que clasificaron en ese nivel;
+- `--sql`: consulta libre (p. ej. sobre las vistas v_ods, v_metas,
+  v_indicadores).
+
+Uso:
+    python -m scripts.historial --resumen
+    python -m scripts.historial --ods 6 --max-rank 1 --municipio "Tumaco"
+    python -m scripts.historial --sql "SELECT ods_id, COUNT(*) FROM v_ods WHERE rank = 1 GROUP BY ods_id"
+"""
+
+import argparse
+import os
+import time
+
+import pandas as pd
+
+from src.embeddings.modelos_nlp_db import MODEL_NAME
+from src.utils.historial_resultados import HistorialResultados
+
+RUTA_HISTORIAL = os.environ.get('VOCES_ODS_HISTORIAL', 'data/historial/resultados.sqlite3')
+
+
+def _id_nivel(valor):
+    """Los ODS_ID se guardan como enteros; META_ID e INDICADOR_ID como texto."""
+    return int(valor) if valor is not None and valor.isdigit() else valor
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Consulta el historial de clasificaciones.')
+    parser.add_argument('--db', default=RUTA_HISTORIAL, help='Archivo SQLite del historial.')
+    parser.add_argument('--modelo', default=MODEL_NAME, help='Modelo con el que se guardó la consulta.')
+    parser.add_argument('--consulta', default=None, help='Texto exacto de una iniciativa ya clasificada.')
+    parser.add_argument('--ods', default=None)
+    parser.add_argument('--meta', default=None)
+    parser.add_argument('--indicador', default=None)
+    parser.add_argument('--municipio', default=None)
+    parser.add_argument('--max-rank', type=int, default=None)
+    parser.add_argument('--limite', type=int, default=20)
+    parser.add_argument('--sql', default=None, help='Consulta SQL libre.')
+    parser.add_argument('--resumen', action='store_true')
+    args = parser.parse_args()
+
+    historial = HistorialResultados(args.db, modelo=args.modelo)
+    pd.set_option('display.width', 160)
+    pd.set_option('display.max_colwidth', 60)
+
+    inicio = time.perf_counter()
+    if args.resumen:
+        print(historial.estadisticas())
+    elif args.sql:
+        print(historial.sql(args.sql).to_string(index=False))
+    elif args.consulta:
+        tablas = historial.obtener(args.consulta)
+        if tablas is None:
+            print('La consulta no está en el historial.')
+        else:
+            for titulo, tabla in zip(('ODS', 'METAS', 'INDICADORES'), tablas[:3]):
+                print(f"\n{titulo}\n{tabla.head(args.limite).to_string(index=False)}")
+    else:
+        tabla = historial.buscar(ods_id=_id_nivel(args.ods), meta_id=args.meta, indicador_id=args.indicador,
+                                 municipio=args.municipio, max_rank=args.max_rank, limite=args.limite)
+        print(tabla.to_string(index=False))
+    print(f"\n({(time.perf_counter() - inicio) * 1000:.1f} ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,188 @@
-from PIL import Image
+"""
+OPTIMIZACIÓN INCREMENTAL DE LOGOS
+=================================
+
+Recorre `institucional/`, `ods/` y `metas/` dentro de
+`config/institucional/logos` y genera, para cada imagen, variantes WebP
+de varios tamaños (lado mayor en píxeles, sin ampliar nunca):
+
+- `miniatura` (64), `tarjeta` (160) y `completa` (800)
+
+Las variantes se escriben en `optimizadas/<subdirectorio>/<nombre>-<variante>.webp`
+y se describen en `optimizadas/manifest.json` (hash del original, tamaños
+y bytes de cada variante), que la UI usa para pedir la imagen más pequeña
+que cabe (`src.utils.logos.url_logo(ruta, lado=...)`).
+
+- Las imágenes se procesan en un pool de procesos.
+- Es incremental: una imagen cuyo contenido (sha256) y parámetros no
+  cambiaron desde la última corrida, y cuyas variantes existen, se omite.
+- Las entradas de originales que ya no existen se eliminan del manifest
+  junto con sus archivos.
+
+Uso:
+    python -m scripts.optimize_images
+    python -m scripts.optimize_images --workers 4 --calidad 80 --forzar
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
 
-def optimize_images(input_dir="config/institucional/logos", max_size=(800, 800)):
-    """Optimiza imágenes institucionales"""
-    
-    input_path = Path(input_dir)
-    
-    for img_file in input_path.glob("*.png"):
-        img = Image.open(img_file)
-        
-        # Redimensionar si es necesario
-        img.thumbnail(max_size, Image.Resampling.LANCZOS)
-        
-        # Guardar como WebP (mejor compresión)
-        output_file = img_file.with_suffix('.webp')
-        img.save(output_file, 'WEBP', quality=85, method=6)
-        
-        print(f"Optimizado: {img_file.name} -> {output_file.name}")
-        print(f"  Reducción: {img_file.stat().st_size / 1024:.1f}KB -> {output_file.stat().st_size / 1024:.1f}KB")
\ No newline at end of file
+from PIL import Image
+
+ENTRADA = Path("config/institucional/logos")
+SUBDIRECTORIOS = ('institucional', 'ods', 'metas')
+EXTENSIONES = {'.png', '.jpg', '.jpeg', '.webp'}
+SALIDA = 'optimizadas'
+VARIANTES = {'miniatura': 64, 'tarjeta': 160, 'completa': 800}
+CALIDAD = 85
+VERSION_MANIFEST = 1
+
+
+def huella_archivo(ruta, parametros):
+    """sha256 del contenido más los parámetros que afectan el resultado."""
+    h = hashlib.sha256(ruta.read_bytes())
+    h.update(json.dumps(parametros, sort_keys=True).encode('utf-8'))
+    return h.hexdigest()
+
+
+def listar_originales(entrada, subdirectorios=SUBDIRECTORIOS):
+    originales = []
+    for subdirectorio in subdirectorios:
+        carpeta = entrada / subdirectorio
+        if carpeta.is_dir():
+            originales.extend(p for p in sorted(carpeta.rglob('*')) if p.suffix.lower() in EXTENSIONES)
+    return originales
+
+
+def procesar_imagen(origen, relativa, salida, variantes, calidad, huella):
+    """Genera las variantes de una imagen (se ejecuta en el worker) y devuelve su entrada de manifest."""
+    entrada = {'hash': huella, 'variantes': {}}
+    with Image.open(origen) as imagen:
+        imagen.load()
+        entrada['original'] = {'ancho': imagen.width, 'alto': imagen.height, 'bytes': origen.stat().st_size}
+        modo = 'RGBA' if imagen.mode in ('RGBA', 'LA', 'P') else 'RGB'
+        base = imagen.convert(modo)
+
+    for nombre, lado in variantes.items():
+        variante = base.copy()
+        variante.thumbnail((lado, lado), Image.Resampling.LANCZOS)
+        destino = Path(relativa).with_name(f'{Path(relativa).stem}-{nombre}.webp')
+        ruta = salida / destino
+        ruta.parent.mkdir(parents=True, exist_ok=True)
+        temporal = ruta.with_suffix(f'.{os.getpid()}.tmp')
+        variante.save(temporal, 'WEBP', quality=calidad, method=6)
+        os.replace(temporal, ruta)
+        entrada['variantes'][nombre] = {
+            'ruta': destino.as_posix(),
+            'ancho': variante.width,
+            'alto': variante.height,
+            'bytes': ruta.stat().st_size,
+        }
+    return relativa, entrada
+
+
+def cargar_manifest(ruta):
+    try:
+        with open(ruta, encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get('version') == VERSION_MANIFEST:
+            return manifest
+    except (OSError, ValueError):
+        pass
+    return {'version': VERSION_MANIFEST, 'imagenes': {}}
+
+
+def guardar_manifest(ruta, manifest):
+    temporal = ruta.with_suffix('.tmp')
+    with open(temporal, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1, sort_keys=True)
+    os.replace(temporal, ruta)
+
+
+def vigente(entrada, huella, salida):
+    return (entrada is not None and entrada.get('hash') == huella
+            and all((salida / v['ruta']).exists() for v in entrada.get('variantes', {}).values()))
+
+
+def optimize_images(input_dir=ENTRADA, variantes=None, calidad=CALIDAD, workers=None, forzar=False):
+    """Optimiza los logos de `input_dir` de forma incremental y devuelve el manifest."""
+    entrada = Path(input_dir)
+    salida = entrada / SALIDA
+    salida.mkdir(parents=True, exist_ok=True)
+    variantes = dict(variantes or VARIANTES)
+    parametros = {'variantes': variantes, 'calidad': calidad}
+
+    ruta_manifest = salida / 'manifest.json'
+    manifest = cargar_manifest(ruta_manifest)
+    previas = manifest['imagenes']
+
+    inicio = time.perf_counter()
+    originales = listar_originales(entrada)
+    pendientes, imagenes = [], {}
+    for origen in originales:
+        relativa = origen.relative_to(entrada).as_posix()
+        huella = huella_archivo(origen, parametros)
+        if not forzar and vigente(previas.get(relativa), huella, salida):
+            imagenes[relativa] = previas[relativa]
+        else:
+            pendientes.append((origen, relativa, huella))
+
+    print(f"{len(originales)} imágenes · {len(imagenes)} sin cambios · {len(pendientes)} por procesar")
+
+    errores = {}
+    if pendientes:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futuros = {
+                pool.submit(procesar_imagen, origen, relativa, salida, variantes, calidad, huella): relativa
+                for origen, relativa, huella in pendientes
+            }
+            for i, futuro in enumerate(as_completed(futuros), 1):
+                relativa = futuros[futuro]
+                try:
+                    _, entrada_manifest = futuro.result()
+                except Exception as e:
+                    errores[relativa] = f'{type(e).__name__}: {e}'
+                    print(f"  ✗ {relativa}: {errores[relativa]}")
+                    # Se conserva la entrada anterior (si la hay); su hash fuerza el reintento
+                    if relativa in previas:
+                        imagenes[relativa] = previas[relativa]
+                    continue
+                imagenes[relativa] = entrada_manifest
+                if i % 25 == 0 or i == len(futuros):
+                    print(f"  {i}/{len(futuros)} procesadas")
+
+    # Originales que ya no existen: fuera del manifest y sus variantes del disco
+    for relativa in set(previas) - set(imagenes):
+        for variante in previas[relativa].get('variantes', {}).values():
+            (salida / variante['ruta']).unlink(missing_ok=True)
+
+    manifest = {'version': VERSION_MANIFEST, 'variantes': variantes, 'calidad': calidad, 'imagenes': imagenes}
+    guardar_manifest(ruta_manifest, manifest)
+
+    bytes_originales = sum(e['original']['bytes'] for e in imagenes.values())
+    print(f"✓ Manifest: {ruta_manifest} ({time.perf_counter() - inicio:.1f} s)")
+    for nombre in variantes:
+        total = sum(e['variantes'][nombre]['bytes'] for e in imagenes.values() if nombre in e['variantes'])
+        print(f"  {nombre:10s} {total / 1024:9.1f} KB (originales: {bytes_originales / 1024:.1f} KB)")
+    if errores:
+        print(f"⚠️  {len(errores)} imágenes con error")
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Optimización incremental de logos con variantes por tamaño.')
+    parser.add_argument('--entrada', default=str(ENTRADA), help='Directorio de logos.')
+    parser.add_argument('--workers', type=int, default=None, help='Procesos del pool (por defecto, núcleos disponibles).')
+    parser.add_argument('--calidad', type=int, default=CALIDAD, help='Calidad WebP (0-100).')
+    parser.add_argument('--forzar', action='store_true', help='Regenerar aunque el contenido no haya cambiado.')
+    args = parser.parse_args()
+    optimize_images(args.entrada, calidad=args.calidad, workers=args.workers, forzar=args.forzar)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,331 @@
+"""
+PRUEBA DE CARGA CONCURRENTE
+===========================
+
+Simula N usuarios simultáneos recorriendo los manejadores reales de la
+aplicación Gradio (`app.py`):
+
+1. Consulta en la pestaña básica y en la especializada (`consultar`)
+2. `tab_inicio` y `tab_viz1` con los tres niveles (ODS, META, INDICADOR)
+3. `tab_viz2` ... `tab_viz10` y `tab_estadisticas` sobre el resultado ODS
+
+Cada usuario es un hilo; los usuarios se reparten entre varios procesos
+(workers), igual que varias réplicas del servidor. Entre el manejador y el
+"navegador" se replica el transporte de Gradio: los DataFrames se
+serializan con `gr.Dataframe.postprocess` a JSON y se reconstruyen con
+`preprocess`, y las figuras Plotly pasan por `gr.Plot.postprocess`.
+
+Usa `CodificadorHash` y catálogos sintéticos, así que corre sin red ni GPU.
+Reporta latencia p50/p95/p99 por operación, tasa de error, throughput y
+memoria residente por worker.
+
+Uso:
+    python -m scripts.prueba_carga --usuarios 8 --workers 2 --iteraciones 3 \\
+        --salida resultados/carga.json
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import threading
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+# Pestañas de consulta: la especializada reutiliza el mismo manejador `consultar`
+PESTANAS_CONSULTA = ('basica', 'especializada')
+
+OPERACIONES_ODS = ['tab_viz2', 'tab_viz3', 'tab_viz4', 'tab_viz5', 'tab_viz6',
+                   'tab_viz7', 'tab_viz8', 'tab_viz9', 'tab_viz10', 'tab_estadisticas']
+
+
+# ============================================================================
+# MEMORIA
+# ============================================================================
+
+def memoria_actual_mb():
+    """Memoria residente actual del proceso (MB), vía /proc si existe."""
+    try:
+        with open('/proc/self/statm') as f:
+            paginas = int(f.read().split()[1])
+        return paginas * os.sysconf('SC_PAGE_SIZE') / 2**20
+    except (OSError, ValueError):
+        return None
+
+
+def memoria_pico_mb():
+    """Pico de memoria residente del proceso (MB)."""
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reporta KB; macOS, bytes
+    return pico / 2**20 if platform.system() == 'Darwin' else pico / 2**10
+
+
+# ============================================================================
+# TRANSPORTE GRADIO
+# ============================================================================
+
+class Transporte:
+    """Ida y vuelta JSON de los componentes, como entre servidor y navegador."""
+
+    def __init__(self):
+        import gradio as gr
+        from gradio.components.dataframe import DataframeData
+        self._tabla = gr.Dataframe()
+        self._grafico = gr.Plot()
+        self._modelo_tabla = DataframeData
+
+    def tabla(self, df):
+        carga = self._tabla.postprocess(df).model_dump_json()
+        return self._tabla.preprocess(self._modelo_tabla.model_validate_json(carga)), len(carga)
+
+    def salida(self, valor):
+        """Bytes enviados al navegador por una salida de un manejador."""
+        import matplotlib.pyplot as plt
+        import plotly.graph_objects as go
+        from src.visualization.figuras_rapidas import FiguraLigera
+        if isinstance(valor, (go.Figure, FiguraLigera)):
+            return len(self._grafico.postprocess(valor).model_dump_json())
+        if isinstance(valor, plt.Figure):
+            plt.close(valor)
+            return 0
+        if isinstance(valor, str):
+            if os.path.isfile(valor):
+                return os.path.getsize(valor)
+            return len(valor.encode('utf-8'))
+        return 0
+
+
+# ============================================================================
+# USUARIO SIMULADO
+# ============================================================================
+
+def _registrar(registro, operacion, inicio, error=None, bytes_=0):
+    registro.append({
+        'operacion': operacion,
+        'duracion_s': time.perf_counter() - inicio,
+        'error': error,
+        'bytes': bytes_,
+    })
+
+
+def sesion_usuario(app, transporte, consultas, registro, clics=1):
+    """Recorre todas las pestañas (`clics` veces cada una) para cada consulta asignada al usuario."""
+    handle = None
+    for consulta in consultas:
+        listo = False
+        for pestana in PESTANAS_CONSULTA:
+            inicio = time.perf_counter()
+            try:
+                # Como en la app: al navegador solo viajan el handle y la primera
+                # página de cada tabla; las tablas completas quedan en el servidor
+                salidas = app.consultar(consulta, handle)
+                paginas, handle = salidas[1:11], salidas[11]
+                bytes_ = sum(transporte.tabla(df)[1] for df in paginas)
+                _registrar(registro, f'search/{pestana}', inicio, bytes_=bytes_)
+                listo = True
+            except Exception as e:
+                _registrar(registro, f'search/{pestana}', inicio, error=f'{type(e).__name__}: {e}')
+        if not listo:
+            continue
+
+        for nombre in (['tab_inicio', 'tab_viz1'] + OPERACIONES_ODS) * clics:
+            inicio = time.perf_counter()
+            try:
+                salidas = getattr(app, nombre)(handle)
+                if not isinstance(salidas, tuple):
+                    salidas = (salidas,)
+                bytes_ = sum(transporte.salida(s) for s in salidas)
+                _registrar(registro, nombre, inicio, bytes_=bytes_)
+            except Exception as e:
+                _registrar(registro, nombre, inicio, error=f'{type(e).__name__}: {e}')
+
+
+def ejecutar_worker(indice, usuarios, iteraciones, filas, dimension, semilla, pausa, clics=1, precalculo=0,
+                    historial=''):
+    """Proceso worker: prepara el entorno offline y lanza sus usuarios en hilos."""
+    os.environ.setdefault('MPLBACKEND', 'Agg')
+    os.environ['VOCES_ODS_PRECALCULO_WORKERS'] = str(precalculo)
+    os.environ['VOCES_ODS_HISTORIAL'] = historial
+    import matplotlib
+    matplotlib.use('Agg')
+
+    from src.embeddings.codificador_hash import CodificadorHash
+    from src.embeddings.modelos_nlp_db import establecer_modelo, establecer_catalogos
+    from src.utils.sinteticos import generar_catalogos, generar_consultas
+
+    memoria_base = memoria_actual_mb()
+    establecer_modelo(CodificadorHash(dimension=dimension))
+    establecer_catalogos(*generar_catalogos(filas, dimension=dimension, semilla=semilla))
+
+    import app
+    app.RENDER_ESTATICO.calentar()
+    transporte = Transporte()
+    memoria_lista = memoria_actual_mb()
+
+    registros = [[] for _ in range(usuarios)]
+    hilos = []
+    for u in range(usuarios):
+        consultas = generar_consultas(iteraciones, semilla=semilla + 1000 * indice + u)
+
+        def objetivo(u=u, consultas=consultas):
+            time.sleep(pausa * u)
+            try:
+                sesion_usuario(app, transporte, consultas, registros[u], clics)
+            except Exception:
+                registros[u].append({'operacion': 'sesion', 'duracion_s': 0.0,
+                                     'error': traceback.format_exc(limit=3), 'bytes': 0})
+
+        hilos.append(threading.Thread(target=objetivo, name=f'usuario-{indice}-{u}'))
+
+    inicio = time.perf_counter()
+    for h in hilos:
+        h.start()
+    for h in hilos:
+        h.join()
+    duracion = time.perf_counter() - inicio
+
+    # Los pools internos de la app se cierran explícitamente: un proceso hijo de
+    # multiprocessing no ejecuta los hooks atexit que los detendrían
+    app.PRECALCULO.cerrar()
+    app.RENDER_ESTATICO.cerrar()
+
+    from src.visualization.cache_figuras import CACHE_FIGURAS
+    return {
+        'worker': indice,
+        'pid': os.getpid(),
+        'usuarios': usuarios,
+        'duracion_s': duracion,
+        'cache_figuras': CACHE_FIGURAS.estadisticas(),
+        'memoria_mb': {
+            'inicio': memoria_base,
+            'tras_carga_app': memoria_lista,
+            'final': memoria_actual_mb(),
+            'pico': memoria_pico_mb(),
+        },
+        'registros': [r for registro in registros for r in registro],
+    }
+
+
+# ============================================================================
+# AGREGACIÓN
+# ============================================================================
+
+def resumen_latencias(registros):
+    t = np.asarray([r['duracion_s'] for r in registros if r['error'] is None], dtype=float)
+    errores = sum(r['error'] is not None for r in registros)
+    datos = {
+        'n': len(registros),
+        'errores': errores,
+        'tasa_error': errores / len(registros) if registros else 0.0,
+        'bytes_medios': float(np.mean([r['bytes'] for r in registros])) if registros else 0.0,
+    }
+    if t.size:
+        datos.update({
+            'p50_s': float(np.percentile(t, 50)),
+            'p95_s': float(np.percentile(t, 95)),
+            'p99_s': float(np.percentile(t, 99)),
+            'max_s': float(t.max()),
+        })
+    return datos
+
+
+def agregar(workers, duracion_total):
+    registros = [r for w in workers for r in w['registros']]
+    operaciones = sorted({r['operacion'] for r in registros})
+    por_operacion = {op: resumen_latencias([r for r in registros if r['operacion'] == op]) for op in operaciones}
+    ejemplos_error = {}
+    for r in registros:
+        if r['error'] is not None:
+            ejemplos_error.setdefault(r['operacion'], r['error'])
+    return {
+        'global': dict(resumen_latencias(registros),
+                       solicitudes_s=len(registros) / duracion_total if duracion_total else None),
+        'por_operacion': por_operacion,
+        'ejemplos_error': ejemplos_error,
+        'memoria_por_worker': {str(w['worker']): w['memoria_mb'] for w in workers},
+        'cache_figuras_por_worker': {str(w['worker']): w['cache_figuras'] for w in workers},
+    }
+
+
+def imprimir(agregado):
+    print("\n" + "=" * 78)
+    print(f"{'OPERACIÓN':22s} {'N':>5s} {'ERR%':>6s} {'P50 ms':>9s} {'P95 ms':>9s} {'P99 ms':>9s} {'KB':>8s}")
+    print("=" * 78)
+    for op, d in agregado['por_operacion'].items():
+        p = [f"{d[k] * 1000:9.1f}" if k in d else f"{'-':>9s}" for k in ('p50_s', 'p95_s', 'p99_s')]
+        print(f"{op:22s} {d['n']:5d} {d['tasa_error'] * 100:6.1f} {' '.join(p)} {d['bytes_medios'] / 1024:8.1f}")
+    g = agregado['global']
+    print("-" * 78)
+    print(f"Total: {g['n']} solicitudes, error {g['tasa_error'] * 100:.1f}%, "
+          f"{g['solicitudes_s']:.1f} solicitudes/s")
+    for worker, m in agregado['memoria_por_worker'].items():
+        c = agregado['cache_figuras_por_worker'][worker]
+        print(f"   worker {worker}: RSS final {m['final'] or 0:.0f} MB, pico {m['pico']:.0f} MB, "
+              f"cache de figuras {c['tasa_acierto'] * 100:.0f}% aciertos ({c['bytes'] / 2**20:.1f} MB)")
+    for op, error in agregado['ejemplos_error'].items():
+        print(f"   ✗ {op}: {error.strip().splitlines()[-1]}")
+
+
+# ============================================================================
+# EJECUCIÓN
+# ============================================================================
+
+def main():
+    parser = argparse.ArgumentParser(description='Prueba de carga concurrente sobre los manejadores de la app Gradio.')
+    parser.add_argument('--usuarios', type=int, default=4, help='Usuarios simultáneos en total.')
+    parser.add_argument('--workers', type=int, default=1, help='Procesos entre los que se reparten los usuarios.')
+    parser.add_argument('--iteraciones', type=int, default=2, help='Consultas que recorre cada usuario.')
+    parser.add_argument('--filas', type=int, default=244, help='Filas del catálogo sintético de indicadores.')
+    parser.add_argument('--dimension', type=int, default=768, help='Dimensión de los embeddings.')
+    parser.add_argument('--pausa', type=float, default=0.0, help='Desfase (s) entre el arranque de cada usuario.')
+    parser.add_argument('--clics', type=int, default=1, help='Veces que cada usuario abre cada pestaña por consulta.')
+    parser.add_argument('--precalculo', type=int, default=0, help='Hilos de precálculo de pestañas por worker (0 = desactivado).')
+    parser.add_argument('--historial', default='',
+                        help='Archivo SQLite del historial de resultados (vacío = desactivado; las consultas '
+                             'repetidas se leen de él).')
+    parser.add_argument('--semilla', type=int, default=0)
+    parser.add_argument('--salida', default=None, help='Ruta del JSON de resultados.')
+    args = parser.parse_args()
+
+    workers = max(1, min(args.workers, args.usuarios))
+    reparto = [args.usuarios // workers + (i < args.usuarios % workers) for i in range(workers)]
+    print(f"Lanzando {args.usuarios} usuarios en {workers} worker(s): {reparto}")
+
+    inicio = time.perf_counter()
+    # 'spawn': cada worker arranca como un servidor nuevo (y puede crear sus propios pools)
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+        futuros = [
+            pool.submit(ejecutar_worker, i, n, args.iteraciones, args.filas,
+                        args.dimension, args.semilla, args.pausa, args.clics, args.precalculo, args.historial)
+            for i, n in enumerate(reparto)
+        ]
+        resultados = [f.result() for f in futuros]
+    duracion = time.perf_counter() - inicio
+
+    agregado = agregar(resultados, duracion)
+    imprimir(agregado)
+
+    salida = {
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'entorno': {'python': platform.python_version(), 'plataforma': platform.platform(),
+                    'cpus': os.cpu_count()},
+        'parametros': vars(args),
+        'duracion_s': duracion,
+        'resultados': agregado,
+    }
+    ruta = Path(args.salida or f"carga_{datetime.now():%Y%m%d_%H%M%S}.json")
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    with open(ruta, 'w', encoding='utf-8') as f:
+        json.dump(salida, f, ensure_ascii=False, indent=2)
+    print(f"\n✓ Resultados guardados en {ruta}")
+
+
+if __name__ == "__main__":
+    main()
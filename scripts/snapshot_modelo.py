@@ -0,0 +1,74 @@
+"""
+SNAPSHOT OFFLINE DEL MODELO DE EMBEDDINGS
+=========================================
+
+Crea, verifica y mide el snapshot local del modelo que usan `search()` y
+`clasificar_lote` (`src.embeddings.snapshot_modelo`):
+
+- crear: descarga el modelo del hub (o lo lee de `--origen`, p. ej. un
+  directorio copiado a un equipo sin red), lo guarda con pesos safetensors
+  y escribe el manifiesto con revisión, versiones y sha256 de cada archivo;
+- `--verificar`: comprueba archivos, tamaños y sha256 contra el manifiesto;
+- `--medir`: tiempo hasta el modelo listo (import + carga + primera
+  codificación) desde el snapshot en modo offline estricto. Conviene
+  correrlo en un proceso nuevo, que es lo que mide el arranque de la app.
+
+Uso:
+    python -m scripts.snapshot_modelo                        # crea data/modelos/hkunlp--instructor-large
+    python -m scripts.snapshot_modelo --origen /media/usb/instructor-large
+    python -m scripts.snapshot_modelo --verificar --medir
+"""
+
+import argparse
+import sys
+import time
+
+from src.embeddings.modelos_nlp_db import MODEL_NAME
+from src.embeddings.snapshot_modelo import (
+    cargar_modelo, crear_snapshot, leer_manifiesto, ruta_snapshot, verificar_snapshot,
+)
+
+
+def medir_arranque(model_name):
+    """Segundos hasta el modelo listo desde el snapshot (este proceso no debe haberlo cargado antes)."""
+    inicio = time.perf_counter()
+    cargar_modelo(model_name)
+    return time.perf_counter() - inicio
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Snapshot local (safetensors + manifiesto) del modelo de embeddings.')
+    parser.add_argument('--modelo', default=MODEL_NAME)
+    parser.add_argument('--revision', default=None, help='Rama, tag o commit del hub a fijar.')
+    parser.add_argument('--origen', default=None, help='Directorio local del modelo en lugar del hub.')
+    parser.add_argument('--destino', default=None, help='Directorio del snapshot (por defecto VOCES_ODS_MODELOS/<modelo>).')
+    parser.add_argument('--verificar', action='store_true', help='Solo verificar el snapshot existente (sha256 incluido).')
+    parser.add_argument('--medir', action='store_true', help='Medir el tiempo hasta el modelo listo desde el snapshot.')
+    args = parser.parse_args()
+
+    destino = args.destino or ruta_snapshot(args.modelo)
+    if not (args.verificar or args.medir):
+        print(f"Creando snapshot de {args.modelo} en {destino}...")
+        inicio = time.perf_counter()
+        manifiesto = crear_snapshot(args.modelo, origen=args.origen, revision=args.revision, destino=destino)
+        total = sum(a['bytes'] for a in manifiesto['archivos'].values())
+        print(f"✓ {len(manifiesto['archivos'])} archivos ({total / 2**20:.0f} MB) · revisión {manifiesto['revision']} · "
+              f"{time.perf_counter() - inicio:.1f} s")
+
+    if args.verificar:
+        problemas = verificar_snapshot(destino, hashes=True)
+        for problema in problemas:
+            print(f"✗ {problema}")
+        if problemas:
+            sys.exit(1)
+        manifiesto = leer_manifiesto(destino)
+        print(f"✓ Snapshot íntegro: {manifiesto['modelo']} @ {manifiesto['revision']} ({manifiesto['creado']})")
+
+    if args.medir:
+        if args.destino:
+            parser.error('--medir usa la ubicación por defecto del snapshot (VOCES_ODS_MODELOS)')
+        print(f"✓ Modelo listo sin red en {medir_arranque(args.modelo):.2f} s")
+
+
+if __name__ == "__main__":
+    main()
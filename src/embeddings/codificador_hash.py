@@ -0,0 +1,52 @@
+# src/embeddings/codificador_hash.py
+"""
+Codificador determinista por hashing de características (feature hashing).
+
+Sustituto offline de instructor-large para benchmarks y pruebas de carga:
+no descarga modelos, no usa red y produce siempre el mismo vector para el
+mismo texto (entre procesos y máquinas). Imita la interfaz de
+`SentenceTransformer.encode` que usa `compute_embeddings`.
+"""
+import hashlib
+import re
+from functools import lru_cache
+
+import numpy as np
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+@lru_cache(maxsize=200_000)
+def _hash_token(token: str) -> int:
+    return int.from_bytes(hashlib.blake2b(token.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+class CodificadorHash:
+    def __init__(self, dimension=768, ngramas=2):
+        self.dimension = dimension
+        self.ngramas = ngramas
+
+    def _vector(self, texto):
+        tokens = _TOKEN.findall(texto.lower())
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        for n in range(1, self.ngramas + 1):
+            for i in range(len(tokens) - n + 1):
+                h = _hash_token(' '.join(tokens[i:i + n]))
+                vector[h % self.dimension] += 1.0 if (h >> 63) & 1 else -1.0
+        return vector
+
+    def encode(self, sentences, batch_size=32, convert_to_tensor=False, show_progress_bar=False,
+               normalize_embeddings=False, **kwargs):
+        # Pares [instrucción, texto] como en make_text_pairs
+        textos = [' '.join(s) if isinstance(s, (list, tuple)) else str(s) for s in sentences]
+        emb = np.vstack([self._vector(t) for t in textos]) if textos else np.zeros((0, self.dimension), dtype=np.float32)
+        if normalize_embeddings:
+            normas = np.linalg.norm(emb, axis=1, keepdims=True)
+            emb = emb / np.where(normas == 0, 1.0, normas)
+        if convert_to_tensor:
+            import torch
+            return torch.from_numpy(emb)
+        return emb
+
+    def get_sentence_embedding_dimension(self):
+        return self.dimension
@@ -1,15 +1,16 @@
 # src/embeddings/instructor_embeddings.py
-from sentence_transformers import SentenceTransformer #
 import os
 from pathlib import Path
 
+from src.embeddings.snapshot_modelo import cargar_modelo
+
 class InstructorEmbeddings:
     def __init__(self, model_name="hkunlp/instructor-large", cache_dir="./data/embeddings/cache"):
         self.cache_dir = Path(cache_dir)
         self.cache_dir.mkdir(parents=True, exist_ok=True)
         
-        # HF Spaces descargará automáticamente el modelo
-        self.model = SentenceTransformer(
+        # Snapshot local si existe (sin red); si no, HF Spaces descargará el modelo
+        self.model = cargar_modelo(
             model_name,
             cache_folder=str(self.cache_dir)
         )
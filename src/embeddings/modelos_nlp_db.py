@@ -117,6 +117,15 @@ def limpiar_texto(texto, nlp):
 # Generador de cache para generar embeddings nuevas tablas
 # ============================================================================
 
+def construir_cache(cache_path: str, input_texts: list, instruction: str, model_name: str = "hkunlp/instructor-large", batch_size = 32, normalize = True):
+  """Codifica `input_texts` con la instrucción dada y guarda el cache .npz + sidecar JSON."""
+  model = obtener_modelo(model_name)
+  input_pairs = make_text_pairs(instruction, input_texts)
+  emb_input = compute_embeddings(model, input_pairs, batch_size=batch_size, normalize=normalize)
+  emb_input_np = emb_input.cpu().numpy() if hasattr(emb_input, 'cpu') else np.asarray(emb_input)
+  save_cache(cache_path, {"model_name": model_name, "instr": instruction, "count": len(input_texts)}, emb_input_np)
+  return emb_input_np
+
 def genCache(cache_name:str, tbl_input_dir:str, out_dir:str, instruction:str, batch_size = 32, normalize = True, cache_path = None, force_recompute = False):
   
   model_name = "hkunlp/instructor-large" #help="HF model name for embeddings.")
@@ -131,14 +140,7 @@ def genCache(cache_name:str, tbl_input_dir:str, out_dir:str, instruction:str, ba
   fingerprint = build_ods_fingerprint(model_name, instruction, input_texts)
   cache_path = cache_path or os.path.join(out_dir, f"{cache_name}_{fingerprint}.npz")
 
-  # Lazy import model to allow quick --help
-  from sentence_transformers import SentenceTransformer
-
-  model = SentenceTransformer(model_name)
-  input_pairs = make_text_pairs(instruction, input_texts)
-  emb_input = compute_embeddings(model, input_pairs, batch_size=batch_size, normalize=normalize)
-  emb_input_np = emb_input.cpu().numpy()
-  save_cache(cache_path, {"model": model_name, "instr": instruction, "count": len(input_texts)}, emb_input_np)
+  construir_cache(cache_path, input_texts, instruction, model_name=model_name, batch_size=batch_size, normalize=normalize)
 
 # ============================================================================
 # Función generadora tablas
@@ -147,53 +149,101 @@ def genCache(cache_name:str, tbl_input_dir:str, out_dir:str, instruction:str, ba
 import torch
 import pandas as pd
 import numpy as np
+from functools import partial
+from src.utils.instrumentacion import instrumentar, medir_etapa, logger
+from src.embeddings.proyeccion_pca import proyectar
+
+
+# Tablas de referencia (mismo orden en textos, instrucciones, fingerprints y resultados)
+CATALOGOS_TBLINPUT = [
+                      Path('data/raw/v1_tabla_odsDescripcion.xlsx'),
+                      Path('data/raw/v1_tabla_lvlMetaOds.xlsx'),
+                      Path('data/raw/marco_ods_ids.xlsx'),
+                      Path('data/raw/genero.xlsx'),
+                      Path('data/raw/poblacional.xlsx'),
+                      Path('data/raw/etnico.xlsx'),
+                      Path('data/raw/pilares.xlsx'), #"CSV with ODS list (columns: ods_id, titulo, descripcion).")
+                      Path('data/raw/estrategias.xlsx'),
+                      Path('data/raw/categorias.xlsx'),
+                      ]
+CATALOGOS_OUT_DIR = Path('data/embeddings') #"Output directory.")
+CATALOGOS_PREFIJO_CACHE = ['v1_tabla_odsDescripcion', 'v1_tabla_lvlMetaOds', 'ods_embeddings', 'tabla_genero', 'tabla_poblacional',
+                           'tabla_etnico', 'pilaresPdet_embeddings', 'estrategiasPdet_embeddings', 'categoriasPdet_embeddings']
+MODEL_NAME = "hkunlp/instructor-large" #help="HF model name for embeddings.")
+
+INSTRUC_BASES = [
+                "Representa la definición global de los Objetivo de Desarrollo Sostenible (ODS) para su uso como categoría de referencia en la clasificación de iniciativas ciudadanas.",
+                "Representa la definición global de las metas de los Objetivos de Desarrollo Sostenible (ODS) para su uso como categoría de referencia en la clasificación de iniciativas ciudadanas", 
+                "Representa el tema central del siguiente ODS", 
+                "Representa el tema central del siguiente de enfoque", 
+                "Representa el tema central del siguiente de enfoque poblacional",
+                "Representa el tema central del siguiente de enfoque etnico",
+                "Representa el tema de los siguiente ejes temáticos y estratégicos", 
+                "Representa el tema de las siguiente estrategias",
+                "Representa el tema de las siguientes categorias"
+                ]
+
+INSTRUC_INICIATIVAS = [
+                      "Representa la iniciativa de planificación territorial y construcción de paz en Colombia para clasificarla según su alineación semántica con los Objetivos de Desarrollo Sostenible (ODS)", 
+                      "Representa la iniciativa de planificación territorial y construcción de paz en Colombia para clasificarla según su alineación semántica con las metas globales de los Objetivos de Desarrollo Sostenible (ODS)",
+                      "Representa la iniciativa de planificación territorial y construcción de paz en Colombia para clasificarla según su alineación semántica con los indicadores globales de los Objetivos de Desarrollo Sostenible (ODS)",
+                      "Representa la iniciativa de proyecto de construcción de paz para clasificar si aplica el Enfoque de Género, detectando acciones afirmativas dirigidas a mujeres rurales, madres cabeza de familia, liderazgo femenino o cierre de brechas de desigualdad entre hombres y mujeres.grupos poblacionales según sexo, identidad de género, orientación sexual o roles de género.mujeres, equidad de género, igualdad de oportunidades, discriminación, violencia basada en género", 
+                      "Representa la iniciativa de proyecto de construcción de paz para clasificar si aplica el enfoque poblacional, reconoce explícitamente la diversidad poblacional y plantea acciones diferenciadas según edad, condición o situación social. juventudes, niñez, adultos mayores, personas con discapacidad, víctimas del conflicto, migrantes, refugiados",
+                      "Representa la iniciativa de proyecto de construcción de paz para clasificar si aplica el enfoque etnico, reconoce diversidad étnica y cultural,  plantea acciones diferenciadas para estos grupos. Indígenas, negros, afrodescendientes, raizales, palenqueros, rom, resguardos, palenques, consejos comunitarios", 
+                      "Representa el siguiente proyecto territorial en terminos de ejes temáticos y estratégicos", 
+                      "Representa el siguiente proyecto territorial en terminos de la estrategia", 
+                      "Representa el siguiente proyecto territorial en terminos de la categoria"
+                      ]
+
+# Compute fingerprint and cache path
+# fingerprint = build_ods_fingerprint(model_name, instr_ods, ods_texts)
+# fingerprint = [build_ods_fingerprint(model_name, instr, texts[idx]) for idx, instr in enumerate(instruc_bases)]
+CATALOGOS_FINGERPRINT = ['e109a32969828923f9ddf6f4ad59328d','e0d3b674182b1e8ab9280544bd9e8532','07948e6beafe34049ca8a7309363eee2','9a4c52cf18e95c52566c0b657a25c44f','5a8b0dd04b865e8f1c356a64795b3b67',
+                         'c0973f650cac27181b3751aa9666819b','0a475def7da8551abdd502e1d042dc00','42e4e8bfb28dc47602e662a27d8b4e76','e0338741fd4e7b08ab7f92a32e08919b']
+
+# Dimensión reducida opcional (128 o 256) de la proyección PCA construida con
+# `python -m scripts.construir_pca`; None = dimensión completa del modelo
+DIMENSION_PCA = int(os.environ.get('VOCES_ODS_PCA', '0')) or None
+# Candidatos por tabla de la recuperación en dos etapas de `search` (primera
+# etapa en dimensión reducida, re-rank con el coseno exacto); None = una etapa
+CANDIDATOS_SEARCH = int(os.environ.get('VOCES_ODS_CANDIDATOS', '0')) or None
 
 
-def search(query):
-#   patr_tblinput = ' //Copy of Iniciativas priorizadas PATR 385.xlsx' #"CSV with PATR projects (columns: id, descripcion, ...).")
-  ods_tblinput = Path('data/raw/v1_tabla_odsDescripcion.xlsx')
-  meta_tblinput = Path('data/raw/v1_tabla_lvlMetaOds.xlsx')
-  indicador_tblinput = Path('data/raw/marco_ods_ids.xlsx')
-  genero_tblinput = Path('data/raw/genero.xlsx')
-  poblacional_tblinput = Path('data/raw/poblacional.xlsx')
-  etnico_tblinput = Path('data/raw/etnico.xlsx')
-  pilares_tblinput = Path('data/raw/pilares.xlsx') #"CSV with ODS list (columns: ods_id, titulo, descripcion).")
-  categorias_tblinput = Path('data/raw/categorias.xlsx')
-  estrategias_tblinput = Path('data/raw/estrategias.xlsx')
-  out_dir = Path('data/embeddings') #"Output directory.")
-  model_name = "hkunlp/instructor-large" #help="HF model name for embeddings.")
-  instr_proj = "Representa el propósito de desarrollo sostenible del siguiente proyecto territorial" #"Instruction for PATR projects.")
-  instr_ods = "Representa el tema central del siguiente ODS" #"Instruction for ODS texts.")
-  batch_size = 32 #"Batch size for encoding.")
-  top_k = 5 #"Top-K ODS to retrieve.")
-  normalize = True #"L2-normalize embeddings during encoding.") # Changed from "store_true" to boolean
-  cache_path = None #"Path to cache npz for ODS embeddings (auto if not set).")
-  force_recompute = False #"Ignore cache and recompute ODS embeddings.") # Changed from "store_true" to boolean
-
-
-  ensure_out_dir(out_dir)
-
-  #"OBJETIVO","OBJETIVO_META","INDICADORES","CODIGO_UNSD"
-
-  # Load data
-  # patr_df, ods_df = load_data(patr_tblinput, ods_tblinput)
-  # patr_df = patr_df[['ID', 'INICIATIVAS']].drop_duplicates().reset_index(drop=True) # Reset index
-  # patr_texts = patr_df["INICIATIVAS"].fillna("").tolist()
-  # patr_df = pd.read_excel(patr_tblinput)
-  ods_df = pd.read_excel(ods_tblinput)
-  meta_df = pd.read_excel(meta_tblinput)  
-  inidicador_df = pd.read_excel(indicador_tblinput)
-  genero_df = pd.read_excel(genero_tblinput)
-  poblacional_df = pd.read_excel(poblacional_tblinput)
-  etnico_df = pd.read_excel(etnico_tblinput)
-  pilares_df = pd.read_excel(pilares_tblinput)
-  estrategias_df = pd.read_excel(estrategias_tblinput)
-  categorias_df = pd.read_excel(categorias_tblinput)
+# ============================================================================
+# Modelo y catálogos compartidos entre consultas
+# ============================================================================
 
-#   nlp = spacy.load("es_core_news_md")
-#   query = limpiar_texto(query, nlp)
-  patr_texts = list([query])
-  # print(len(patr_texts))
+_MODELOS = {}
+_MODELO_FORZADO = None
+_CATALOGOS = None
+
+
+def obtener_modelo(model_name: str = MODEL_NAME):
+  """
+  Devuelve el codificador de embeddings, construido una sola vez por proceso.
+  Si existe un snapshot local del modelo (`snapshot_modelo`) se carga desde
+  él sin red. Si se registró un codificador con `establecer_modelo` (p. ej.
+  el `CodificadorHash` de benchmarks), se usa ese en su lugar.
+  """
+  if _MODELO_FORZADO is not None:
+    return _MODELO_FORZADO
+  if model_name not in _MODELOS:
+    # Lazy import model to allow quick --help
+    from src.embeddings.snapshot_modelo import cargar_modelo
+    with medir_etapa('construccion_modelo'):
+      _MODELOS[model_name] = cargar_modelo(model_name)
+  return _MODELOS[model_name]
+
+
+def establecer_modelo(modelo):
+  """Registra un codificador alternativo para todo el proceso (None restaura el real)."""
+  global _MODELO_FORZADO
+  _MODELO_FORZADO = modelo
+
+
+def textos_catalogos(dfs: list):
+  """Construye los textos a codificar de cada tabla de referencia."""
+  ods_df, meta_df, inidicador_df, genero_df, poblacional_df, etnico_df, pilares_df, estrategias_df, categorias_df = dfs
   ods_texts  = (ods_df["ods"].fillna("") + ". " + ods_df["descripcion"].fillna("")).tolist()
   meta_texts = (meta_df["OBJETIVO"].fillna("") + ". " + meta_df["META"].fillna("")).tolist()
   indicadores_texts  = (inidicador_df["OBJETIVO"].fillna("") + ". " + inidicador_df["INDICADORES"].fillna("")).tolist()
@@ -204,278 +254,437 @@ def search(query):
   pilares_texts  = (pilares_df["PILAR"].fillna("") + ". " + pilares_df["DESCRIPCION"].fillna("") + ". " + pilares_df["SUSTENTO"].fillna("")).tolist()
   estrategias_texts  = (estrategias_df["ESTRATEGIA"].fillna("") + ". " + estrategias_df["DESCRIPCION"].fillna("")).tolist()
   categorias_texts  = (categorias_df["CATEGORIA"].fillna("") + ". " + categorias_df["DESCRIPCION"].fillna("")).tolist()
-  # print(len(ods_texts))
-
-  texts = [ods_texts, meta_texts, indicadores_texts, genero_texts, poblacional_texts, etnico_texts, pilares_texts, estrategias_texts, categorias_texts]
-
-  # print('texts')
-  # print([len(x) for x in texts])
-
-  instruc_bases = [
-                  "Representa la definición global de los Objetivo de Desarrollo Sostenible (ODS) para su uso como categoría de referencia en la clasificación de iniciativas ciudadanas.",
-                  "Representa la definición global de las metas de los Objetivos de Desarrollo Sostenible (ODS) para su uso como categoría de referencia en la clasificación de iniciativas ciudadanas", 
-                  "Representa el tema central del siguiente ODS", 
-                  "Representa el tema central del siguiente de enfoque", 
-                  "Representa el tema central del siguiente de enfoque poblacional",
-                  "Representa el tema central del siguiente de enfoque etnico",
-                  "Representa el tema de los siguiente ejes temáticos y estratégicos", 
-                  "Representa el tema de las siguiente estrategias",
-                  "Representa el tema de las siguientes categorias"
-                  ]
-
-  instruc_iniciativas = [
-                        "Representa la iniciativa de planificación territorial y construcción de paz en Colombia para clasificarla según su alineación semántica con los Objetivos de Desarrollo Sostenible (ODS)", 
-                        "Representa la iniciativa de planificación territorial y construcción de paz en Colombia para clasificarla según su alineación semántica con las metas globales de los Objetivos de Desarrollo Sostenible (ODS)",
-                        "Representa la iniciativa de planificación territorial y construcción de paz en Colombia para clasificarla según su alineación semántica con los indicadores globales de los Objetivos de Desarrollo Sostenible (ODS)",
-                        "Representa la iniciativa de proyecto de construcción de paz para clasificar si aplica el Enfoque de Género, detectando acciones afirmativas dirigidas a mujeres rurales, madres cabeza de familia, liderazgo femenino o cierre de brechas de desigualdad entre hombres y mujeres.grupos poblacionales según sexo, identidad de género, orientación sexual o roles de género.mujeres, equidad de género, igualdad de oportunidades, discriminación, violencia basada en género", 
-                        "Representa la iniciativa de proyecto de construcción de paz para clasificar si aplica el enfoque poblacional, reconoce explícitamente la diversidad poblacional y plantea acciones diferenciadas según edad, condición o situación social. juventudes, niñez, adultos mayores, personas con discapacidad, víctimas del conflicto, migrantes, refugiados",
-                        "Representa la iniciativa de proyecto de construcción de paz para clasificar si aplica el enfoque etnico, reconoce diversidad étnica y cultural,  plantea acciones diferenciadas para estos grupos. Indígenas, negros, afrodescendientes, raizales, palenqueros, rom, resguardos, palenques, consejos comunitarios", 
-                        "Representa el siguiente proyecto territorial en terminos de ejes temáticos y estratégicos", 
-                        "Representa el siguiente proyecto territorial en terminos de la estrategia", 
-                        "Representa el siguiente proyecto territorial en terminos de la categoria"
-                        ]
 
+  return [ods_texts, meta_texts, indicadores_texts, genero_texts, poblacional_texts, etnico_texts, pilares_texts, estrategias_texts, categorias_texts]
+
+
+def apilar_catalogos(embeddings: list):
+  """
+  Concatena los embeddings de las nueve tablas en una sola matriz contigua
+  (float32, filas L2-normalizadas) y devuelve los rangos [inicio, fin) de
+  cada tabla dentro de ella.
+
+  Con filas normalizadas, el producto punto contra la matriz apilada es la
+  similaridad coseno: una sola multiplicación sustituye los nueve `cos_sim`.
+  """
+  matriz = np.ascontiguousarray(np.concatenate([np.asarray(e, dtype=np.float32) for e in embeddings], axis=0))
+  normas = np.linalg.norm(matriz, axis=1, keepdims=True)
+  matriz /= np.where(normas == 0, 1.0, normas)
+  limites = np.cumsum([0] + [len(e) for e in embeddings])
+  offsets = [(int(limites[i]), int(limites[i + 1])) for i in range(len(embeddings))]
+  return matriz, offsets
+
+
+def _matriz_tensor(catalogos: dict, device, matriz = 'matriz'):
+  """Matriz apilada como tensor en `device` (se convierte una vez por dispositivo)."""
+  tensores = catalogos.setdefault(matriz + '_t', {})
+  clave = str(device)
+  if clave not in tensores:
+    tensores[clave] = torch.from_numpy(catalogos[matriz]).to(device)
+  return tensores[clave]
+
+
+def _proyectar_consultas(catalogos: dict, emb):
+  """
+  Vectores de consulta (tensor normalizado) en el mismo espacio que la
+  matriz apilada: sin cambios en dimensión completa, proyectados y
+  re-normalizados si los catálogos usan proyección PCA.
+  """
+  proyeccion = catalogos.get('proyeccion')
+  if proyeccion is None:
+    return emb
+  tensores = catalogos.setdefault('componentes_t', {})
+  clave = str(emb.device)
+  if clave not in tensores:
+    tensores[clave] = torch.from_numpy(proyeccion['componentes']).to(emb.device)
+  return torch.nn.functional.normalize(emb @ tensores[clave].T, dim=1)
 
 
-  # Compute fingerprint and cache path
-  # fingerprint = build_ods_fingerprint(model_name, instr_ods, ods_texts)
-  # fingerprint = [build_ods_fingerprint(model_name, instr, texts[idx]) for idx, instr in enumerate(instruc_bases)]
-  fingerprint = ['e109a32969828923f9ddf6f4ad59328d','e0d3b674182b1e8ab9280544bd9e8532','07948e6beafe34049ca8a7309363eee2','9a4c52cf18e95c52566c0b657a25c44f','5a8b0dd04b865e8f1c356a64795b3b67',
-                  'c0973f650cac27181b3751aa9666819b','0a475def7da8551abdd502e1d042dc00','42e4e8bfb28dc47602e662a27d8b4e76','e0338741fd4e7b08ab7f92a32e08919b']
-
-
-  ods_cache_path = cache_path or os.path.join(out_dir, f"v1_tabla_odsDescripcion_{fingerprint[0]}.npz")
-  meta_cache_path = cache_path or os.path.join(out_dir, f"v1_tabla_lvlMetaOds_{fingerprint[1]}.npz")
-  indicadores_cache_path = cache_path or os.path.join(out_dir, f"ods_embeddings_{fingerprint[2]}.npz")
-  genero_cache_path = cache_path or os.path.join(out_dir, f"tabla_genero_{fingerprint[3]}.npz")
-  poblacional_cache_path = cache_path or os.path.join(out_dir, f"tabla_poblacional_{fingerprint[4]}.npz")
-  etnico_cache_path = cache_path or os.path.join(out_dir, f"tabla_etnico_{fingerprint[5]}.npz")  
-  pilaresPdet_cache_path = cache_path or os.path.join(out_dir, f"pilaresPdet_embeddings_{fingerprint[6]}.npz")
-  estrategiasPdet_cache_path = cache_path or os.path.join(out_dir, f"estrategiasPdet_embeddings_{fingerprint[7]}.npz")
-  categoriasPdet_cache_path = cache_path or os.path.join(out_dir, f"categoriasPdet_embeddings_{fingerprint[8]}.npz")
-
-  cache_paths = [ods_cache_path, meta_cache_path, indicadores_cache_path, genero_cache_path, poblacional_cache_path, etnico_cache_path, pilaresPdet_cache_path, estrategiasPdet_cache_path, categoriasPdet_cache_path]
-
-  print('cache_paths')
-  print([x for x in cache_paths])
-
-  # Lazy import model to allow quick --help
-  from sentence_transformers import SentenceTransformer
-
-  # Load / compute ODS embeddings with cache
-  ods_use_cache = (not force_recompute) and os.path.exists(ods_cache_path)
-  meta_use_cache = (not force_recompute) and os.path.exists(meta_cache_path)
-  indicadores_use_cache = (not force_recompute) and os.path.exists(indicadores_cache_path)
-  genero_use_cache = (not force_recompute) and os.path.exists(genero_cache_path)
-  poblacional_use_cache = (not force_recompute) and os.path.exists(poblacional_cache_path)
-  etnico_use_cache = (not force_recompute) and os.path.exists(etnico_cache_path)  
-  pilaresPdet_use_cache = (not force_recompute) and os.path.exists(pilaresPdet_cache_path)
-  estrategiasPdet_use_cache = (not force_recompute) and os.path.exists(estrategiasPdet_cache_path)
-  categoriasPdet_use_cache = (not force_recompute) and os.path.exists(categoriasPdet_cache_path)
-
-  matrix_unfpa = []
-  caches = [ods_use_cache, meta_use_cache, indicadores_use_cache, genero_use_cache, poblacional_use_cache, etnico_use_cache,
-            pilaresPdet_use_cache, estrategiasPdet_use_cache, categoriasPdet_use_cache]
-
-  for idx, i_cache in enumerate(caches):
-    # print(cache_paths[idx])
+# ============================================================================
+# Proyección PCA opcional (dimensión reducida)
+# ============================================================================
+
+def ruta_proyeccion(dimension: int, out_dir = CATALOGOS_OUT_DIR):
+  """Archivo de la proyección, junto a los caches .npz (huella: modelo + fingerprints de los catálogos)."""
+  huella = md5_text(MODEL_NAME + "\n" + "\n".join(CATALOGOS_FINGERPRINT))
+  return Path(out_dir) / f"pca{dimension}_{huella}.npz"
+
+
+def cargar_proyeccion(dimension: int, out_dir = CATALOGOS_OUT_DIR):
+  """Proyección guardada por `scripts.construir_pca` ({'componentes', 'meta'}) o None si no existe."""
+  ruta = ruta_proyeccion(dimension, out_dir)
+  if not ruta.exists():
+    logger.warning('no se encontro proyeccion PCA; se usa la dimension completa', extra={'campos': {
+      'ruta': str(ruta), 'dimension': dimension}})
+    return None
+  with medir_etapa('carga_cache'):
+    componentes, meta = load_cache(str(ruta))
+  return {'componentes': np.ascontiguousarray(componentes, dtype=np.float32), 'meta': meta}
+
+
+def aplicar_proyeccion(catalogos: dict, proyeccion):
+  """
+  Sustituye la matriz apilada de `catalogos` por su proyección (filas
+  re-normalizadas); las consultas se proyectan al vuelo en `search` y
+  `clasificar_lote`. Las similaridades resultantes son cosenos en
+  dimensión reducida. La matriz completa queda en 'matriz_completa' para
+  el re-rank exacto de la recuperación en dos etapas.
+  """
+  if proyeccion is None:
+    return catalogos
+  componentes, meta = proyeccion['componentes'], proyeccion.get('meta', {})
+  filas = len(catalogos['matriz'])
+  if componentes.shape[1] != catalogos['matriz'].shape[1]:
+    logger.warning('proyeccion PCA de otra dimension; se usa la dimension completa', extra={'campos': {
+      'dimension_proyeccion': int(componentes.shape[1]), 'dimension_catalogos': int(catalogos['matriz'].shape[1])}})
+    return catalogos
+  if meta.get('model_name') not in (None, MODEL_NAME) or meta.get('filas_catalogo') not in (None, filas):
+    logger.warning('Diferencias en metadata de la proyeccion PCA', extra={'campos': {
+      'model_name': [meta.get('model_name'), MODEL_NAME], 'filas_catalogo': [meta.get('filas_catalogo'), filas]}})
+  catalogos['matriz_completa'] = catalogos['matriz']
+  catalogos['matriz'] = proyectar(catalogos['matriz'], componentes)
+  catalogos['proyeccion'] = proyeccion
+  for clave in ('matriz_t', 'matriz_completa_t', 'componentes_t'):
+    catalogos.pop(clave, None)
+  return catalogos
+
+
+def cargar_catalogos(batch_size = 32, normalize = True, cache_path = None, force_recompute = False, dimension_pca = DIMENSION_PCA):
+  """
+  Carga las nueve tablas de referencia, sus textos y sus embeddings (desde
+  cache .npz o calculados y guardados si no existen). El resultado se
+  conserva en memoria y se reutiliza en las siguientes consultas.
+
+  Con `dimension_pca` (por defecto VOCES_ODS_PCA) la matriz apilada se
+  reduce con la proyección PCA guardada para esa dimensión, si existe.
+
+  Retorna un dict con listas alineadas por índice: 'dfs', 'textos', 'embeddings',
+  más la matriz apilada 'matriz', sus rangos por tabla 'offsets' y, si
+  aplica, la 'proyeccion'.
+  """
+  global _CATALOGOS
+  if _CATALOGOS is not None and not force_recompute:
+    return _CATALOGOS
+
+  out_dir = CATALOGOS_OUT_DIR
+  ensure_out_dir(out_dir)
+
+  #"OBJETIVO","OBJETIVO_META","INDICADORES","CODIGO_UNSD"
+  with medir_etapa('carga_excel'):
+    dfs = [pd.read_excel(tblinput) for tblinput in CATALOGOS_TBLINPUT]
+  texts = textos_catalogos(dfs)
+
+  cache_paths = [cache_path or os.path.join(out_dir, f"{prefijo}_{CATALOGOS_FINGERPRINT[idx]}.npz")
+                 for idx, prefijo in enumerate(CATALOGOS_PREFIJO_CACHE)]
+
+  logger.debug('cache_paths', extra={'campos': {'cache_paths': [str(x) for x in cache_paths]}})
+
+  embeddings = []
+  for idx, i_cache_path in enumerate(cache_paths):
+    # Load / compute ODS embeddings with cache
+    i_cache = (not force_recompute) and os.path.exists(i_cache_path)
 
     if i_cache:
-        emb_unfpa_np, meta = load_cache(cache_paths[idx])
+        with medir_etapa('carga_cache'):
+          emb_unfpa_np, meta = load_cache(i_cache_path)
         # Minimal safety check: same model/instruction length
-        if meta.get("model_name") != model_name or meta.get("instr") != instruc_bases[idx] or meta.get("count") != len(texts[idx]):
-          print(f'Diferencias en carga de metadata nlp cache {cache_paths[idx]}:')
-          print(meta.get("model_name"), model_name)
-          print(meta.get("instr"), instruc_bases[idx])
-          print(meta.get("count"),len(texts[idx]))
+        if meta.get("model_name") != MODEL_NAME or meta.get("instr") != INSTRUC_BASES[idx] or meta.get("count") != len(texts[idx]):
+          logger.warning('Diferencias en carga de metadata nlp cache', extra={'campos': {
+            'cache_path': str(i_cache_path),
+            'model_name': [meta.get("model_name"), MODEL_NAME],
+            'instr': [meta.get("instr"), INSTRUC_BASES[idx]],
+            'count': [meta.get("count"), len(texts[idx])],
+          }})
             # i_cache = False
 
     if not i_cache:
-      print(f'no se encontro cache de id : {idx}')
-        # model = SentenceTransformer(model_name)
-        # ods_pairs = make_text_pairs(instruc_bases[idx], texts[idx])
-        # emb_ods = compute_embeddings(model, ods_pairs, batch_size=batch_size, normalize=normalize)
-        # emb_unfpa_np = emb_ods.cpu().numpy()
-        # save_cache(cache_paths[idx], {"model_name": model_name, "instr": instruc_bases[idx], "count": len(texts[idx])}, emb_unfpa_np)
-    else:
-        model = SentenceTransformer(model_name)  # still needed for project embeddings
-
-    # Compute PATR embeddings
-    patr_pairs = make_text_pairs(instruc_iniciativas[idx], patr_texts)
-    emb_patr = compute_embeddings(model, patr_pairs, batch_size=batch_size, normalize=normalize)
+      logger.warning(f'no se encontro cache de id : {idx}', extra={'campos': {'cache_path': str(i_cache_path)}})
+      emb_unfpa_np = construir_cache(i_cache_path, texts[idx], INSTRUC_BASES[idx], batch_size=batch_size, normalize=normalize)
+
+    embeddings.append(emb_unfpa_np)
+
+  matriz, offsets = apilar_catalogos(embeddings)
+  catalogos = {'dfs': dfs, 'textos': texts, 'embeddings': embeddings, 'matriz': matriz, 'offsets': offsets,
+               'esquema': esquema_resultados(dfs, texts)}
+  if dimension_pca:
+    aplicar_proyeccion(catalogos, cargar_proyeccion(dimension_pca))
+  if CANDIDATOS_SEARCH and 'proyeccion' not in catalogos:
+    logger.warning('VOCES_ODS_CANDIDATOS requiere la proyeccion PCA (VOCES_ODS_PCA); search usa una sola etapa')
+  _CATALOGOS = catalogos
+  return _CATALOGOS
+
+
+def establecer_catalogos(dfs: list, embeddings: list, proyeccion = None):
+  """
+  Reemplaza los catálogos en memoria (p. ej. catálogos sintéticos para
+  benchmarks). `dfs` y `embeddings` siguen el orden de CATALOGOS_TBLINPUT;
+  `proyeccion` ({'componentes', 'meta'}) activa la dimensión reducida.
+  """
+  global _CATALOGOS
+  matriz, offsets = apilar_catalogos(embeddings)
+  textos = textos_catalogos(dfs)
+  _CATALOGOS = aplicar_proyeccion({'dfs': list(dfs), 'textos': textos, 'embeddings': list(embeddings),
+                                   'matriz': matriz, 'offsets': offsets, 'esquema': esquema_resultados(dfs, textos)},
+                                  proyeccion)
 
-    # Convert ODS (np.ndarray) to torch.Tensor and move it to the same device as emb_patr
-    emb_unfpa_t = torch.from_numpy(emb_unfpa_np).to(emb_patr.device)
 
-    # Similarity
-    from sentence_transformers import util
-    sim_matrix_ = util.cos_sim(emb_patr, emb_unfpa_t).cpu().numpy()
+# ============================================================================
+# Esquema compacto de las tablas de resultado
+# ============================================================================
+
+# Columnas de cada catálogo que aparecen en los resultados (mismo orden que
+# CATALOGOS_TBLINPUT): columna -> nivel de ID compartido entre tablas, o None
+# para textos. 'texto' es el texto codificado de la tabla (textos_catalogos).
+COLUMNAS_RESULTADO = [
+  {'id_ods': 'ODS_ID', 'ods': None},
+  {'ID_META': 'META_ID', 'META': None, 'ID_OBJETIVO': 'ODS_ID'},
+  {'ID_INDICADORES': 'INDICADOR_ID', 'INDICADORES': None, 'ID_ODS': 'ODS_ID', 'ID_META': 'META_ID'},
+  {'CATEGORIA': None},
+  {'CATEGORIA': None},
+  {'CATEGORIA': None},
+  {'texto': None},
+  {'texto': None},
+  {'texto': None},
+]
+
+
+def _categorias(valores):
+  """Valores únicos no nulos, ordenados si el tipo lo permite."""
+  unicos = pd.unique(pd.Series(valores).dropna())
+  try:
+    unicos = np.sort(unicos)
+  except TypeError:
+    pass
+  return pd.Index(list(unicos))
+
+
+def esquema_resultados(dfs: list, textos: list):
+  """
+  Códigos de las columnas de resultado, calculados una vez por catálogo.
+
+  Para cada tabla y columna de COLUMNAS_RESULTADO: (códigos por fila del
+  catálogo, CategoricalDtype). Los IDs de un mismo nivel (p. ej. ODS_ID en
+  las tablas de ODS, metas e indicadores) comparten categorías, así que los
+  merges de `bdl_ods` se hacen sobre códigos y conservan el tipo. Los textos
+  largos quedan una sola vez en las categorías; cada fila de resultado
+  guarda solo el código (el índice del texto en el catálogo).
+  """
+  valores = []
+  for idx, columnas in enumerate(COLUMNAS_RESULTADO):
+    valores.append({col: np.asarray(textos[idx], dtype=object) if col == 'texto' else dfs[idx][col].to_numpy()
+                    for col in columnas})
+
+  niveles = {}
+  for idx, columnas in enumerate(COLUMNAS_RESULTADO):
+    for col, nivel in columnas.items():
+      if nivel is not None:
+        niveles.setdefault(nivel, []).append(valores[idx][col])
+  tipos_nivel = {nivel: pd.CategoricalDtype(_categorias(np.concatenate([np.asarray(v, dtype=object) for v in partes])))
+                 for nivel, partes in niveles.items()}
+
+  esquema = []
+  for idx, columnas in enumerate(COLUMNAS_RESULTADO):
+    tabla = {}
+    for col, nivel in columnas.items():
+      if nivel is not None:
+        tipo = tipos_nivel[nivel]
+        codigos = tipo.categories.get_indexer(valores[idx][col])
+      else:
+        codigos, categorias = pd.factorize(valores[idx][col])
+        tipo = pd.CategoricalDtype(categorias)
+      tabla[col] = (codigos.astype(np.int32), tipo)
+    esquema.append(tabla)
+  return esquema
+
+
+def columna_resultado(catalogos: dict, idx: int, columna: str, filas):
+  """Valores de `columna` (tabla `idx`) en las filas `filas` del catálogo, como categórica."""
+  codigos, tipo = catalogos['esquema'][idx][columna]
+  return pd.Categorical.from_codes(codigos[filas], dtype=tipo)
+
+
+def tipo_rank(n: int):
+  """int16 para ranks de hasta 32767 posiciones (int32 para catálogos mayores)."""
+  return np.int16 if n <= np.iinfo(np.int16).max else np.int32
+
+
+def unir_bdl(df_ods, df_metas, df_indicador):
+  """Tabla BDL_ODS: ODS x METAS x INDICADORES unidos por ODS_ID y META_ID."""
+  bdl_ods = df_ods.merge(df_metas, 'inner', left_on='ODS_ID', right_on='ODS_ID')
+  return bdl_ods.merge(df_indicador, 'inner', left_on=['ODS_ID','META_ID'], right_on=['ODS_ID','META_ID'])
+
+
+# Top-K por tabla en search() (None = catálogo completo, necesario para las
+# distribuciones de las visualizaciones) y similaridad mínima por tabla
+TOPS_K_SEARCH = [None, None, None, 1, 1, 1, 1, 1, 1]
+UMBRALES_SEARCH = [None, None, None, None, None, None, None, None, None]
+
+
+def similaridades_dos_etapas(catalogos: dict, emb, tops_k: list, candidatos: int):
+  """
+  Recuperación en dos etapas para una consulta (`emb`: 9 x d, normalizado).
+
+  Primera etapa: coseno en dimensión reducida (proyección PCA) contra el
+  bloque de cada tabla; se conservan los `candidatos` mejores (nunca menos
+  que su top-K). Segunda etapa: coseno exacto en dimensión completa solo
+  sobre esos candidatos. Las tablas cuyo top-K pide el catálogo completo,
+  o con menos filas que `candidatos`, se calculan exactas de una vez.
+
+  Retorna, por tabla, las similaridades exactas (1 x n) y las filas del
+  catálogo a las que corresponden (None = todas, en orden).
+  """
+  offsets = catalogos['offsets']
+  filas = [None] * len(offsets)
+  with medir_etapa('primera_etapa'):
+    reducida = _matriz_tensor(catalogos, emb.device)
+    emb_reducido = _proyectar_consultas(catalogos, emb)
+    for idx, (inicio, fin) in enumerate(offsets):
+      n = max(candidatos, tops_k[idx])
+      if n < fin - inicio:
+        sims = (emb_reducido[idx:idx + 1] @ reducida[inicio:fin].T).cpu().numpy()[0]
+        filas[idx] = np.argpartition(-sims, n - 1)[:n]
+
+  with medir_etapa('segunda_etapa'):
+    completa = _matriz_tensor(catalogos, emb.device, 'matriz_completa')
+    matrix_unfpa = []
+    for idx, (inicio, fin) in enumerate(offsets):
+      bloque = completa[inicio:fin] if filas[idx] is None else completa[inicio + torch.from_numpy(filas[idx]).to(emb.device)]
+      matrix_unfpa.append((emb[idx:idx + 1] @ bloque.T).cpu().numpy())
+  return matrix_unfpa, filas
+
+
+@instrumentar('search')
+def search(query, tops_k = None, umbrales = None, candidatos = None):
+  """
+  Clasifica una iniciativa contra las nueve tablas de referencia.
+
+  `tops_k` y `umbrales` son listas de 9 posiciones (mismo orden que
+  CATALOGOS_TBLINPUT) que sustituyen a TOPS_K_SEARCH / UMBRALES_SEARCH.
+  El umbral descarta filas con similaridad coseno menor, pero siempre se
+  conserva la mejor coincidencia para que ninguna tabla quede vacía.
+
+  `candidatos` (por defecto CANDIDATOS_SEARCH; 0 = desactivado) activa la
+  recuperación en dos etapas si los catálogos tienen proyección PCA: los
+  candidatos salen de la dimensión reducida y las similaridades que se
+  devuelven son siempre exactas (`similaridades_dos_etapas`).
+  """
+#   patr_tblinput = ' //Copy of Iniciativas priorizadas PATR 385.xlsx' #"CSV with PATR projects (columns: id, descripcion, ...).")
+  instr_proj = "Representa el propósito de desarrollo sostenible del siguiente proyecto territorial" #"Instruction for PATR projects.")
+  instr_ods = "Representa el tema central del siguiente ODS" #"Instruction for ODS texts.")
+  batch_size = 32 #"Batch size for encoding.")
+  top_k = 5 #"Top-K ODS to retrieve.")
+  normalize = True #"L2-normalize embeddings during encoding.") # Changed from "store_true" to boolean
+
+  # Load data
+  # patr_df, ods_df = load_data(patr_tblinput, ods_tblinput)
+  # patr_df = patr_df[['ID', 'INICIATIVAS']].drop_duplicates().reset_index(drop=True) # Reset index
+  # patr_texts = patr_df["INICIATIVAS"].fillna("").tolist()
+  # patr_df = pd.read_excel(patr_tblinput)
+  catalogos = cargar_catalogos(batch_size=batch_size, normalize=normalize)
+  texts = catalogos['textos']
+
+#   nlp = spacy.load("es_core_news_md")
+#   query = limpiar_texto(query, nlp)
 
-    matrix_unfpa.append(sim_matrix_)
+  model = obtener_modelo(MODEL_NAME)  # still needed for project embeddings
 
-  print([len(x) for x in matrix_unfpa])
+  # Un vector de la iniciativa por tabla (cada una con su instrucción), codificados en un solo lote
+  with medir_etapa('codificacion'):
+    patr_pairs = [[INSTRUC_INICIATIVAS[idx], query if isinstance(query, str) else ""] for idx in range(len(catalogos['offsets']))]
+    emb_patr = compute_embeddings(model, patr_pairs, batch_size=batch_size, normalize=normalize)
+    if not torch.is_tensor(emb_patr):
+      emb_patr = torch.as_tensor(np.asarray(emb_patr))
 
   # tops_k = [5,1,1,1] # ods_use_cache, pilaresPdet_use_cache, estrategiasPdet_use_cache, categoriasPdet_use_cache
-  tops_k = [len(ods_texts),len(meta_texts),len(indicadores_texts),1,1,1,1,1,1]
+  tops_k = [top or len(texts[idx]) for idx, top in enumerate(tops_k or TOPS_K_SEARCH)]
+  candidatos = CANDIDATOS_SEARCH if candidatos is None else candidatos
+  emb_patr = torch.nn.functional.normalize(emb_patr.float(), dim=1)
+
+  if candidatos and catalogos.get('proyeccion') is not None:
+    matrix_unfpa, filas_unfpa = similaridades_dos_etapas(catalogos, emb_patr, tops_k, candidatos)
+  else:
+    with medir_etapa('cos_sim'):
+      # (9 x d) · (d x N_total): una sola multiplicación contra la matriz apilada;
+      # de cada fila solo interesa el bloque de su propia tabla (diagonal por bloques)
+      emb_patr = _proyectar_consultas(catalogos, emb_patr)
+      sims_apiladas = (emb_patr @ _matriz_tensor(catalogos, emb_patr.device).T).cpu().numpy()
+      matrix_unfpa = [sims_apiladas[idx:idx + 1, inicio:fin] for idx, (inicio, fin) in enumerate(catalogos['offsets'])]
+    filas_unfpa = [None] * len(matrix_unfpa)
+
+  logger.debug('matrices de similaridad', extra={'campos': {'filas': [x.shape[1] for x in matrix_unfpa]}})
+
+  umbrales = umbrales or UMBRALES_SEARCH
   res_dfs = []
 
   for idx, top in enumerate(tops_k):
-    sim_matrix = matrix_unfpa[idx]
-    # Top-K per project
-    # K = min(top_k, sim_matrix.shape[1])
-    K = min(top, sim_matrix.shape[1])
-    top_rows = []
-    for i in range(sim_matrix.shape[0]):
-        sims = sim_matrix[i]
-        # rt descending and take first K
-        top_idx = np.argsort(-sims)[:K]
-        # ods_df
-        # meta_df
-        # inidicador_df
-        # genero_df
-        # poblacional_df
-        # etnico_df
-        # pilares_df
-        # estrategias_df
-        # categorias_df
-
-        #### RESULTADOS PARA DESCRIPCION ODS
-        if idx == 0:
-          for rank, j in enumerate(top_idx, start=1):
-              row = {
-                  # "project_id": patr_df.iloc[i, patr_df.columns.get_loc("ID")], # Use iloc with positional index
-                  # "project_text": patr_df.iloc[i, patr_df.columns.get_loc("INICIATIVAS")], # Use iloc with positional index
-                  "ODS_ID": ods_df.iloc[j, ods_df.columns.get_loc("id_ods")], # Use iloc with positional index
-                  "OBJETIVO": ods_df.iloc[j, ods_df.columns.get_loc("ods")], # Use iloc with positional index
-
-                  # "ods_texto": ods_texts[j],
-                  "ods_rank": rank,
-                  "ods_similaridad_cos": float(sims[j]),
-                  # "ods_titulo": ods_df.iloc[j, ods_df.columns.get_loc("INDICADORES")], # Use iloc with positional index
-                  # "ods_texto": ods_texts[j]
-              }
-              top_rows.append(row)
-
-        #### RESULTADOS PARA METAS ODS
-        if idx == 1:
-          for rank, j in enumerate(top_idx, start=1):
-              row = {
-                  # "project_id": patr_df.iloc[i, patr_df.columns.get_loc("ID")], # Use iloc with positional index
-                  # "project_text": patr_df.iloc[i, patr_df.columns.get_loc("INICIATIVAS")], # Use iloc with positional index
-                  "META_ID": meta_df.iloc[j, meta_df.columns.get_loc("ID_META")], # Use iloc with positional index
-                  "META": meta_df.iloc[j, meta_df.columns.get_loc("META")], # Use iloc with positional index
-                  "ODS_ID": meta_df.iloc[j, meta_df.columns.get_loc("ID_OBJETIVO")],
-
-                  # "ods_texto": ods_texts[j],
-                  "meta_rank": rank,
-                  "meta_similaridad_cos": float(sims[j]),
-                  # "ods_titulo": ods_df.iloc[j, ods_df.columns.get_loc("INDICADORES")], # Use iloc with positional index
-                  # "ods_texto": ods_texts[j]
-              }
-              top_rows.append(row)
-
-        #### RESULTADOS PARA INDICADORES ODS
-        if idx == 2:
-          for rank, j in enumerate(top_idx, start=1):
-              row = {
-                  # "project_id": patr_df.iloc[i, patr_df.columns.get_loc("ID")], # Use iloc with positional index
-                  # "project_text": patr_df.iloc[i, patr_df.columns.get_loc("INICIATIVAS")], # Use iloc with positional index
-                  "INDICADOR_ID": inidicador_df.iloc[j, inidicador_df.columns.get_loc("ID_INDICADORES")], # Use iloc with positional index
-                  "INDICADOR": inidicador_df.iloc[j, inidicador_df.columns.get_loc("INDICADORES")], # Use iloc with positional index
-                  "ODS_ID": inidicador_df.iloc[j, inidicador_df.columns.get_loc("ID_ODS")],
-                  "META_ID": inidicador_df.iloc[j, inidicador_df.columns.get_loc("ID_META")],
-
-                  # "ods_texto": ods_texts[j],
-                  "indicador_rank": rank,
-                  "indicador_similaridad_cos": float(sims[j]),
-                  # "ods_titulo": ods_df.iloc[j, ods_df.columns.get_loc("INDICADORES")], # Use iloc with positional index
-                  # "ods_texto": ods_texts[j]
-              }
-              top_rows.append(row)
-
-        #### RESULTADOS PARA ENFOQUE GENERO
-        if idx == 3:
-          for rank, j in enumerate(top_idx, start=1):
-              row = {
-                  # "project_id": patr_df.iloc[i, patr_df.columns.get_loc("ID")], # Use iloc with positional index
-                  # "project_text": patr_df.iloc[i, patr_df.columns.get_loc("INICIATIVAS")], # Use iloc with positional index
-                  "ENFOQUE_GENERO": genero_df.iloc[j, genero_df.columns.get_loc("CATEGORIA")], # Use iloc with positional index
-                  # "INDICADOR": genero_df.iloc[j, genero_df.columns.get_loc("INDICADORES")], # Use iloc with positional index
-
-                  # "ods_texto": ods_texts[j],
-                  "rank": rank,
-                  "similaridad_cos": float(sims[j]),
-                  # "ods_titulo": ods_df.iloc[j, ods_df.columns.get_loc("INDICADORES")], # Use iloc with positional index
-                  # "ods_texto": ods_texts[j]
-              }
-              top_rows.append(row)
-
-        #### RESULTADOS PARA ENFOQUE POBLACIONAL
-        if idx == 4:
-          for rank, j in enumerate(top_idx, start=1):
-              row = {
-                  # "project_id": patr_df.iloc[i, patr_df.columns.get_loc("ID")], # Use iloc with positional index
-                  # "project_text": patr_df.iloc[i, patr_df.columns.get_loc("INICIATIVAS")], # Use iloc with positional index
-                  "ENFOQUE_POBLACIONAL": poblacional_df.iloc[j, poblacional_df.columns.get_loc("CATEGORIA")], # Use iloc with positional index
-                  # "INDICADOR": poblacional_df.iloc[j, poblacional_df.columns.get_loc("INDICADORES")], # Use iloc with positional index
-
-                  # "ods_texto": ods_texts[j],
-                  "rank": rank,
-                  "similaridad_cos": float(sims[j]),
-                  # "ods_titulo": ods_df.iloc[j, ods_df.columns.get_loc("INDICADORES")], # Use iloc with positional index
-                  # "ods_texto": ods_texts[j]
-              }
-              top_rows.append(row)
-
-        #### RESULTADOS PARA ENFOQUE ETNICO
-        if idx == 5:
-          for rank, j in enumerate(top_idx, start=1):
-              row = {
-                  # "project_id": patr_df.iloc[i, patr_df.columns.get_loc("ID")], # Use iloc with positional index
-                  # "project_text": patr_df.iloc[i, patr_df.columns.get_loc("INICIATIVAS")], # Use iloc with positional index
-                  "ENFOQUE_POBLACIONAL": etnico_df.iloc[j, etnico_df.columns.get_loc("CATEGORIA")], # Use iloc with positional index
-                  # "INDICADOR": etnico_df.iloc[j, etnico_df.columns.get_loc("INDICADORES")], # Use iloc with positional index
-
-                  # "ods_texto": ods_texts[j],
-                  "rank": rank,
-                  "similaridad_cos": float(sims[j]),
-                  # "ods_titulo": ods_df.iloc[j, ods_df.columns.get_loc("INDICADORES")], # Use iloc with positional index
-                  # "ods_texto": ods_texts[j]
-              }
-              top_rows.append(row)
-
-        #### RESULTADOS PARA PILARES
-        if idx == 6:
-          for rank, j in enumerate(top_idx, start=1):
-              row = {
-                  "rank": rank,
-                  "similaridad_cos": float(sims[j]),
-                  "pilar_texto": pilares_texts[j]
-              }
-              top_rows.append(row)
-
-        #### RESULTADOS PARA ESTRATEGIAS
-        if idx == 7:
-          for rank, j in enumerate(top_idx, start=1):
-              row = {
-                  "rank": rank,
-                  "similaridad_cos": float(sims[j]),
-                  "estrategia_texto": estrategias_texts[j]
-              }
-              top_rows.append(row)
-
-        #### RESULTADOS PARA CATEGORIAS
-        if idx == 8:
-          for rank, j in enumerate(top_idx, start=1):
-              row = {
-                  "rank": rank,
-                  "similaridad_cos": float(sims[j]),
-                  "categoria_texto": categorias_texts[j]
-              }
-              top_rows.append(row)
-
-
-    res_df = pd.DataFrame(top_rows).drop_duplicates()
+    sims = matrix_unfpa[idx][0]
+    K = min(top, len(sims))
+    with medir_etapa('ranking'):
+      # Ordenar de mayor a menor y tomar los primeros K
+      if K < len(sims):
+        top_idx = np.argpartition(-sims, K - 1)[:K]
+        top_idx = top_idx[np.argsort(-sims[top_idx])]
+      else:
+        top_idx = np.argsort(-sims)
+      if umbrales[idx] is not None:
+        top_idx = top_idx[:max(1, int((sims[top_idx] >= umbrales[idx]).sum()))]
+
+    # Esquema compacto: IDs y textos como categóricas (código = fila del
+    # catálogo, el texto se resuelve al mostrarlo), scores float32, ranks int16
+    with medir_etapa('construccion_frames'):
+      # En dos etapas `sims` son los candidatos: se vuelve a filas del catálogo
+      filas = top_idx if filas_unfpa[idx] is None else filas_unfpa[idx][top_idx]
+      columna = partial(columna_resultado, catalogos, idx, filas=filas)
+      ranks = np.arange(1, len(top_idx) + 1, dtype=tipo_rank(len(sims)))
+      scores = sims[top_idx].astype(np.float32)
+
+      #### RESULTADOS PARA DESCRIPCION ODS
+      if idx == 0:
+        res_df = pd.DataFrame({
+            "ODS_ID": columna("id_ods"),
+            "OBJETIVO": columna("ods"),
+            "ods_rank": ranks,
+            "ods_similaridad_cos": scores,
+        })
+
+      #### RESULTADOS PARA METAS ODS
+      elif idx == 1:
+        res_df = pd.DataFrame({
+            "META_ID": columna("ID_META"),
+            "META": columna("META"),
+            "ODS_ID": columna("ID_OBJETIVO"),
+            "meta_rank": ranks,
+            "meta_similaridad_cos": scores,
+        })
+
+      #### RESULTADOS PARA INDICADORES ODS
+      elif idx == 2:
+        res_df = pd.DataFrame({
+            "INDICADOR_ID": columna("ID_INDICADORES"),
+            "INDICADOR": columna("INDICADORES"),
+            "ODS_ID": columna("ID_ODS"),
+            "META_ID": columna("ID_META"),
+            "indicador_rank": ranks,
+            "indicador_similaridad_cos": scores,
+        })
+
+      #### RESULTADOS PARA ENFOQUES GENERO, POBLACIONAL Y ETNICO
+      elif idx in (3, 4, 5):
+        res_df = pd.DataFrame({
+            {3: "ENFOQUE_GENERO", 4: "ENFOQUE_POBLACIONAL", 5: "ENFOQUE_ETNICO"}[idx]: columna("CATEGORIA"),
+            "rank": ranks,
+            "similaridad_cos": scores,
+        })
+
+      #### RESULTADOS PARA PILARES, ESTRATEGIAS Y CATEGORIAS
+      else:
+        res_df = pd.DataFrame({
+            "rank": ranks,
+            "similaridad_cos": scores,
+            {6: "pilar_texto", 7: "estrategia_texto", 8: "categoria_texto"}[idx]: columna("texto"),
+        })
+
+      res_df = res_df.drop_duplicates()
     res_dfs.append(res_df)
 
   # Additionally, export a simple edges file (Top-1) for graph visualizations
@@ -498,45 +707,129 @@ def search(query):
   # Initialize the MinMaxScaler
   scaler = MinMaxScaler()
 
-  for i in range(0,3):    
-
-    if i == 0:
-      # Reshape the 'similaridad_cos' column as it needs to be 2D for the scaler
-      similarity_scores = res_dfs[i]['ods_similaridad_cos'].values.reshape(-1, 1)
-      # Fit and transform the data
-      res_dfs[i]['ods_similaridad_cos_normalized'] = scaler.fit_transform(similarity_scores)
-      # df_sim = res_dfs[i][['ODS_ID',	'OBJETIVO',	'rank',	'similaridad_cos']]
-      # df_simnorm = res_dfs[i][['ODS_ID',	'OBJETIVO',	'ods_rank', 'ods_similaridad_cos_normalized']]
-      # df_simnorm.columns = ['ODS_ID',	'OBJETIVO',	'rank',	'similaridad_cos']
-      # dfs_norm.append(df_simnorm)
-    if i == 1:
-      # Reshape the 'similaridad_cos' column as it needs to be 2D for the scaler
-      similarity_scores = res_dfs[i]['meta_similaridad_cos'].values.reshape(-1, 1)
-      # Fit and transform the data
-      res_dfs[i]['meta_similaridad_cos_normalized'] = scaler.fit_transform(similarity_scores)
-      # df_sim = res_dfs[i][['META_ID',	'META',	'rank',	'similaridad_cos']]
-      # df_simnorm = res_dfs[i][['META_ID',	'META',	'rank', 'similaridad_cos_normalized']]
-      # df_simnorm.columns = ['META_ID',	'META',	'rank',	'similaridad_cos']
-      # dfs_norm.append(df_simnorm)
-    if i == 2:
-      # Reshape the 'similaridad_cos' column as it needs to be 2D for the scaler
-      similarity_scores = res_dfs[i]['indicador_similaridad_cos'].values.reshape(-1, 1)
-      # Fit and transform the data
-      res_dfs[i]['indicador_similaridad_cos_normalized'] = scaler.fit_transform(similarity_scores)
-      # # df_sim = res_dfs[i][['INDICADOR_ID',	'INDICADOR',	'rank',	'similaridad_cos']]
-      # df_simnorm = res_dfs[i][['INDICADOR_ID',	'INDICADOR',	'rank', 'similaridad_cos_normalized']]
-      # df_simnorm.columns = ['INDICADOR_ID',	'INDICADOR',	'rank',	'similaridad_cos']
-      # dfs_norm.append(df_simnorm)
+  with medir_etapa('minmax'):
+    for i in range(0,3):    
+
+      if i == 0:
+        # Reshape the 'similaridad_cos' column as it needs to be 2D for the scaler
+        similarity_scores = res_dfs[i]['ods_similaridad_cos'].values.reshape(-1, 1)
+        # Fit and transform the data
+        res_dfs[i]['ods_similaridad_cos_normalized'] = scaler.fit_transform(similarity_scores)
+        # df_sim = res_dfs[i][['ODS_ID',	'OBJETIVO',	'rank',	'similaridad_cos']]
+        # df_simnorm = res_dfs[i][['ODS_ID',	'OBJETIVO',	'ods_rank', 'ods_similaridad_cos_normalized']]
+        # df_simnorm.columns = ['ODS_ID',	'OBJETIVO',	'rank',	'similaridad_cos']
+        # dfs_norm.append(df_simnorm)
+      if i == 1:
+        # Reshape the 'similaridad_cos' column as it needs to be 2D for the scaler
+        similarity_scores = res_dfs[i]['meta_similaridad_cos'].values.reshape(-1, 1)
+        # Fit and transform the data
+        res_dfs[i]['meta_similaridad_cos_normalized'] = scaler.fit_transform(similarity_scores)
+        # df_sim = res_dfs[i][['META_ID',	'META',	'rank',	'similaridad_cos']]
+        # df_simnorm = res_dfs[i][['META_ID',	'META',	'rank', 'similaridad_cos_normalized']]
+        # df_simnorm.columns = ['META_ID',	'META',	'rank',	'similaridad_cos']
+        # dfs_norm.append(df_simnorm)
+      if i == 2:
+        # Reshape the 'similaridad_cos' column as it needs to be 2D for the scaler
+        similarity_scores = res_dfs[i]['indicador_similaridad_cos'].values.reshape(-1, 1)
+        # Fit and transform the data
+        res_dfs[i]['indicador_similaridad_cos_normalized'] = scaler.fit_transform(similarity_scores)
+        # # df_sim = res_dfs[i][['INDICADOR_ID',	'INDICADOR',	'rank',	'similaridad_cos']]
+        # df_simnorm = res_dfs[i][['INDICADOR_ID',	'INDICADOR',	'rank', 'similaridad_cos_normalized']]
+        # df_simnorm.columns = ['INDICADOR_ID',	'INDICADOR',	'rank',	'similaridad_cos']
+        # dfs_norm.append(df_simnorm)
     
-    bdl_ods = res_dfs[0].merge(res_dfs[1], 'inner', left_on='ODS_ID', right_on='ODS_ID')
-    bdl_ods = bdl_ods.merge(res_dfs[2],'inner', left_on=['ODS_ID','META_ID'], right_on=['ODS_ID','META_ID'])
-    print(f'Tamaño BDL: {len(bdl_ods)}')
+  # El merge se hace una sola vez, con las tres tablas ya normalizadas
+  with medir_etapa('merge_bdl'):
+    bdl_ods = unir_bdl(res_dfs[0], res_dfs[1], res_dfs[2])
+  logger.debug(f'Tamaño BDL: {len(bdl_ods)}')
 
-    
 
   return (query, res_dfs[0], res_dfs[1], res_dfs[2], res_dfs[3], res_dfs[4], res_dfs[5], res_dfs[6], res_dfs[7], res_dfs[8], bdl_ods)
 
 
+# ============================================================================
+# Clasificación en lote (muchas iniciativas por llamada)
+# ============================================================================
+
+TOPS_K_LOTE = [5, 5, 5, 1, 1, 1, 1, 1, 1]
+
+@instrumentar('clasificar_lote')
+def clasificar_lote(textos: list, tops_k = None, batch_size = 32, normalize = True):
+  """
+  Clasifica muchas iniciativas en una sola pasada contra las nueve tablas.
+
+  Codifica todos los textos por tabla en lotes, calcula la matriz de
+  similaridad (iniciativas x catálogo) y extrae el top-K de cada fila de
+  forma vectorizada.
+
+  Retorna una lista de 9 DataFrames (mismo orden que `search`) en formato
+  largo; la columna INICIATIVA es la posición del texto en `textos`.
+  """
+  tops_k = tops_k or TOPS_K_LOTE
+  catalogos = cargar_catalogos(batch_size=batch_size, normalize=normalize)
+  model = obtener_modelo(MODEL_NAME)
+
+  n = len(textos)
+  iniciativas = np.arange(n, dtype=np.int32)
+  res_dfs = []
+
+  for idx, (inicio, fin) in enumerate(catalogos['offsets']):
+    with medir_etapa('codificacion'):
+      pairs = make_text_pairs(INSTRUC_INICIATIVAS[idx], textos)
+      emb_patr = compute_embeddings(model, pairs, batch_size=batch_size, normalize=normalize)
+
+    with medir_etapa('cos_sim'):
+      # Bloque de la tabla dentro de la matriz apilada (vista, sin copia)
+      emb_patr = _proyectar_consultas(catalogos, torch.nn.functional.normalize(emb_patr.float(), dim=1))
+      sims = (emb_patr @ _matriz_tensor(catalogos, emb_patr.device)[inicio:fin].T).cpu().numpy()
+
+    with medir_etapa('ranking'):
+      K = min(tops_k[idx], sims.shape[1])
+      top_idx = np.argpartition(-sims, K - 1, axis=1)[:, :K]
+      orden = np.argsort(-np.take_along_axis(sims, top_idx, axis=1), axis=1)
+      top_idx = np.take_along_axis(top_idx, orden, axis=1)
+      top_sims = np.take_along_axis(sims, top_idx, axis=1)
+
+    # Mismo esquema compacto que `search` (IDs categóricos, float32, int16)
+    with medir_etapa('construccion_frames'):
+      j = top_idx.ravel()
+      columna = partial(columna_resultado, catalogos, idx, filas=j)
+      ranks = np.tile(np.arange(1, K + 1, dtype=tipo_rank(K)), n)
+      scores = top_sims.ravel().astype(np.float32)
+      res_df = pd.DataFrame({'INICIATIVA': np.repeat(iniciativas, K)})
+
+      if idx == 0:
+        res_df['ODS_ID'] = columna('id_ods')
+        res_df['ods_rank'] = ranks
+        res_df['ods_similaridad_cos'] = scores
+      elif idx == 1:
+        res_df['META_ID'] = columna('ID_META')
+        res_df['ODS_ID'] = columna('ID_OBJETIVO')
+        res_df['meta_rank'] = ranks
+        res_df['meta_similaridad_cos'] = scores
+      elif idx == 2:
+        res_df['INDICADOR_ID'] = columna('ID_INDICADORES')
+        res_df['ODS_ID'] = columna('ID_ODS')
+        res_df['META_ID'] = columna('ID_META')
+        res_df['indicador_rank'] = ranks
+        res_df['indicador_similaridad_cos'] = scores
+      else:
+        if idx == 3:
+          res_df['ENFOQUE_GENERO'] = columna('CATEGORIA')
+        elif idx == 4:
+          res_df['ENFOQUE_POBLACIONAL'] = columna('CATEGORIA')
+        elif idx == 5:
+          res_df['ENFOQUE_ETNICO'] = columna('CATEGORIA')
+        else:
+          res_df['ITEM'] = j.astype(np.int32)
+        res_df['rank'] = ranks
+        res_df['similaridad_cos'] = scores
+
+    res_dfs.append(res_df)
+
+  return res_dfs
+
+
 
 # ============================================================================
 # Función para normalizar
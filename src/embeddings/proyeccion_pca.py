@@ -0,0 +1,80 @@
+"""
+PROYECCIÓN PCA DE LOS EMBEDDINGS
+================================
+
+Proyección lineal aprendida (d → 128/256) para comparar iniciativas y
+catálogos en dimensión reducida: la matriz apilada ocupa d/k veces menos
+memoria y la multiplicación de `search` / `clasificar_lote` cuesta en la
+misma proporción.
+
+- `ajustar_proyeccion(muestras, dimension)`: componentes principales de
+  las filas normalizadas (embeddings de catálogos e iniciativas).
+- `proyectar(x, componentes)`: proyecta y re-normaliza, así que el
+  producto punto en dimensión reducida sigue siendo un coseno.
+- `recall_at_k(...)` / `evaluar_recall(...)`: fracción del top-k exacto
+  (dimensión completa) que recupera el top-k en dimensión reducida.
+
+Los componentes se calculan sobre la matriz de segundos momentos, sin
+centrar: restar la media sumaría a cada fila del catálogo un sesgo
+(-media·c) que cambia el orden de las similaridades; sin centrar, la
+proyección es la aproximación de rango k que mejor conserva los
+productos punto. Solo numpy; la carga y el guardado (.npz + sidecar JSON,
+como los caches de catálogos) están en `modelos_nlp_db`.
+"""
+
+import numpy as np
+
+DIMENSIONES_PCA = (128, 256)
+KS_RECALL = (1, 5, 10)
+
+
+def normalizar(x):
+    x = np.asarray(x, dtype=np.float32)
+    normas = np.linalg.norm(x, axis=1, keepdims=True)
+    return x / np.where(normas == 0, 1.0, normas)
+
+
+def ajustar_proyeccion(muestras, dimension: int):
+    """
+    Componentes principales (dimension x d, float32) de las filas de
+    `muestras` normalizadas, y la fracción de energía que conservan.
+    """
+    x = normalizar(muestras)
+    if not 0 < dimension < x.shape[1]:
+        raise ValueError(f"dimension debe estar entre 1 y {x.shape[1] - 1} (recibido {dimension})")
+    momentos = (x.T.astype(np.float64) @ x) / max(len(x), 1)
+    valores, vectores = np.linalg.eigh(momentos)
+    orden = np.argsort(valores)[::-1][:dimension]
+    componentes = np.ascontiguousarray(vectores[:, orden].T, dtype=np.float32)
+    energia = float(valores[orden].sum() / valores.sum()) if valores.sum() > 0 else 0.0
+    return componentes, energia
+
+
+def proyectar(x, componentes):
+    """Filas de `x` proyectadas sobre `componentes` y re-normalizadas (float32, contiguo)."""
+    return np.ascontiguousarray(normalizar(np.asarray(x, dtype=np.float32) @ componentes.T))
+
+
+def _top_k(sims, k):
+    return np.argpartition(-sims, k - 1, axis=1)[:, :k]
+
+
+def recall_at_k(sims_completas, sims_reducidas, k: int):
+    """Promedio por consulta de |top-k exacto ∩ top-k reducido| / k."""
+    k = min(k, sims_completas.shape[1])
+    exacto = _top_k(sims_completas, k)
+    reducido = _top_k(sims_reducidas, k)
+    aciertos = (exacto[:, :, None] == reducido[:, None, :]).any(axis=2).sum(axis=1)
+    return float(aciertos.mean() / k)
+
+
+def evaluar_recall(consultas, catalogo, componentes, ks=KS_RECALL):
+    """
+    Recall@k de la búsqueda en dimensión reducida contra la búsqueda en
+    dimensión completa, para consultas (n x d) contra un catálogo (m x d).
+    Solo se reportan los k menores que el tamaño del catálogo.
+    """
+    consultas, catalogo = normalizar(consultas), normalizar(catalogo)
+    completas = consultas @ catalogo.T
+    reducidas = proyectar(consultas, componentes) @ proyectar(catalogo, componentes).T
+    return {k: recall_at_k(completas, reducidas, k) for k in ks if k < catalogo.shape[0]}
@@ -0,0 +1,212 @@
+"""
+SNAPSHOT LOCAL DEL MODELO DE EMBEDDINGS
+=======================================
+
+Materializa el modelo (p. ej. hkunlp/instructor-large) en un directorio
+local con los pesos en safetensors y un manifiesto (`snapshot.json`) que
+fija el modelo, la revisión del hub, las versiones de las librerías y el
+tamaño y sha256 de cada archivo.
+
+Si existe el snapshot, `cargar_modelo` lo usa en modo offline estricto
+(HF_HUB_OFFLINE / TRANSFORMERS_OFFLINE): ninguna consulta al hub al
+arrancar, así que funciona en equipos sin red. Con VOCES_ODS_OFFLINE=1 la
+falta de snapshot es un error en lugar de una descarga.
+
+- Directorio base: VOCES_ODS_MODELOS (por defecto data/modelos); cada
+  modelo en `<base>/<organizacion>--<nombre>`.
+- Creación y verificación: `python -m scripts.snapshot_modelo`.
+
+Al importar este módulo no se carga ninguna librería de modelos.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+from src.utils.instrumentacion import logger
+
+DIRECTORIO_MODELOS = Path(os.environ.get('VOCES_ODS_MODELOS', 'data/modelos'))
+MODO_OFFLINE = os.environ.get('VOCES_ODS_OFFLINE', '0') == '1'
+MANIFIESTO = 'snapshot.json'
+# Texto de calentamiento: la primera codificación incluye inicializaciones perezosas
+PAR_CALENTAMIENTO = [['Representa el tema central del siguiente texto', 'agua potable para la vereda']]
+
+
+def ruta_snapshot(model_name: str) -> Path:
+    return DIRECTORIO_MODELOS / model_name.replace('/', '--')
+
+
+def leer_manifiesto(destino):
+    ruta = Path(destino) / MANIFIESTO
+    if not ruta.is_file():
+        return None
+    with open(ruta, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def modo_offline(model_name: str) -> bool:
+    """True si el modelo se cargará sin red (hay snapshot o VOCES_ODS_OFFLINE=1)."""
+    return MODO_OFFLINE or leer_manifiesto(ruta_snapshot(model_name)) is not None
+
+
+def activar_modo_offline():
+    """
+    Prohíbe el acceso al hub en este proceso. Las variables de entorno
+    cubren las librerías que aún no se importaron; huggingface_hub y
+    transformers leen la suya al importarse, así que si ya están cargadas
+    (gradio importa huggingface_hub) se ajusta también su valor en memoria.
+    """
+    os.environ['HF_HUB_OFFLINE'] = '1'
+    os.environ['TRANSFORMERS_OFFLINE'] = '1'
+    os.environ['HF_HUB_DISABLE_TELEMETRY'] = '1'
+    os.environ['GRADIO_ANALYTICS_ENABLED'] = 'False'
+    constantes = sys.modules.get('huggingface_hub.constants')
+    if constantes is not None:
+        constantes.HF_HUB_OFFLINE = True
+    hub_transformers = sys.modules.get('transformers.utils.hub')
+    if hub_transformers is not None:
+        hub_transformers._is_offline_mode = True
+
+
+def _sha256(ruta, bloque=2**22):
+    h = hashlib.sha256()
+    with open(ruta, 'rb') as f:
+        for parte in iter(lambda: f.read(bloque), b''):
+            h.update(parte)
+    return h.hexdigest()
+
+
+def _archivos(directorio):
+    directorio = Path(directorio)
+    return sorted(p for p in directorio.rglob('*') if p.is_file() and p.name != MANIFIESTO)
+
+
+def _versiones():
+    versiones = {'python': sys.version.split()[0]}
+    for paquete in ('sentence_transformers', 'transformers', 'torch', 'huggingface_hub', 'safetensors'):
+        modulo = sys.modules.get(paquete)
+        versiones[paquete] = getattr(modulo, '__version__', None)
+    return versiones
+
+
+def _revision_hub(model_name, revision):
+    """Commit del hub al que apunta `revision` (None si no hay red o es una ruta local)."""
+    try:
+        from huggingface_hub import HfApi
+        return HfApi().model_info(model_name, revision=revision).sha
+    except Exception as e:
+        logger.warning('no se pudo resolver la revisión en el hub', extra={'campos': {'modelo': model_name, 'error': repr(e)}})
+        return revision
+
+
+# ============================================================================
+# CREACIÓN Y VERIFICACIÓN
+# ============================================================================
+
+def crear_snapshot(model_name: str, origen=None, revision=None, destino=None):
+    """
+    Descarga `model_name` (o lo lee de `origen`, ruta local) y lo guarda en
+    `destino` con pesos safetensors y manifiesto. El directorio se escribe
+    aparte y se reemplaza al final, así que un snapshot a medias nunca
+    queda en uso. Devuelve el manifiesto.
+    """
+    from sentence_transformers import SentenceTransformer
+
+    destino = Path(destino or ruta_snapshot(model_name))
+    inicio = time.perf_counter()
+    modelo = SentenceTransformer(str(origen or model_name), revision=revision, device='cpu')
+    segundos_descarga = time.perf_counter() - inicio
+
+    temporal = destino.with_name(destino.name + '.tmp')
+    shutil.rmtree(temporal, ignore_errors=True)
+    temporal.parent.mkdir(parents=True, exist_ok=True)
+    modelo.save(str(temporal), safe_serialization=True)
+
+    manifiesto = {
+        'modelo': model_name,
+        'revision': None if origen else _revision_hub(model_name, revision),
+        'origen': str(origen) if origen else 'hub',
+        'creado': datetime.now().isoformat(timespec='seconds'),
+        'formato': 'safetensors',
+        'dimension': modelo.get_sentence_embedding_dimension(),
+        'max_seq_length': modelo.max_seq_length,
+        'versiones': _versiones(),
+        'segundos_descarga': round(segundos_descarga, 2),
+        'archivos': {
+            str(p.relative_to(temporal)): {'bytes': p.stat().st_size, 'sha256': _sha256(p)}
+            for p in _archivos(temporal)
+        },
+    }
+    with open(temporal / MANIFIESTO, 'w', encoding='utf-8') as f:
+        json.dump(manifiesto, f, ensure_ascii=False, indent=2)
+
+    anterior = destino.with_name(destino.name + '.old')
+    shutil.rmtree(anterior, ignore_errors=True)
+    if destino.exists():
+        destino.rename(anterior)
+    temporal.rename(destino)
+    shutil.rmtree(anterior, ignore_errors=True)
+    return manifiesto
+
+
+def verificar_snapshot(destino, hashes=False):
+    """Lista de problemas del snapshot (vacía si está completo); `hashes` compara también sha256."""
+    destino = Path(destino)
+    manifiesto = leer_manifiesto(destino)
+    if manifiesto is None:
+        return [f'no hay {MANIFIESTO} en {destino}']
+    problemas = []
+    for relativa, esperado in manifiesto['archivos'].items():
+        ruta = destino / relativa
+        if not ruta.is_file():
+            problemas.append(f'falta {relativa}')
+        elif ruta.stat().st_size != esperado['bytes']:
+            problemas.append(f'tamaño distinto en {relativa}')
+        elif hashes and _sha256(ruta) != esperado['sha256']:
+            problemas.append(f'sha256 distinto en {relativa}')
+    if not any(Path(r).suffix == '.safetensors' for r in manifiesto['archivos']):
+        problemas.append('sin pesos .safetensors')
+    return problemas
+
+
+# ============================================================================
+# CARGA
+# ============================================================================
+
+def cargar_modelo(model_name: str, **kwargs):
+    """
+    SentenceTransformer desde el snapshot local (offline estricto) si existe;
+    si no, desde el hub, salvo con VOCES_ODS_OFFLINE=1. Registra el tiempo
+    hasta tener el modelo listo (carga + primera codificación).
+    """
+    destino = ruta_snapshot(model_name)
+    manifiesto = leer_manifiesto(destino)
+    if manifiesto is None and MODO_OFFLINE:
+        raise RuntimeError(f"VOCES_ODS_OFFLINE=1 y no hay snapshot de {model_name} en {destino}; "
+                           f"créalo con: python -m scripts.snapshot_modelo --modelo {model_name}")
+    if manifiesto is not None:
+        activar_modo_offline()
+
+    inicio = time.perf_counter()
+    from sentence_transformers import SentenceTransformer
+    if manifiesto is not None:
+        modelo = SentenceTransformer(str(destino), **kwargs)
+    else:
+        modelo = SentenceTransformer(model_name, **kwargs)
+    segundos_carga = time.perf_counter() - inicio
+    modelo.encode(PAR_CALENTAMIENTO)
+    segundos_listo = time.perf_counter() - inicio
+
+    logger.info('modelo listo', extra={'campos': {
+        'modelo': model_name,
+        'origen': 'snapshot' if manifiesto is not None else 'hub',
+        'revision': manifiesto.get('revision') if manifiesto else None,
+        'segundos_carga': round(segundos_carga, 3),
+        'segundos_listo': round(segundos_listo, 3),
+    }})
+    return modelo
@@ -0,0 +1,121 @@
+"""
+ALMACÉN DE RESULTADOS POR SESIÓN
+================================
+
+Guarda en el servidor las tablas de resultado de cada consulta para que el
+navegador solo conserve un identificador (handle). Los manejadores de las
+visualizaciones reciben el handle y recuperan aquí los DataFrames, así que
+ninguna tabla grande viaja por el websocket en cada clic.
+
+- Expulsión por tiempo de vida (TTL) desde el último acceso.
+- Tope de memoria total: al superarlo se expulsan primero las entradas
+  usadas hace más tiempo (LRU).
+
+Solo biblioteca estándar y pandas.
+"""
+
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+import pandas as pd
+
+from src.utils.instrumentacion import logger
+
+
+def tamano_bytes(tablas):
+    """
+    Memoria aproximada (bytes) de una lista de DataFrames. Las categorías de
+    las columnas categóricas se cuentan una sola vez: las tablas de `search`
+    comparten las del catálogo y cada fila solo guarda su código.
+    """
+    total = 0
+    categorias = {}
+    for df in tablas:
+        if not isinstance(df, pd.DataFrame):
+            continue
+        total += df.index.memory_usage(deep=True)
+        for _, serie in df.items():
+            if isinstance(serie.dtype, pd.CategoricalDtype):
+                total += serie.cat.codes.nbytes
+                categorias[serie.dtype] = serie.cat.categories
+            else:
+                total += serie.memory_usage(index=False, deep=True)
+    total += sum(c.memory_usage(deep=True) for c in categorias.values())
+    return int(total)
+
+
+class AlmacenResultados:
+    """Diccionario handle -> tablas con TTL y tope de memoria (thread-safe)."""
+
+    def __init__(self, ttl_segundos=1800, max_bytes=512 * 2**20):
+        self.ttl_segundos = ttl_segundos
+        self.max_bytes = max_bytes
+        self._entradas = OrderedDict()   # handle -> (tablas, bytes, ultimo_acceso)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.expulsiones = 0
+
+    def guardar(self, tablas, handle=None):
+        """Guarda `tablas` y devuelve su handle (nuevo si no se indica uno)."""
+        handle = handle or uuid.uuid4().hex
+        tablas = list(tablas)
+        peso = tamano_bytes(tablas)
+        with self._lock:
+            self._quitar(handle)
+            self._entradas[handle] = (tablas, peso, time.monotonic())
+            self._bytes += peso
+            self._expulsar()
+        return handle
+
+    def obtener(self, handle):
+        """Tablas del handle, o None si no existe o expiró."""
+        if not handle:
+            return None
+        with self._lock:
+            entrada = self._entradas.get(handle)
+            if entrada is None:
+                return None
+            tablas, peso, ultimo = entrada
+            if time.monotonic() - ultimo > self.ttl_segundos:
+                self._quitar(handle)
+                self.expulsiones += 1
+                return None
+            self._entradas[handle] = (tablas, peso, time.monotonic())
+            self._entradas.move_to_end(handle)
+            return tablas
+
+    def eliminar(self, handle):
+        """Libera el handle (p. ej. al cerrar la sesión del navegador)."""
+        with self._lock:
+            self._quitar(handle)
+
+    def estadisticas(self):
+        with self._lock:
+            return {'entradas': len(self._entradas), 'bytes': self._bytes,
+                    'max_bytes': self.max_bytes, 'expulsiones': self.expulsiones}
+
+    # ------------------------------------------------------------------
+    # Internos (llamar con el lock tomado)
+    # ------------------------------------------------------------------
+
+    def _quitar(self, handle):
+        entrada = self._entradas.pop(handle, None)
+        if entrada is not None:
+            self._bytes -= entrada[1]
+
+    def _expulsar(self):
+        ahora = time.monotonic()
+        vencidos = [h for h, (_, _, ultimo) in self._entradas.items() if ahora - ultimo > self.ttl_segundos]
+        for handle in vencidos:
+            self._quitar(handle)
+        # La entrada recién guardada (la última) se conserva aunque sola supere el tope
+        while self._bytes > self.max_bytes and len(self._entradas) > 1:
+            handle = next(iter(self._entradas))
+            self._quitar(handle)
+            vencidos.append(handle)
+        if vencidos:
+            self.expulsiones += len(vencidos)
+            logger.debug('almacen de resultados: expulsiones',
+                         extra={'campos': {'expulsados': len(vencidos), 'bytes': self._bytes}})
@@ -0,0 +1,213 @@
+"""
+CARGA DE RESULTADOS POR LOTES Y CON TIPOS COMPACTOS
+===================================================
+
+Lee exportaciones de resultados (tabla markdown con `|`, CSV, Parquet o
+Arrow/Feather) en lotes de `filas_lote` filas, con los tipos declarados
+de antemano en lugar de los que infiere pandas:
+
+- IDs (`*_ID`, `ID`, `MUNICIPIO`, enfoques) → `category` (categorías
+  enteras si todos los valores son enteros: ODS 1..17 ordena bien);
+- scores (`*similaridad*`) → `float32`;
+- ranks (`rank`, `*_rank`) e `INICIATIVA` → `int32` (`float32` si hay nulos).
+
+Los espacios de los textos se quitan sobre los valores únicos de cada
+columna (factorize + strip de las categorías), no celda por celda.
+
+- `leer_por_lotes(ruta)`: generador de DataFrames tipados; la memoria
+  máxima es la de un lote (para `EstadisticasOnline`, el cubo, etc.).
+- `cargar_resultados(ruta)`: todos los lotes en un solo DataFrame; las
+  columnas categóricas se unen con `union_categoricals` (no pasan por
+  `object` al concatenar).
+
+Parquet y Arrow requieren `pyarrow`; markdown y CSV solo pandas.
+"""
+
+import re
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+FILAS_LOTE = 250_000
+EXTENSIONES_PARQUET = {'.parquet', '.pq'}
+EXTENSIONES_ARROW = {'.arrow', '.feather', '.ipc'}
+
+COLUMNAS_CATEGORICAS = {'ID', 'MUNICIPIO', 'ENFOQUE_GENERO', 'ENFOQUE_POBLACIONAL', 'ENFOQUE_ETNICO'}
+# Columnas de texto con muchos valores repetidos (ratio únicos/filas) que
+# también se guardan como categoría
+RATIO_CATEGORIA = 0.5
+_ENTERO = re.compile(r'^-?\d+$')
+
+
+def tipo_columna(nombre):
+    """Tipo declarado para una columna de resultados (None = se infiere)."""
+    if nombre in COLUMNAS_CATEGORICAS or nombre.endswith('_ID'):
+        return 'category'
+    if 'similaridad' in nombre:
+        return 'float32'
+    if nombre in ('rank', 'INICIATIVA') or nombre.endswith('_rank'):
+        return 'int32'
+    return None
+
+
+# ============================================================================
+# TIPADO Y LIMPIEZA VECTORIZADA
+# ============================================================================
+
+def _categorica_limpia(serie):
+    """Categórica con los valores sin espacios (strip sobre los únicos)."""
+    codigos, unicos = pd.factorize(serie, sort=False)
+    unicos = pd.Index(unicos)
+    if unicos.dtype == object:
+        unicos = unicos.astype(str).str.strip()
+    if len(unicos) and unicos.dtype == object and all(_ENTERO.match(u) for u in unicos):
+        unicos = unicos.astype(np.int64)
+    # Tras el strip pueden coincidir valores antes distintos (" 3" y "3")
+    inverso, limpios = pd.factorize(unicos, sort=True)
+    codigos = np.where(codigos >= 0, inverso[np.maximum(codigos, 0)], -1)
+    return pd.Series(pd.Categorical.from_codes(codigos, categories=limpios), index=serie.index, name=serie.name)
+
+
+def _texto_limpio(serie):
+    """Texto sin espacios; como categoría si se repite lo suficiente."""
+    categorica = _categorica_limpia(serie)
+    if len(categorica.cat.categories) <= RATIO_CATEGORIA * max(len(serie), 1):
+        return categorica
+    return categorica.astype(object).where(categorica.notna(), None)
+
+
+def tipar(df, tipos=None):
+    """Aplica los tipos declarados (y limpia textos) a un DataFrame, sin copiar lo que ya está bien."""
+    tipos = tipos or {}
+    columnas = {}
+    for nombre in df.columns:
+        serie = df[nombre]
+        tipo = tipos.get(nombre, tipo_columna(nombre))
+        if tipo == 'category':
+            serie = _categorica_limpia(serie)
+        elif tipo == 'float32':
+            serie = pd.to_numeric(serie, errors='coerce').astype(np.float32)
+        elif tipo == 'int32':
+            serie = pd.to_numeric(serie, errors='coerce')
+            serie = serie.astype(np.float32 if serie.isna().any() else np.int32)
+        elif tipo is not None:
+            serie = serie.astype(tipo)
+        elif serie.dtype == object:
+            serie = _texto_limpio(serie)
+        columnas[nombre] = serie
+    return pd.DataFrame(columnas, index=df.index)
+
+
+# ============================================================================
+# LECTURA POR LOTES
+# ============================================================================
+
+def _formato(ruta):
+    ruta = Path(ruta)
+    sufijo = ruta.suffix.lower()
+    if ruta.is_dir() or sufijo in EXTENSIONES_PARQUET:
+        return 'parquet'
+    if sufijo in EXTENSIONES_ARROW:
+        return 'arrow'
+    if sufijo == '.csv':
+        return 'csv'
+    return 'markdown'
+
+
+def _lotes_texto(ruta, columnas, filas_lote, markdown):
+    separador = '|' if markdown else ','
+    encabezado = pd.read_csv(ruta, sep=separador, nrows=0).columns
+    posiciones = range(1, len(encabezado) - 1) if markdown else range(len(encabezado))
+    nombres = {encabezado[i]: encabezado[i].strip() for i in posiciones}
+    if columnas is not None:
+        nombres = {crudo: limpio for crudo, limpio in nombres.items() if limpio in columnas}
+    # Tipos al parsear: números directamente (el parser de C admite espacios
+    # alrededor); ranks como float por si hay nulos, se reducen en `tipar`
+    dtype = {}
+    for crudo, limpio in nombres.items():
+        tipo = tipo_columna(limpio)
+        if tipo == 'float32':
+            dtype[crudo] = np.float32
+        elif tipo == 'int32':
+            dtype[crudo] = np.float64
+        else:
+            dtype[crudo] = object
+    lector = pd.read_csv(
+        ruta, sep=separador, skiprows=[1] if markdown else None,
+        usecols=list(nombres), dtype=dtype, chunksize=filas_lote,
+    )
+    for lote in lector:
+        yield lote.rename(columns=nombres)
+
+
+def _lotes_parquet(ruta, columnas, filas_lote):
+    try:
+        import pyarrow.dataset as ds
+    except ImportError as e:
+        raise ImportError("Leer Parquet por lotes requiere pyarrow (pip install pyarrow)") from e
+    dataset = ds.dataset(str(ruta), format='parquet', partitioning='hive')
+    for lote in dataset.to_batches(columns=columnas, batch_size=filas_lote):
+        if lote.num_rows:
+            yield lote.to_pandas()
+
+
+def _lotes_arrow(ruta, columnas, filas_lote):
+    try:
+        import pyarrow as pa
+    except ImportError as e:
+        raise ImportError("Leer Arrow/Feather requiere pyarrow (pip install pyarrow)") from e
+    with pa.memory_map(str(ruta)) as fuente:
+        try:
+            lector = pa.ipc.open_file(fuente)
+            lotes = (lector.get_batch(i) for i in range(lector.num_record_batches))
+        except pa.ArrowInvalid:
+            fuente.seek(0)
+            lotes = iter(pa.ipc.open_stream(fuente))
+        for lote in lotes:
+            if columnas is not None:
+                lote = lote.select(columnas)
+            for inicio in range(0, lote.num_rows, filas_lote):
+                yield lote.slice(inicio, filas_lote).to_pandas()
+
+
+def leer_por_lotes(ruta, columnas=None, filas_lote=FILAS_LOTE, tipos=None):
+    """DataFrames tipados de hasta `filas_lote` filas (markdown, CSV, Parquet o Arrow)."""
+    formato = _formato(ruta)
+    if formato == 'parquet':
+        lotes = _lotes_parquet(ruta, columnas, filas_lote)
+    elif formato == 'arrow':
+        lotes = _lotes_arrow(ruta, columnas, filas_lote)
+    else:
+        lotes = _lotes_texto(ruta, columnas, filas_lote, markdown=formato == 'markdown')
+    for lote in lotes:
+        yield tipar(lote, tipos)
+
+
+def concatenar(lotes):
+    """Une DataFrames tipados conservando las columnas categóricas."""
+    lotes = list(lotes)
+    if not lotes:
+        return pd.DataFrame()
+    if len(lotes) == 1:
+        return lotes[0].reset_index(drop=True)
+    columnas = {}
+    for nombre in lotes[0].columns:
+        series = [lote[nombre] for lote in lotes]
+        if all(isinstance(s.dtype, pd.CategoricalDtype) for s in series):
+            try:
+                columnas[nombre] = union_categoricals(series, sort_categories=True)
+            except TypeError:
+                # Categorías de tipos distintos entre lotes (p. ej. int y str)
+                columnas[nombre] = union_categoricals(
+                    [s.cat.rename_categories(s.cat.categories.astype(str)) for s in series],
+                    sort_categories=True)
+        else:
+            columnas[nombre] = pd.concat(series, ignore_index=True)
+    return pd.DataFrame(columnas)
+
+
+def cargar_resultados(ruta, columnas=None, filas_lote=FILAS_LOTE, tipos=None):
+    """Todo el archivo en un DataFrame tipado (nunca se materializa el archivo crudo completo)."""
+    return concatenar(leer_por_lotes(ruta, columnas, filas_lote, tipos))
@@ -0,0 +1,328 @@
+"""
+CUBO DE RESULTADOS MUNICIPIO × ODS × META
+=========================================
+
+Agregados precalculados de la clasificación en lote (`clasificar_lote`,
+tabla de METAS) para tableros por municipio, ODS y meta, sin repetir
+`groupby` sobre millones de filas en cada clic.
+
+Cada celda (municipio, meta) guarda; el ODS se deduce de la meta:
+
+- `conteo`, `suma`, `suma_cuadrados`, `minimo`, `maximo` del score y
+  `top1` (filas con rank 1);
+- `histograma`: conteos del score en `BINS_HISTOGRAMA` intervalos fijos de
+  [-1, 1] (cuantiles aproximados, se suman al agregar celdas);
+- `hll`: registros HyperLogLog de los ID de iniciativa (iniciativas
+  distintas, se combinan con máximo: una iniciativa con varias metas del
+  mismo ODS cuenta una vez al agregar por ODS).
+
+Todo son arrays de numpy y las operaciones son sumas/mín/máx: `agregar`
+incorpora filas nuevas de forma incremental y `consultar` filtra y agrega
+por cualquier subconjunto de dimensiones en milisegundos. `guardar` /
+`cargar` lo persisten en un `.npz`.
+
+Las iniciativas ya incorporadas se reconocen por su ID (hash de 64 bits,
+8 bytes por iniciativa): `agregar` descarta las filas de ID ya vistos e
+`incorporadas(ids)` permite filtrarlos antes de clasificar, sin depender
+de cómo se partió la entrada en lotes.
+"""
+
+import json
+import threading
+
+import numpy as np
+import pandas as pd
+
+DIMENSIONES = ('MUNICIPIO', 'ODS_ID', 'META_ID')
+BINS_HISTOGRAMA = 128
+RANGO_HISTOGRAMA = (-1.0, 1.0)
+# 2**8 registros HyperLogLog por celda (error típico ~6.5%)
+BITS_HLL = 8
+
+# Campo -> (dtype, valor inicial, ufunc con la que se combinan celdas)
+CAMPOS = {
+    'conteo': (np.int64, 0, np.add),
+    'suma': (np.float64, 0.0, np.add),
+    'suma_cuadrados': (np.float64, 0.0, np.add),
+    'minimo': (np.float64, np.inf, np.minimum),
+    'maximo': (np.float64, -np.inf, np.maximum),
+    'top1': (np.int64, 0, np.add),
+    'histograma': (np.uint32, 0, np.add),
+    'hll': (np.uint8, 0, np.maximum),
+}
+
+
+def filas_cubo(df_metas, iniciativas):
+    """
+    Filas para el cubo a partir de la tabla de METAS de `clasificar_lote`
+    (INICIATIVA = posición del texto) y de las iniciativas del lote
+    (DataFrame con ID y MUNICIPIO, en el mismo orden que los textos).
+    """
+    posiciones = df_metas['INICIATIVA'].to_numpy()
+    return df_metas.assign(
+        ID=iniciativas['ID'].to_numpy()[posiciones],
+        MUNICIPIO=iniciativas['MUNICIPIO'].to_numpy()[posiciones],
+    )
+
+
+def _huellas_id(ids):
+    """Hash de 64 bits de cada ID, estable entre procesos y corridas."""
+    return pd.util.hash_array(np.asarray(ids).astype(str).astype(object))
+
+
+def _hll_registros(ids, bits=BITS_HLL):
+    """(registro, rho) de HyperLogLog para cada ID (hash de 64 bits estable)."""
+    h = _huellas_id(ids)
+    registro = (h >> np.uint64(64 - bits)).astype(np.intp)
+    # rho con los 32 bits siguientes (exactos en float64): posición del primer 1
+    resto = ((h << np.uint64(bits)) >> np.uint64(32)).astype(np.float64)
+    largo_bits = np.frexp(resto)[1]
+    rho = np.where(resto > 0, 33 - largo_bits, 33).astype(np.uint8)
+    return registro, rho
+
+
+def _hll_estimar(registros):
+    """Estimación de cardinalidad para registros (..., m)."""
+    m = registros.shape[-1]
+    alfa = 0.7213 / (1 + 1.079 / m)
+    estimacion = alfa * m * m / np.sum(np.exp2(-registros.astype(np.float64)), axis=-1)
+    ceros = np.sum(registros == 0, axis=-1)
+    # Corrección para cardinalidades pequeñas (conteo lineal)
+    lineal = m * np.log(m / np.maximum(ceros, 1))
+    return np.where((estimacion <= 2.5 * m) & (ceros > 0), lineal, estimacion)
+
+
+def _cuantiles_histograma(histograma, cuantiles, rango=RANGO_HISTOGRAMA):
+    """Cuantiles aproximados (interpolación lineal dentro del bin) para histogramas (..., bins)."""
+    bins = histograma.shape[-1]
+    bordes = np.linspace(rango[0], rango[1], bins + 1)
+    acumulado = np.cumsum(histograma, axis=-1, dtype=np.float64)
+    total = acumulado[..., -1:]
+    salida = []
+    for q in cuantiles:
+        objetivo = q * total
+        i = np.minimum(np.sum(acumulado < objetivo, axis=-1, keepdims=True), bins - 1)
+        previo = np.where(i > 0, np.take_along_axis(acumulado, np.maximum(i - 1, 0), axis=-1), 0.0)
+        en_bin = np.take_along_axis(histograma, i, axis=-1)
+        fraccion = np.where(en_bin > 0, (objetivo - previo) / np.maximum(en_bin, 1), 0.0)
+        valor = bordes[i] + np.clip(fraccion, 0, 1) * (bordes[1] - bordes[0])
+        salida.append(np.where(total > 0, valor, np.nan)[..., 0])
+    return salida
+
+
+def _reducir(ufunc, celdas, inicios, eje):
+    """Combina los grupos contiguos que empiezan en `inicios` a lo largo de `eje`."""
+    if len(inicios) == celdas.shape[eje]:
+        return celdas
+    if len(inicios) == 1:
+        return ufunc.reduce(celdas, axis=eje, keepdims=True)
+    # reduceat sobre el primer eje recorre la memoria en orden (mucho más rápido)
+    return np.moveaxis(ufunc.reduceat(np.moveaxis(celdas, eje, 0), inicios, axis=0), 0, eje)
+
+
+class CuboResultados:
+    """Cubo municipio × meta (con ODS derivado) de agregados mergeables (thread-safe)."""
+
+    def __init__(self, score='meta_similaridad_cos', rank='meta_rank'):
+        self.score = score
+        self.rank = rank
+        self.municipios = []          # posición -> municipio
+        self.metas = []               # posición -> META_ID
+        self.ods_de_meta = []         # posición -> ODS_ID
+        self.filas = 0
+        self._ids = np.empty(0, dtype=np.uint64)   # huellas ordenadas de los ID incorporados
+        self._indice_municipio = {}
+        self._indice_meta = {}
+        self._arrays = {campo: self._vacio(campo, 0, 0) for campo in CAMPOS}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _vacio(campo, n_municipios, n_metas):
+        dtype, inicial, _ = CAMPOS[campo]
+        cola = {'histograma': (BINS_HISTOGRAMA,), 'hll': (2 ** BITS_HLL,)}.get(campo, ())
+        return np.full((n_municipios, n_metas, *cola), inicial, dtype=dtype)
+
+    def _codificar(self, valores, claves, indice):
+        """Códigos de `valores` en la dimensión, añadiendo las claves nuevas."""
+        codigos, unicos = pd.factorize(pd.Series(valores).astype(str))
+        for clave in unicos:
+            if clave not in indice:
+                indice[clave] = len(claves)
+                claves.append(clave)
+        return np.array([indice[c] for c in unicos], dtype=np.intp)[codigos]
+
+    def _crecer(self):
+        """Amplía los arrays si aparecieron municipios o metas nuevos."""
+        n_m, n_k = len(self.municipios), len(self.metas)
+        m_actual, k_actual = self._arrays['conteo'].shape
+        if (n_m, n_k) == (m_actual, k_actual):
+            return
+        for campo, actual in self._arrays.items():
+            nuevo = self._vacio(campo, n_m, n_k)
+            nuevo[:m_actual, :k_actual] = actual
+            self._arrays[campo] = nuevo
+
+    # ------------------------------------------------------------------
+    # Ingesta
+    # ------------------------------------------------------------------
+
+    def _incorporadas(self, huellas):
+        return np.isin(huellas, self._ids)
+
+    def incorporadas(self, ids):
+        """Máscara de los `ids` de iniciativa que ya están en el cubo."""
+        with self._lock:
+            return self._incorporadas(_huellas_id(ids))
+
+    def agregar(self, filas):
+        """
+        Incorpora `filas` (MUNICIPIO, ODS_ID, META_ID, ID, score, rank).
+        Las filas de iniciativas ya incorporadas (mismo ID) se descartan;
+        devuelve False si no quedó ninguna fila nueva.
+        """
+        with self._lock:
+            huellas = _huellas_id(filas['ID'].to_numpy())
+            repetidas = self._incorporadas(huellas)
+            if repetidas.all():
+                return False
+            if repetidas.any():
+                filas, huellas = filas[~repetidas], huellas[~repetidas]
+            nuevas_metas = ~filas['META_ID'].astype(str).isin(list(self._indice_meta))
+            for meta, ods in filas.loc[nuevas_metas, ['META_ID', 'ODS_ID']].drop_duplicates('META_ID').itertuples(index=False):
+                self._indice_meta[str(meta)] = len(self.metas)
+                self.metas.append(str(meta))
+                self.ods_de_meta.append(int(ods))
+            m = self._codificar(filas['MUNICIPIO'], self.municipios, self._indice_municipio)
+            k = self._codificar(filas['META_ID'], self.metas, self._indice_meta)
+            self._crecer()
+
+            a = self._arrays
+            score = filas[self.score].to_numpy(dtype=np.float64)
+            np.add.at(a['conteo'], (m, k), 1)
+            np.add.at(a['suma'], (m, k), score)
+            np.add.at(a['suma_cuadrados'], (m, k), score * score)
+            np.minimum.at(a['minimo'], (m, k), score)
+            np.maximum.at(a['maximo'], (m, k), score)
+            np.add.at(a['top1'], (m, k), (filas[self.rank].to_numpy() == 1).astype(np.int64))
+            bajo, alto = RANGO_HISTOGRAMA
+            b = np.clip(((score - bajo) / (alto - bajo) * BINS_HISTOGRAMA).astype(np.intp), 0, BINS_HISTOGRAMA - 1)
+            np.add.at(a['histograma'], (m, k, b), 1)
+            registro, rho = _hll_registros(filas['ID'].to_numpy())
+            np.maximum.at(a['hll'], (m, k, registro), rho)
+
+            self.filas += len(filas)
+            self._ids = np.union1d(self._ids, huellas)
+            return True
+
+    # ------------------------------------------------------------------
+    # Consultas
+    # ------------------------------------------------------------------
+
+    def consultar(self, por=('MUNICIPIO',), filtros=None, cuantiles=(0.5, 0.9)):
+        """
+        Agregados por las dimensiones `por` (subconjunto de DIMENSIONES)
+        sobre las celdas que cumplen `filtros` ({dimensión: valores}).
+
+        Retorna un DataFrame con una fila por grupo no vacío: conteo,
+        iniciativas (distintas, aproximado), media, std, min, max, top1 y
+        los cuantiles pedidos (p50, p90, ...).
+        """
+        por = [d for d in DIMENSIONES if d in por]
+        filtros = filtros or {}
+        desconocidas = (set(por) | set(filtros)) - set(DIMENSIONES)
+        if desconocidas:
+            raise ValueError(f'Dimensiones desconocidas: {sorted(desconocidas)}')
+
+        with self._lock:
+            ods = np.asarray(self.ods_de_meta, dtype=np.int64)
+            im = np.arange(len(self.municipios))
+            ik = np.arange(len(self.metas))
+            if 'MUNICIPIO' in filtros:
+                im = im[np.isin(np.asarray(self.municipios, dtype=object), [str(v) for v in filtros['MUNICIPIO']])]
+            if 'META_ID' in filtros:
+                ik = ik[np.isin(np.asarray(self.metas, dtype=object), [str(v) for v in filtros['META_ID']])]
+            if 'ODS_ID' in filtros:
+                ik = ik[np.isin(ods[ik], [int(v) for v in filtros['ODS_ID']])]
+
+            # Metas ordenadas por ODS: los grupos por ODS quedan contiguos (reduceat)
+            ik = ik[np.argsort(ods[ik], kind='stable')]
+            if 'META_ID' in por:
+                inicios_k = np.arange(len(ik))
+            elif 'ODS_ID' in por:
+                inicios_k = np.flatnonzero(np.r_[True, np.diff(ods[ik]) != 0]) if len(ik) else np.array([], dtype=np.intp)
+            else:
+                inicios_k = np.array([0]) if len(ik) else np.array([], dtype=np.intp)
+            if 'MUNICIPIO' in por:
+                inicios_m = np.arange(len(im))
+            else:
+                inicios_m = np.array([0]) if len(im) else np.array([], dtype=np.intp)
+
+            columnas = {}
+            if 'MUNICIPIO' in por:
+                columnas['MUNICIPIO'] = np.asarray(self.municipios, dtype=object)[im]
+            reducidos = {}
+            for campo, (_, _, ufunc) in CAMPOS.items():
+                if not len(inicios_m) or not len(inicios_k):
+                    reducidos[campo] = self._vacio(campo, len(inicios_m), len(inicios_k))
+                    continue
+                celdas = self._arrays[campo][np.ix_(im, ik)]
+                celdas = _reducir(ufunc, celdas, inicios_m, 0)
+                reducidos[campo] = _reducir(ufunc, celdas, inicios_k, 1)
+            metas_grupo = np.asarray(self.metas, dtype=object)[ik[inicios_k]] if len(ik) else np.array([], dtype=object)
+            ods_grupo = ods[ik[inicios_k]] if len(ik) else np.array([], dtype=np.int64)
+
+        n_m, n_k = len(inicios_m), len(inicios_k)
+        r = {campo: v.reshape(n_m * n_k, *v.shape[2:]) for campo, v in reducidos.items()}
+        resultado = pd.DataFrame({
+            **({'MUNICIPIO': np.repeat(columnas['MUNICIPIO'], n_k)} if 'MUNICIPIO' in por else {}),
+            **({'ODS_ID': np.tile(ods_grupo, n_m)} if 'ODS_ID' in por or 'META_ID' in por else {}),
+            **({'META_ID': np.tile(metas_grupo, n_m)} if 'META_ID' in por else {}),
+        })
+        conteo = r['conteo']
+        with np.errstate(invalid='ignore', divide='ignore'):
+            media = r['suma'] / conteo
+            varianza = (r['suma_cuadrados'] - conteo * media ** 2) / (conteo - 1)
+        resultado['conteo'] = conteo
+        resultado['iniciativas'] = np.rint(_hll_estimar(r['hll'])).astype(np.int64)
+        resultado['media'] = media
+        resultado['std'] = np.sqrt(np.clip(varianza, 0, None))
+        resultado['min'] = r['minimo']
+        resultado['max'] = r['maximo']
+        resultado['top1'] = r['top1']
+        for q, valores in zip(cuantiles, _cuantiles_histograma(r['histograma'], cuantiles)):
+            resultado[f'p{round(q * 100)}'] = valores
+        return resultado[conteo > 0].reset_index(drop=True)
+
+    def resumen(self):
+        with self._lock:
+            return {'filas': self.filas, 'iniciativas': len(self._ids), 'municipios': len(self.municipios),
+                    'metas': len(self.metas), 'bytes': int(sum(a.nbytes for a in self._arrays.values()))}
+
+    # ------------------------------------------------------------------
+    # Persistencia
+    # ------------------------------------------------------------------
+
+    def guardar(self, ruta):
+        with self._lock:
+            meta = {
+                'score': self.score, 'rank': self.rank, 'filas': self.filas,
+                'municipios': self.municipios, 'metas': self.metas, 'ods_de_meta': self.ods_de_meta,
+                'bins_histograma': BINS_HISTOGRAMA, 'bits_hll': BITS_HLL,
+            }
+            np.savez_compressed(ruta, meta=np.array(json.dumps(meta, ensure_ascii=False)), ids=self._ids, **self._arrays)
+
+    @classmethod
+    def cargar(cls, ruta):
+        with np.load(ruta) as datos:
+            meta = json.loads(str(datos['meta']))
+            if (meta['bins_histograma'], meta['bits_hll']) != (BINS_HISTOGRAMA, BITS_HLL):
+                raise ValueError('El cubo se guardó con otros parámetros de histograma/HLL')
+            cubo = cls(score=meta['score'], rank=meta['rank'])
+            cubo._arrays = {campo: datos[campo] for campo in CAMPOS}
+            if 'ids' in datos.files:
+                cubo._ids = datos['ids']
+        cubo.filas = meta['filas']
+        cubo.municipios, cubo.metas, cubo.ods_de_meta = meta['municipios'], meta['metas'], meta['ods_de_meta']
+        cubo._indice_municipio = {c: i for i, c in enumerate(cubo.municipios)}
+        cubo._indice_meta = {c: i for i, c in enumerate(cubo.metas)}
+        return cubo
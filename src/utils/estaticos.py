@@ -0,0 +1,70 @@
+"""
+ARCHIVOS ESTÁTICOS CON CACHE DE LARGA DURACIÓN
+==============================================
+
+Rutas que se montan delante de las de Gradio
+(`launch(app_kwargs={'routes': rutas_estaticas()})`):
+
+- `PREFIJO_ESTATICOS` (`/estaticos`): archivos generados con la versión o
+  el hash del contenido en el nombre (plotly.js, sprite de logos ODS), en
+  `DIRECTORIO_ESTATICOS`.
+- `PREFIJO_LOGOS` (`/logos`): `config/institucional/logos` tal cual; las
+  URLs que arma `src.utils.logos` llevan `?v=<hash>` del archivo.
+
+Todo se sirve con `Cache-Control: public, max-age=31536000, immutable`:
+si el contenido cambia, cambia la URL, así que el navegador no necesita
+revalidar.
+"""
+
+import os
+import tempfile
+from pathlib import Path
+
+from starlette.routing import Mount
+from starlette.staticfiles import StaticFiles
+
+CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+PREFIJO_ESTATICOS = os.environ.get('VOCES_ODS_PREFIJO_ESTATICOS', '/estaticos')
+DIRECTORIO_ESTATICOS = Path(os.environ.get(
+    'VOCES_ODS_ESTATICOS', Path(tempfile.gettempdir()) / 'voces_ods_estaticos'
+))
+
+PREFIJO_LOGOS = '/logos'
+DIRECTORIO_LOGOS = Path(__file__).resolve().parents[2] / 'config' / 'institucional' / 'logos'
+
+
+class EstaticosInmutables(StaticFiles):
+    """StaticFiles con cache de larga duración (las URLs llevan versión o hash)."""
+
+    def file_response(self, *args, **kwargs):
+        respuesta = super().file_response(*args, **kwargs)
+        respuesta.headers['Cache-Control'] = CACHE_CONTROL
+        return respuesta
+
+
+def publicar_estatico(nombre, contenido, directorio=None):
+    """Escribe `contenido` (bytes) como `nombre` en el directorio de estáticos si no existe."""
+    directorio = Path(directorio or DIRECTORIO_ESTATICOS)
+    ruta = directorio / nombre
+    if not ruta.exists():
+        directorio.mkdir(parents=True, exist_ok=True)
+        temporal = ruta.with_suffix(ruta.suffix + f'.{os.getpid()}.tmp')
+        temporal.write_bytes(contenido)
+        os.replace(temporal, ruta)
+    return ruta
+
+
+def url_estatico(nombre):
+    return f'{PREFIJO_ESTATICOS}/{nombre}'
+
+
+def rutas_estaticas():
+    """Rutas de Starlette a pasar al servidor de Gradio."""
+    from src.visualization.plotlyjs import publicar_plotlyjs
+    publicar_plotlyjs()
+    DIRECTORIO_ESTATICOS.mkdir(parents=True, exist_ok=True)
+    return [
+        Mount(PREFIJO_ESTATICOS, app=EstaticosInmutables(directory=DIRECTORIO_ESTATICOS), name='estaticos'),
+        Mount(PREFIJO_LOGOS, app=EstaticosInmutables(directory=DIRECTORIO_LOGOS), name='logos'),
+    ]
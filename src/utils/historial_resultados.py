@@ -0,0 +1,345 @@
+"""
+HISTORIAL PERSISTENTE DE CLASIFICACIONES
+========================================
+
+Guarda en un archivo SQLite local cada resultado de `search()`: la
+consulta (con su huella), las tablas de ODS, METAS e INDICADORES con rank
+y similaridad, los enfoques (género, poblacional, étnico) y las
+coincidencias PDET (pilares, estrategias, categorías).
+
+A diferencia de `AlmacenResultados` (memoria, por sesión, con TTL), el
+historial sobrevive a recargas del navegador y a reinicios del servidor:
+
+- `obtener(consulta, parametros)` devuelve las tablas en el mismo orden
+  que `search` (BDL_ODS se reconstruye con `unir_bdl`), así que una
+  consulta repetida no vuelve a codificarse.
+- `buscar(...)` y `sql(...)` consultan el historial directamente (índices
+  por ODS_ID, META_ID, INDICADOR_ID y municipio); las vistas `v_ods`,
+  `v_metas` y `v_indicadores` ya resuelven los textos para tableros.
+
+Los textos largos se guardan una sola vez en la tabla `textos`; cada fila
+de resultado guarda su id. Solo biblioteca estándar (sqlite3) y pandas.
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.utils.instrumentacion import logger
+
+# Posición en la salida de `search` (sin la consulta ni BDL_ODS) ->
+# (tabla SQL, {columna del DataFrame: columna SQL}); 'texto' va a `textos`
+NIVELES = [
+    ('ods', {'ODS_ID': 'ods_id', 'OBJETIVO': 'texto', 'ods_rank': 'rank',
+             'ods_similaridad_cos': 'similaridad', 'ods_similaridad_cos_normalized': 'similaridad_norm'}),
+    ('metas', {'META_ID': 'meta_id', 'META': 'texto', 'ODS_ID': 'ods_id', 'meta_rank': 'rank',
+               'meta_similaridad_cos': 'similaridad', 'meta_similaridad_cos_normalized': 'similaridad_norm'}),
+    ('indicadores', {'INDICADOR_ID': 'indicador_id', 'INDICADOR': 'texto', 'ODS_ID': 'ods_id', 'META_ID': 'meta_id',
+                     'indicador_rank': 'rank', 'indicador_similaridad_cos': 'similaridad',
+                     'indicador_similaridad_cos_normalized': 'similaridad_norm'}),
+    ('enfoques', {'ENFOQUE_GENERO': 'texto', 'rank': 'rank', 'similaridad_cos': 'similaridad'}),
+    ('enfoques', {'ENFOQUE_POBLACIONAL': 'texto', 'rank': 'rank', 'similaridad_cos': 'similaridad'}),
+    ('enfoques', {'ENFOQUE_ETNICO': 'texto', 'rank': 'rank', 'similaridad_cos': 'similaridad'}),
+    ('pdet', {'rank': 'rank', 'similaridad_cos': 'similaridad', 'pilar_texto': 'texto'}),
+    ('pdet', {'rank': 'rank', 'similaridad_cos': 'similaridad', 'estrategia_texto': 'texto'}),
+    ('pdet', {'rank': 'rank', 'similaridad_cos': 'similaridad', 'categoria_texto': 'texto'}),
+]
+# Tablas que comparten varias posiciones de la salida (columna `tabla`)
+TABLAS_COMPARTIDAS = {'enfoques', 'pdet'}
+COLUMNAS_ID = ['ODS_ID', 'META_ID', 'INDICADOR_ID']
+
+ESQUEMA_SQL = """
+CREATE TABLE IF NOT EXISTS consultas (
+    id INTEGER PRIMARY KEY,
+    hash TEXT NOT NULL,
+    modelo TEXT NOT NULL,
+    consulta TEXT NOT NULL,
+    parametros TEXT,
+    municipio TEXT,
+    iniciativa_id TEXT,
+    creado REAL NOT NULL,
+    UNIQUE (hash, modelo)
+);
+CREATE TABLE IF NOT EXISTS textos (
+    id INTEGER PRIMARY KEY,
+    texto TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS ods (
+    consulta_id INTEGER NOT NULL REFERENCES consultas(id) ON DELETE CASCADE,
+    ods_id, texto_id INTEGER, rank INTEGER, similaridad REAL, similaridad_norm REAL
+);
+CREATE TABLE IF NOT EXISTS metas (
+    consulta_id INTEGER NOT NULL REFERENCES consultas(id) ON DELETE CASCADE,
+    meta_id, ods_id, texto_id INTEGER, rank INTEGER, similaridad REAL, similaridad_norm REAL
+);
+CREATE TABLE IF NOT EXISTS indicadores (
+    consulta_id INTEGER NOT NULL REFERENCES consultas(id) ON DELETE CASCADE,
+    indicador_id, ods_id, meta_id, texto_id INTEGER, rank INTEGER, similaridad REAL, similaridad_norm REAL
+);
+CREATE TABLE IF NOT EXISTS enfoques (
+    consulta_id INTEGER NOT NULL REFERENCES consultas(id) ON DELETE CASCADE,
+    tabla INTEGER NOT NULL, texto_id INTEGER, rank INTEGER, similaridad REAL
+);
+CREATE TABLE IF NOT EXISTS pdet (
+    consulta_id INTEGER NOT NULL REFERENCES consultas(id) ON DELETE CASCADE,
+    tabla INTEGER NOT NULL, texto_id INTEGER, rank INTEGER, similaridad REAL
+);
+
+CREATE INDEX IF NOT EXISTS consultas_municipio ON consultas (municipio);
+CREATE INDEX IF NOT EXISTS ods_consulta ON ods (consulta_id, rank);
+CREATE INDEX IF NOT EXISTS ods_ods_id ON ods (ods_id, rank);
+CREATE INDEX IF NOT EXISTS metas_consulta ON metas (consulta_id, rank);
+CREATE INDEX IF NOT EXISTS metas_meta_id ON metas (meta_id, rank);
+CREATE INDEX IF NOT EXISTS metas_ods_id ON metas (ods_id);
+CREATE INDEX IF NOT EXISTS indicadores_consulta ON indicadores (consulta_id, rank);
+CREATE INDEX IF NOT EXISTS indicadores_indicador_id ON indicadores (indicador_id, rank);
+CREATE INDEX IF NOT EXISTS indicadores_meta_id ON indicadores (meta_id);
+CREATE INDEX IF NOT EXISTS indicadores_ods_id ON indicadores (ods_id);
+CREATE INDEX IF NOT EXISTS enfoques_consulta ON enfoques (consulta_id, tabla, rank);
+CREATE INDEX IF NOT EXISTS pdet_consulta ON pdet (consulta_id, tabla, rank);
+
+CREATE VIEW IF NOT EXISTS v_ods AS
+    SELECT c.id AS consulta_id, c.consulta, c.municipio, c.iniciativa_id, c.creado,
+           o.ods_id, x.texto AS objetivo, o.rank, o.similaridad, o.similaridad_norm
+    FROM ods o JOIN consultas c ON c.id = o.consulta_id LEFT JOIN textos x ON x.id = o.texto_id;
+CREATE VIEW IF NOT EXISTS v_metas AS
+    SELECT c.id AS consulta_id, c.consulta, c.municipio, c.iniciativa_id, c.creado,
+           m.meta_id, m.ods_id, x.texto AS meta, m.rank, m.similaridad, m.similaridad_norm
+    FROM metas m JOIN consultas c ON c.id = m.consulta_id LEFT JOIN textos x ON x.id = m.texto_id;
+CREATE VIEW IF NOT EXISTS v_indicadores AS
+    SELECT c.id AS consulta_id, c.consulta, c.municipio, c.iniciativa_id, c.creado,
+           i.indicador_id, i.ods_id, i.meta_id, x.texto AS indicador, i.rank, i.similaridad, i.similaridad_norm
+    FROM indicadores i JOIN consultas c ON c.id = i.consulta_id LEFT JOIN textos x ON x.id = i.texto_id;
+"""
+
+# Filtros de `buscar` -> tabla de nivel que tiene esa columna
+FILTROS_NIVEL = {'ods_id': 'ods', 'meta_id': 'metas', 'indicador_id': 'indicadores'}
+
+
+def huella_consulta(consulta, parametros=None):
+    """
+    Huella (md5) de la consulta y de los parámetros que cambian su resultado
+    (top-k, umbrales, fingerprints de los catálogos...).
+    """
+    # Parámetros en None = valores por defecto de `search`: misma huella que sin parámetros
+    parametros = {k: v for k, v in (parametros or {}).items() if v is not None} or None
+    clave = json.dumps({'consulta': str(consulta), 'parametros': parametros}, sort_keys=True, default=str)
+    return hashlib.md5(clave.encode('utf-8')).hexdigest()
+
+
+def _valores(serie):
+    """Valores de una columna como objetos de Python (sqlite3 no acepta escalares numpy)."""
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        valores = np.asarray(serie.cat.categories.to_numpy(), dtype=object)
+        valores = np.append(valores, None)
+        return [v.item() if isinstance(v, np.generic) else v for v in valores[serie.cat.codes.to_numpy()]]
+    valores = serie.to_numpy(dtype=object)
+    return [None if v is None or v != v else (v.item() if isinstance(v, np.generic) else v) for v in valores]
+
+
+class HistorialResultados:
+    """
+    Historial SQLite de resultados de `search` (una conexión por hilo,
+    escrituras serializadas). El directorio, el archivo y el esquema se
+    crean con la primera conexión, no al instanciar.
+    """
+
+    def __init__(self, ruta, modelo='', timeout_segundos=30.0):
+        self.ruta = Path(ruta)
+        self.modelo = modelo or ''
+        self.timeout_segundos = timeout_segundos
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._lock_esquema = threading.Lock()
+        self._esquema_creado = False
+        self._ids_texto = {}   # texto -> id en `textos` (los ids no cambian una vez guardados)
+
+    def _crear_esquema(self):
+        with self._lock_esquema:
+            if self._esquema_creado:
+                return
+            self.ruta.parent.mkdir(parents=True, exist_ok=True)
+            con = sqlite3.connect(self.ruta, timeout=self.timeout_segundos)
+            try:
+                con.executescript(ESQUEMA_SQL)
+            finally:
+                con.close()
+            self._esquema_creado = True
+
+    def _conexion(self):
+        con = getattr(self._local, 'conexion', None)
+        if con is None:
+            if not self._esquema_creado:
+                self._crear_esquema()
+            con = sqlite3.connect(self.ruta, timeout=self.timeout_segundos)
+            # WAL: lectores concurrentes (otros hilos y procesos) mientras se escribe
+            con.execute('PRAGMA journal_mode=WAL')
+            con.execute('PRAGMA synchronous=NORMAL')
+            con.execute('PRAGMA foreign_keys=ON')
+            self._local.conexion = con
+        return con
+
+    # ------------------------------------------------------------------
+    # Escritura
+    # ------------------------------------------------------------------
+
+    def _ids_textos(self, con, serie):
+        """Ids en `textos` de los valores de `serie` (inserta los nuevos)."""
+        if not isinstance(serie.dtype, pd.CategoricalDtype):
+            serie = serie.astype('category')
+        categorias = [str(t) for t in serie.cat.categories]
+        nuevos = [t for t in categorias if t not in self._ids_texto]
+        if nuevos:
+            con.executemany('INSERT OR IGNORE INTO textos (texto) VALUES (?)', [(t,) for t in nuevos])
+            for inicio in range(0, len(nuevos), 500):
+                parte = nuevos[inicio:inicio + 500]
+                marcas = ','.join('?' * len(parte))
+                self._ids_texto.update(con.execute(f'SELECT texto, id FROM textos WHERE texto IN ({marcas})', parte))
+        ids = np.array([self._ids_texto[t] for t in categorias] + [None], dtype=object)
+        return ids[serie.cat.codes.to_numpy()].tolist()
+
+    def guardar(self, consulta, tablas, parametros=None, municipio=None, iniciativa_id=None):
+        """
+        Guarda las tablas de `search` (sin la consulta; BDL_ODS se ignora) y
+        devuelve el id de la consulta. Reemplaza el resultado anterior con la
+        misma huella y modelo.
+        """
+        huella = huella_consulta(consulta, parametros)
+        con = self._conexion()
+        with self._lock:
+            try:
+                with con:
+                    con.execute('DELETE FROM consultas WHERE hash = ? AND modelo = ?', (huella, self.modelo))
+                    consulta_id = con.execute(
+                        'INSERT INTO consultas (hash, modelo, consulta, parametros, municipio, iniciativa_id, creado) '
+                        'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                        (huella, self.modelo, str(consulta), json.dumps(parametros, default=str),
+                         municipio, iniciativa_id, time.time()),
+                    ).lastrowid
+                    for posicion, (tabla, columnas) in enumerate(NIVELES):
+                        df = tablas[posicion]
+                        filas = {'consulta_id': [consulta_id] * len(df)}
+                        if tabla in TABLAS_COMPARTIDAS:
+                            filas['tabla'] = [posicion] * len(df)
+                        for columna, columna_sql in columnas.items():
+                            if columna not in df.columns:
+                                filas[columna_sql] = [None] * len(df)
+                            elif columna_sql == 'texto':
+                                filas['texto_id'] = self._ids_textos(con, df[columna])
+                            else:
+                                filas[columna_sql] = _valores(df[columna])
+                        marcas = ','.join('?' * len(filas))
+                        con.executemany(f'INSERT INTO {tabla} ({",".join(filas)}) VALUES ({marcas})', zip(*filas.values()))
+            except Exception:
+                # Los ids de textos de una transacción revertida no existen
+                self._ids_texto.clear()
+                raise
+        return consulta_id
+
+    # ------------------------------------------------------------------
+    # Lectura
+    # ------------------------------------------------------------------
+
+    def id_consulta(self, consulta, parametros=None):
+        fila = self._conexion().execute(
+            'SELECT id FROM consultas WHERE hash = ? AND modelo = ?',
+            (huella_consulta(consulta, parametros), self.modelo)).fetchone()
+        return fila[0] if fila else None
+
+    def obtener(self, consulta, parametros=None):
+        """Tablas guardadas de la consulta (mismo orden que `search`, sin la consulta) o None."""
+        consulta_id = self.id_consulta(consulta, parametros)
+        return None if consulta_id is None else self.tablas(consulta_id)
+
+    def tablas(self, consulta_id):
+        """Reconstruye las 10 tablas de una consulta guardada, con el esquema compacto de `search`."""
+        from src.embeddings.modelos_nlp_db import tipo_rank, unir_bdl
+
+        con = self._conexion()
+        tablas = []
+        for posicion, (tabla, columnas) in enumerate(NIVELES):
+            campos = ', '.join(
+                f'x.texto AS "{columna}"' if columna_sql == 'texto' else f't.{columna_sql} AS "{columna}"'
+                for columna, columna_sql in columnas.items())
+            filtro = ' AND t.tabla = ?' if tabla in TABLAS_COMPARTIDAS else ''
+            parametros = (consulta_id, posicion) if filtro else (consulta_id,)
+            df = pd.read_sql_query(
+                f'SELECT {campos} FROM {tabla} t LEFT JOIN textos x ON x.id = t.texto_id '
+                f'WHERE t.consulta_id = ?{filtro} ORDER BY t.rank', con, params=parametros)
+            tipos = {}
+            for columna, columna_sql in columnas.items():
+                if columna_sql == 'texto':
+                    tipos[columna] = 'category'
+                elif columna_sql == 'rank':
+                    tipos[columna] = tipo_rank(len(df))
+                elif columna_sql.startswith('similaridad'):
+                    tipos[columna] = np.float32
+            tablas.append(df.astype(tipos))
+
+        # IDs de un mismo nivel con las mismas categorías en las tres tablas (merges sobre códigos)
+        for columna in COLUMNAS_ID:
+            series = [df[columna] for df in tablas[:3] if columna in df.columns]
+            categorias = pd.Index(pd.unique(pd.concat(series, ignore_index=True).dropna()))
+            tipo = pd.CategoricalDtype(categorias.sort_values())
+            for df in tablas[:3]:
+                if columna in df.columns:
+                    df[columna] = df[columna].astype(tipo)
+
+        tablas.append(unir_bdl(tablas[0], tablas[1], tablas[2]))
+        return tablas
+
+    def buscar(self, ods_id=None, meta_id=None, indicador_id=None, municipio=None, max_rank=None, limite=100):
+        """
+        Consultas guardadas filtradas por nivel (con rank <= `max_rank`) y
+        municipio, de la más reciente a la más antigua.
+        """
+        filtros = {'ods_id': ods_id, 'meta_id': meta_id, 'indicador_id': indicador_id}
+        campos = ['c.id AS consulta_id', 'c.consulta', 'c.municipio', 'c.iniciativa_id', 'c.creado']
+        uniones, condiciones, parametros = [], [], []
+        for filtro, valor in filtros.items():
+            if valor is None:
+                continue
+            tabla = FILTROS_NIVEL[filtro]
+            uniones.append(f'JOIN {tabla} ON {tabla}.consulta_id = c.id AND {tabla}.{filtro} = ?')
+            parametros.append(valor)
+            if max_rank is not None:
+                uniones[-1] += f' AND {tabla}.rank <= ?'
+                parametros.append(max_rank)
+            campos += [f'{tabla}.rank AS {tabla}_rank', f'{tabla}.similaridad AS {tabla}_similaridad']
+        if municipio is not None:
+            condiciones.append('c.municipio = ?')
+            parametros.append(municipio)
+        sql = f'SELECT {", ".join(campos)} FROM consultas c {" ".join(uniones)}'
+        if condiciones:
+            sql += ' WHERE ' + ' AND '.join(condiciones)
+        sql += ' ORDER BY c.creado DESC'
+        if limite:
+            sql += ' LIMIT ?'
+            parametros.append(limite)
+        return self.sql(sql, parametros)
+
+    def sql(self, consulta_sql, parametros=()):
+        """Resultado de una consulta SQL arbitraria (p. ej. sobre las vistas v_ods, v_metas, v_indicadores)."""
+        return pd.read_sql_query(consulta_sql, self._conexion(), params=parametros)
+
+    def estadisticas(self):
+        con = self._conexion()
+        return {
+            'consultas': con.execute('SELECT COUNT(*) FROM consultas').fetchone()[0],
+            'textos': con.execute('SELECT COUNT(*) FROM textos').fetchone()[0],
+            'bytes': self.ruta.stat().st_size if self.ruta.exists() else 0,
+        }
+
+    def cerrar(self):
+        """Cierra la conexión del hilo actual."""
+        con = getattr(self._local, 'conexion', None)
+        if con is not None:
+            con.close()
+            self._local.conexion = None
+            logger.debug('historial cerrado', extra={'campos': {'ruta': str(self.ruta)}})
@@ -0,0 +1,252 @@
+"""
+INSTRUMENTACIÓN DE LATENCIA POR ETAPA
+=====================================
+
+Spans livianos de tiempo alrededor de cada etapa de `search()` y de los
+manejadores `tab_*` de la aplicación Gradio.
+
+- Cada etapa (`medir_etapa`) alimenta un histograma global por nombre.
+- Cada solicitud (`medir_solicitud` / `instrumentar`) agrupa sus etapas y
+  deja un log estructurado en JSON con el desglose de tiempos.
+- Los histogramas se exponen en formato de texto Prometheus mediante un
+  endpoint HTTP local (`iniciar_servidor_metricas`).
+
+No depende de librerías externas: solo biblioteca estándar.
+"""
+
+import json
+import logging
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger('voces_ods')
+
+# Límites superiores (segundos) de los buckets de los histogramas
+BUCKETS_SEGUNDOS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                    1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+METRICA_ETAPA = 'voces_ods_etapa_segundos'
+METRICA_SOLICITUD = 'voces_ods_solicitud_segundos'
+
+DESCRIPCIONES = {
+    METRICA_ETAPA: 'Duración de cada etapa instrumentada (segundos).',
+    METRICA_SOLICITUD: 'Duración total de cada solicitud (segundos).',
+}
+
+
+# ============================================================================
+# HISTOGRAMAS
+# ============================================================================
+
+class Histograma:
+    """Histograma acumulativo con buckets fijos (semántica Prometheus)."""
+
+    def __init__(self, buckets=BUCKETS_SEGUNDOS):
+        self.buckets = tuple(buckets)
+        self.conteos = [0] * len(self.buckets)
+        self.suma = 0.0
+        self.total = 0
+
+    def observar(self, valor):
+        posicion = bisect_left(self.buckets, valor)
+        if posicion < len(self.conteos):
+            self.conteos[posicion] += 1
+        self.suma += valor
+        self.total += 1
+
+
+_HISTOGRAMAS = {}
+_LOCK = threading.Lock()
+_SOLICITUD_ACTUAL = ContextVar('solicitud_actual', default=None)
+
+
+def observar(metrica, valor, **etiquetas):
+    """Registra `valor` en el histograma `metrica` con las etiquetas dadas."""
+    clave = (metrica, tuple(sorted(etiquetas.items())))
+    with _LOCK:
+        histograma = _HISTOGRAMAS.get(clave)
+        if histograma is None:
+            histograma = _HISTOGRAMAS[clave] = Histograma()
+        histograma.observar(valor)
+
+
+def reiniciar_metricas():
+    """Descarta todos los histogramas acumulados."""
+    with _LOCK:
+        _HISTOGRAMAS.clear()
+
+
+# ============================================================================
+# SPANS: ETAPAS Y SOLICITUDES
+# ============================================================================
+
+@contextmanager
+def medir_etapa(etapa):
+    """
+    Mide la duración del bloque y la registra bajo `etapa`.
+
+    Si hay una solicitud activa, el histograma se etiqueta con su operación
+    y la duración se suma a su desglose (las etapas que se repiten dentro de
+    un bucle se acumulan).
+    """
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        duracion = time.perf_counter() - inicio
+        solicitud = _SOLICITUD_ACTUAL.get()
+        operacion = solicitud['operacion'] if solicitud is not None else ''
+        observar(METRICA_ETAPA, duracion, operacion=operacion, etapa=etapa)
+        if solicitud is not None:
+            etapas = solicitud['etapas']
+            etapas[etapa] = etapas.get(etapa, 0.0) + duracion
+
+
+@contextmanager
+def medir_solicitud(operacion, **campos):
+    """
+    Abre una solicitud instrumentada. Al cerrar registra su duración total
+    y emite un log estructurado con el desglose por etapa.
+    """
+    solicitud = {'id': uuid.uuid4().hex[:12], 'operacion': operacion, 'etapas': {}}
+    solicitud.update(campos)
+    token = _SOLICITUD_ACTUAL.set(solicitud)
+    estado = 'ok'
+    inicio = time.perf_counter()
+    try:
+        yield solicitud
+    except Exception as e:
+        estado = 'error'
+        solicitud['error'] = repr(e)
+        raise
+    finally:
+        duracion = time.perf_counter() - inicio
+        _SOLICITUD_ACTUAL.reset(token)
+        observar(METRICA_SOLICITUD, duracion, operacion=operacion, estado=estado)
+        solicitud['estado'] = estado
+        solicitud['duracion_s'] = round(duracion, 6)
+        solicitud['etapas'] = {k: round(v, 6) for k, v in solicitud['etapas'].items()}
+        logger.info('solicitud', extra={'campos': solicitud})
+
+
+def instrumentar(operacion):
+    """Decorador: ejecuta la función dentro de `medir_solicitud(operacion)`."""
+    def decorador(funcion):
+        @wraps(funcion)
+        def envoltura(*args, **kwargs):
+            with medir_solicitud(operacion):
+                return funcion(*args, **kwargs)
+        return envoltura
+    return decorador
+
+
+def solicitud_actual():
+    """Devuelve el diccionario de la solicitud activa (o None)."""
+    return _SOLICITUD_ACTUAL.get()
+
+
+# ============================================================================
+# LOGS ESTRUCTURADOS
+# ============================================================================
+
+class FormatoJSON(logging.Formatter):
+    """Formatea cada registro como una línea JSON."""
+
+    def format(self, record):
+        registro = {
+            'ts': round(record.created, 3),
+            'nivel': record.levelname,
+            'logger': record.name,
+            'mensaje': record.getMessage(),
+        }
+        campos = getattr(record, 'campos', None)
+        if campos:
+            registro.update(campos)
+        if record.exc_info:
+            registro['excepcion'] = self.formatException(record.exc_info)
+        return json.dumps(registro, ensure_ascii=False, default=str)
+
+
+def configurar_logging(nivel=logging.INFO):
+    """Configura el logger `voces_ods` con salida JSON (idempotente)."""
+    if not any(isinstance(h.formatter, FormatoJSON) for h in logger.handlers):
+        handler = logging.StreamHandler()
+        handler.setFormatter(FormatoJSON())
+        logger.addHandler(handler)
+    logger.setLevel(nivel)
+    logger.propagate = False
+    return logger
+
+
+# ============================================================================
+# EXPOSICIÓN EN FORMATO PROMETHEUS
+# ============================================================================
+
+def _formatear_etiquetas(etiquetas):
+    if not etiquetas:
+        return ''
+    partes = []
+    for clave, valor in etiquetas:
+        valor = str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        partes.append(f'{clave}="{valor}"')
+    return '{' + ','.join(partes) + '}'
+
+
+def exportar_prometheus():
+    """Serializa todos los histogramas en formato de texto Prometheus 0.0.4."""
+    with _LOCK:
+        instantanea = sorted(
+            (clave, list(h.buckets), list(h.conteos), h.suma, h.total)
+            for clave, h in _HISTOGRAMAS.items()
+        )
+
+    lineas = []
+    metrica_previa = None
+    for (metrica, etiquetas), buckets, conteos, suma, total in instantanea:
+        if metrica != metrica_previa:
+            lineas.append(f'# HELP {metrica} {DESCRIPCIONES.get(metrica, metrica)}')
+            lineas.append(f'# TYPE {metrica} histogram')
+            metrica_previa = metrica
+        acumulado = 0
+        for limite, conteo in zip(buckets, conteos):
+            acumulado += conteo
+            lineas.append(f'{metrica}_bucket{_formatear_etiquetas(etiquetas + (("le", repr(float(limite))),))} {acumulado}')
+        lineas.append(f'{metrica}_bucket{_formatear_etiquetas(etiquetas + (("le", "+Inf"),))} {total}')
+        lineas.append(f'{metrica}_sum{_formatear_etiquetas(etiquetas)} {suma:.6f}')
+        lineas.append(f'{metrica}_count{_formatear_etiquetas(etiquetas)} {total}')
+    return '\n'.join(lineas) + '\n'
+
+
+class _ManejadorMetricas(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        cuerpo = exportar_prometheus().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def log_message(self, formato, *args):
+        logger.debug(formato % args)
+
+
+def iniciar_servidor_metricas(puerto=9464, host='127.0.0.1'):
+    """
+    Expone `GET /metrics` en un hilo daemon. Retorna el servidor HTTP
+    (usar `servidor.shutdown()` para detenerlo).
+    """
+    servidor = ThreadingHTTPServer((host, puerto), _ManejadorMetricas)
+    hilo = threading.Thread(target=servidor.serve_forever, name='metricas', daemon=True)
+    hilo.start()
+    logger.info('servidor de metricas iniciado', extra={'campos': {'url': f'http://{host}:{servidor.server_port}/metrics'}})
+    return servidor
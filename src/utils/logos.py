@@ -0,0 +1,120 @@
+"""
+LOGOS COMO ARCHIVOS ESTÁTICOS
+=============================
+
+Los logos de `config/institucional/logos` se referencian por URL en lugar
+de incrustarse en el HTML como `data:` URI en base64 (que además se
+etiquetaban como `image/png` siendo `.webp`, y se repetían en cada render
+de `tab_inicio`).
+
+- `url_logo(ruta, lado)`: URL servida por `src.utils.estaticos` con
+  `?v=<hash>` del contenido (cache inmutable en el navegador). Con `lado`
+  (px del lado mayor que se va a pintar) y si existe el manifest de
+  `scripts/optimize_images.py`, apunta a la variante más pequeña que cabe
+  (miniatura / tarjeta / completa); si no, al original.
+- `html_logo(url, alt, clase)`: `<img>` con `loading="lazy"` y
+  `decoding="async"`.
+- Sprite opcional (`VOCES_ODS_SPRITE_LOGOS=1`): los 17 íconos ODS en una
+  sola imagen WebP (`publicar_sprite_ods`); `html_logo_ods` devuelve
+  entonces un recorte del sprite y `css_logos()` las reglas que necesita.
+"""
+
+import hashlib
+import io
+import json
+import os
+from functools import lru_cache
+from urllib.parse import quote
+
+from src.utils.estaticos import DIRECTORIO_LOGOS, PREFIJO_LOGOS, publicar_estatico, url_estatico
+
+SPRITE_LOGOS = os.environ.get('VOCES_ODS_SPRITE_LOGOS', '0') == '1'
+# Lado de cada ícono en el sprite (2x el tamaño mostrado, .logo-ods-tbl = 60px)
+LADO_SPRITE = 120
+LADO_MOSTRADO = 60
+NUMEROS_ODS = range(1, 18)
+MANIFEST_VARIANTES = DIRECTORIO_LOGOS / 'optimizadas' / 'manifest.json'
+
+
+def ruta_logo_ods(numero):
+    return f'ods/S-WEB-Goal-{int(numero):02d}.webp'
+
+
+@lru_cache(maxsize=1)
+def _variantes():
+    try:
+        with open(MANIFEST_VARIANTES, encoding='utf-8') as f:
+            return json.load(f).get('imagenes', {})
+    except (OSError, ValueError):
+        return {}
+
+
+def variante_logo(ruta, lado):
+    """Variante del manifest con el menor lado mayor >= `lado` (la mayor si ninguna alcanza)."""
+    entrada = _variantes().get(ruta)
+    if not entrada or not entrada.get('variantes'):
+        return None
+    candidatas = sorted(entrada['variantes'].values(), key=lambda v: max(v['ancho'], v['alto']))
+    return next((v for v in candidatas if max(v['ancho'], v['alto']) >= lado), candidatas[-1])
+
+
+@lru_cache(maxsize=None)
+def url_logo(ruta, lado=None):
+    """URL versionada del logo `ruta` (relativa a config/institucional/logos)."""
+    ruta = ruta.lstrip('/')
+    variante = variante_logo(ruta, lado) if lado else None
+    if variante is not None:
+        ruta = f"optimizadas/{variante['ruta']}"
+    version = hashlib.sha256((DIRECTORIO_LOGOS / ruta).read_bytes()).hexdigest()[:12]
+    return f'{PREFIJO_LOGOS}/{quote(ruta)}?v={version}'
+
+
+def html_logo(url, alt, clase, lazy=True):
+    carga = ' loading="lazy" decoding="async"' if lazy else ''
+    return f'<img src="{url}" alt="{alt}" class="{clase}"{carga}>'
+
+
+@lru_cache(maxsize=1)
+def publicar_sprite_ods(lado=LADO_SPRITE):
+    """URL del sprite WebP con los íconos ODS 1..17 en una fila (se genera una vez)."""
+    from PIL import Image
+
+    rutas = [DIRECTORIO_LOGOS / ruta_logo_ods(n) for n in NUMEROS_ODS]
+    huella = hashlib.sha256()
+    for ruta in rutas:
+        huella.update(ruta.read_bytes())
+    nombre = f'logos-ods-{huella.hexdigest()[:12]}.webp'
+
+    sprite = Image.new('RGB', (lado * len(rutas), lado), 'white')
+    for i, ruta in enumerate(rutas):
+        with Image.open(ruta) as imagen:
+            sprite.paste(imagen.convert('RGB').resize((lado, lado), Image.LANCZOS), (i * lado, 0))
+    buffer = io.BytesIO()
+    sprite.save(buffer, format='WEBP', quality=85, method=6)
+    publicar_estatico(nombre, buffer.getvalue())
+    return url_estatico(nombre)
+
+
+def html_logo_ods(numero, alt, clase='logo-ods-tbl'):
+    """Logo del ODS `numero`: recorte del sprite si está activo, si no `<img>` perezosa."""
+    if not SPRITE_LOGOS:
+        return html_logo(url_logo(ruta_logo_ods(numero), lado=2 * LADO_MOSTRADO), alt, clase)
+    desplazamiento = (int(numero) - 1) * LADO_MOSTRADO
+    return (f'<span role="img" aria-label="{alt}" class="{clase} logo-ods-sprite" '
+            f'style="background-position:-{desplazamiento}px 0"></span>')
+
+
+def css_logos():
+    """Reglas CSS del sprite (vacío si no se usa)."""
+    if not SPRITE_LOGOS:
+        return ''
+    return f"""
+.logo-ods-sprite {{
+    display: inline-block;
+    width: {LADO_MOSTRADO}px;
+    height: {LADO_MOSTRADO}px;
+    background-image: url("{publicar_sprite_ods()}");
+    background-size: {LADO_MOSTRADO * len(NUMEROS_ODS)}px {LADO_MOSTRADO}px;
+    background-repeat: no-repeat;
+}}
+"""
@@ -0,0 +1,82 @@
+"""
+PRECÁLCULO EN SEGUNDO PLANO
+===========================
+
+Pool de hilos que ejecuta, justo después de una consulta, las tareas de
+render de todas las pestañas (visualizaciones y estadísticas) para que al
+abrirlas el resultado ya esté listo.
+
+- Las tareas se agrupan por handle de sesión: una consulta nueva en la
+  misma sesión cancela las tareas pendientes de la anterior y descarta
+  las que ya estaban en ejecución.
+- Se conserva solo la última tanda de cada sesión y un máximo de
+  `max_sesiones` sesiones (las más antiguas se descartan).
+"""
+
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from src.utils.instrumentacion import logger, medir_solicitud
+
+
+class Precalculador:
+
+    def __init__(self, max_workers=4, max_sesiones=256):
+        self.max_workers = max_workers
+        self.max_sesiones = max_sesiones
+        self._pool = None
+        self._tandas = OrderedDict()   # handle -> {nombre: Future}
+        self._lock = threading.Lock()
+
+    def _executor(self):
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='precalculo')
+        return self._pool
+
+    def programar(self, handle, tareas):
+        """
+        Lanza `tareas` ({nombre: callable sin argumentos}) para `handle`,
+        cancelando la tanda anterior de la misma sesión.
+        """
+        with self._lock:
+            self._cancelar(handle)
+            pool = self._executor()
+            tanda = {nombre: pool.submit(self._ejecutar, nombre, tarea) for nombre, tarea in tareas.items()}
+            self._tandas[handle] = tanda
+            while len(self._tandas) > self.max_sesiones:
+                _, vieja = self._tandas.popitem(last=False)
+                for futuro in vieja.values():
+                    futuro.cancel()
+        return tanda
+
+    def obtener(self, handle, nombre):
+        """Future de la tarea `nombre` de la última tanda del handle (o None)."""
+        with self._lock:
+            return self._tandas.get(handle, {}).get(nombre)
+
+    def cancelar(self, handle):
+        with self._lock:
+            self._cancelar(handle)
+
+    def cerrar(self):
+        with self._lock:
+            for handle in list(self._tandas):
+                self._cancelar(handle)
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+    # ------------------------------------------------------------------
+
+    def _cancelar(self, handle):
+        tanda = self._tandas.pop(handle, None)
+        if tanda:
+            canceladas = sum(futuro.cancel() for futuro in tanda.values())
+            if canceladas:
+                logger.debug('precalculo: tareas canceladas', extra={'campos': {'canceladas': canceladas}})
+
+    @staticmethod
+    def _ejecutar(nombre, tarea):
+        with medir_solicitud(f'precalculo_{nombre}'):
+            return tarea()
@@ -0,0 +1,163 @@
+"""
+CATÁLOGOS Y CONSULTAS SINTÉTICAS
+================================
+
+Generadores deterministas (por semilla) de las nueve tablas de referencia
+que usa `search()` y de textos de iniciativas realistas. Permiten ejecutar
+benchmarks y pruebas de carga sin los Excel originales ni el modelo real.
+
+Las tablas respetan las columnas que esperan `textos_catalogos` y `search`;
+el tamaño del catálogo de indicadores es configurable (244 a 1M filas) y
+las metas escalan en proporción (169 por cada 244 indicadores).
+"""
+
+import numpy as np
+import pandas as pd
+
+TEMAS = [
+    'agua potable', 'saneamiento básico', 'seguridad alimentaria', 'educación rural',
+    'salud materna', 'equidad de género', 'energía solar', 'empleo juvenil',
+    'vías terciarias', 'reforestación', 'pesca artesanal', 'justicia comunitaria',
+    'conectividad digital', 'vivienda rural', 'restitución de tierras', 'economía campesina',
+    'protección de páramos', 'reincorporación', 'cultura afrodescendiente', 'gobierno propio indígena',
+]
+ACCIONES = [
+    'fortalecer', 'construir', 'implementar', 'formalizar', 'mejorar', 'garantizar',
+    'promover', 'capacitar en', 'dotar de infraestructura para', 'financiar proyectos de',
+]
+POBLACIONES = [
+    'mujeres rurales', 'jóvenes', 'comunidades indígenas', 'consejos comunitarios',
+    'víctimas del conflicto', 'adultos mayores', 'personas con discapacidad', 'campesinos',
+]
+LUGARES = [
+    'la vereda', 'el corregimiento', 'el resguardo', 'la cabecera municipal',
+    'la zona rural dispersa', 'el territorio colectivo', 'la subregión PDET',
+]
+
+N_ODS = 17
+FILAS_INDICADOR_BASE = 244
+FILAS_META_BASE = 169
+
+
+def _frase(rng, palabras_extra=0):
+    partes = [
+        rng.choice(ACCIONES), rng.choice(TEMAS), 'para', rng.choice(POBLACIONES),
+        'en', rng.choice(LUGARES),
+    ]
+    partes += list(rng.choice(TEMAS, size=palabras_extra))
+    return ' '.join(partes)
+
+
+def generar_consultas(n, semilla=0):
+    """Textos de iniciativas PATR plausibles (una o dos oraciones)."""
+    rng = np.random.default_rng(semilla)
+    consultas = []
+    for _ in range(n):
+        texto = _frase(rng).capitalize() + '.'
+        if rng.random() < 0.5:
+            texto += ' ' + _frase(rng, palabras_extra=2).capitalize() + '.'
+        consultas.append(texto)
+    return consultas
+
+
+def generar_iniciativas(n, municipios=170, semilla=0):
+    """Tabla PATR sintética (ID, INICIATIVAS, MUNICIPIO), como la que espera `load_data`."""
+    rng = np.random.default_rng(semilla)
+    return pd.DataFrame({
+        'ID': [f'PATR-{semilla}-{i:07d}' for i in range(n)],
+        'INICIATIVAS': generar_consultas(n, semilla=semilla),
+        'MUNICIPIO': [f'Municipio {m:03d}' for m in rng.integers(1, municipios + 1, size=n)],
+    })
+
+
+def _embeddings_aleatorios(rng, filas, dimension):
+    emb = rng.standard_normal((filas, dimension), dtype=np.float32)
+    emb /= np.linalg.norm(emb, axis=1, keepdims=True)
+    return emb
+
+
+def generar_catalogos(filas=FILAS_INDICADOR_BASE, dimension=768, semilla=0, codificador=None):
+    """
+    Genera las nueve tablas de referencia y sus embeddings.
+
+    Parámetros:
+    -----------
+    filas : int
+        Filas del catálogo de indicadores; las metas escalan en proporción.
+    dimension : int
+        Dimensión de los embeddings.
+    codificador : objeto con `encode` (opcional)
+        Si se indica, los embeddings se calculan codificando los textos
+        (p. ej. con `CodificadorHash`); si no, son vectores aleatorios
+        normalizados, mucho más rápidos para catálogos grandes.
+
+    Retorna:
+    --------
+    (dfs, embeddings) en el orden de CATALOGOS_TBLINPUT.
+    """
+    rng = np.random.default_rng(semilla)
+    filas_meta = max(FILAS_META_BASE, round(filas * FILAS_META_BASE / FILAS_INDICADOR_BASE))
+
+    ods_ids = np.arange(1, N_ODS + 1)
+    ods_df = pd.DataFrame({
+        'id_ods': ods_ids,
+        'ods': [f'Objetivo {i}: {TEMAS[i % len(TEMAS)]}' for i in ods_ids],
+        'descripcion': [_frase(rng) for _ in ods_ids],
+    })
+
+    # Metas repartidas entre los 17 ODS: META_ID = "<ods>.<k>"
+    meta_ods = np.arange(filas_meta) % N_ODS + 1
+    meta_num = np.arange(filas_meta) // N_ODS + 1
+    meta_ids = [f'{o}.{k}' for o, k in zip(meta_ods, meta_num)]
+    meta_df = pd.DataFrame({
+        'ID_META': meta_ids,
+        'META': [_frase(rng, palabras_extra=3) for _ in range(filas_meta)],
+        'ID_OBJETIVO': meta_ods,
+        'OBJETIVO': ods_df['ods'].to_numpy()[meta_ods - 1],
+    })
+
+    # Indicadores repartidos entre las metas: INDICADOR_ID = "<meta>.<r>"
+    ind_meta = np.arange(filas) % filas_meta
+    ind_num = np.arange(filas) // filas_meta + 1
+    temas = rng.integers(0, len(TEMAS), size=filas)
+    indicador_df = pd.DataFrame({
+        'ID_INDICADORES': [f'{meta_ids[m]}.{r}' for m, r in zip(ind_meta, ind_num)],
+        'INDICADORES': [f'Proporción de {POBLACIONES[t % len(POBLACIONES)]} con acceso a {TEMAS[t]}' for t in temas],
+        'ID_ODS': meta_ods[ind_meta],
+        'ID_META': np.asarray(meta_ids, dtype=object)[ind_meta],
+        'OBJETIVO': meta_df['OBJETIVO'].to_numpy()[ind_meta],
+    })
+
+    def _enfoque(nombre):
+        return pd.DataFrame({
+            'CATEGORIA': [f'Aplica enfoque {nombre}', f'No aplica enfoque {nombre}'],
+            'DESCRIPCION': [_frase(rng), _frase(rng)],
+        })
+
+    pilares_df = pd.DataFrame({
+        'PILAR': [f'Pilar {i}' for i in range(1, 9)],
+        'DESCRIPCION': [_frase(rng) for _ in range(8)],
+        'SUSTENTO': [_frase(rng) for _ in range(8)],
+    })
+    estrategias_df = pd.DataFrame({
+        'ESTRATEGIA': [f'Estrategia {i}' for i in range(1, 11)],
+        'DESCRIPCION': [_frase(rng) for _ in range(10)],
+    })
+    categorias_df = pd.DataFrame({
+        'CATEGORIA': ['Proyecto', 'Gestión'],
+        'DESCRIPCION': [_frase(rng), _frase(rng)],
+    })
+
+    dfs = [ods_df, meta_df, indicador_df, _enfoque('de género'), _enfoque('poblacional'),
+           _enfoque('étnico'), pilares_df, estrategias_df, categorias_df]
+
+    if codificador is not None:
+        from src.embeddings.modelos_nlp_db import textos_catalogos, INSTRUC_BASES, make_text_pairs
+        embeddings = [
+            np.asarray(codificador.encode(make_text_pairs(INSTRUC_BASES[idx], textos), normalize_embeddings=True))
+            for idx, textos in enumerate(textos_catalogos(dfs))
+        ]
+    else:
+        embeddings = [_embeddings_aleatorios(rng, len(df), dimension) for df in dfs]
+
+    return dfs, embeddings
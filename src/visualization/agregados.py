@@ -0,0 +1,94 @@
+"""
+CAPA DE AGREGADOS COMPARTIDA
+============================
+
+Estadísticos por nivel (ODS / META / INDICADOR) que antes recalculaba cada
+visualización por su cuenta y, en parte, escribía como columnas nuevas en
+el DataFrame recibido (`rank_decil`, `indicador_num`, `cuartil`,
+`rank_bin`).
+
+`obtener_agregados(df, id_lvl, score, rank)` calcula una sola vez por
+resultado (huella del DataFrame + columnas):
+
+- estadísticos globales del score (count, mean, std, min, cuartiles, max)
+- estadísticos por grupo en una pasada (count, mean, std, min, max)
+- correlación rank vs score y top-N por rank
+- columnas derivadas como Series alineadas al índice de `df` (deciles,
+  cuartiles y bins de rank, número de indicador), calculadas al primer uso
+
+El DataFrame de entrada nunca se modifica y los objetos devueltos se
+comparten entre visualizaciones e hilos: tratarlos como de solo lectura.
+"""
+
+import threading
+from collections import OrderedDict
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
+
+from src.visualization.cache_figuras import huella_df
+
+TOP_N = 50
+ETIQUETAS_DECIL = [f'D{i+1}' for i in range(10)]
+ETIQUETAS_CUARTIL = ['Q1 (Top)', 'Q2', 'Q3', 'Q4 (Bottom)']
+
+
+class Agregados:
+
+    def __init__(self, df, id_lvl, score, rank, top_n=TOP_N):
+        self.df = df
+        self.id_lvl = id_lvl
+        self.score = score
+        self.rank = rank
+
+        valores = df[score]
+        self.global_ = valores.describe()
+        self.por_grupo = valores.groupby(df[id_lvl], sort=True, observed=True).agg(['count', 'mean', 'std', 'min', 'max'])
+        self.correlacion = df[rank].corr(valores)
+        self.top = df.nsmallest(top_n, rank)
+
+    # Columnas derivadas (Series con el índice de df, sin tocar df)
+
+    @cached_property
+    def rank_decil(self):
+        return pd.qcut(self.df[self.rank], q=10, labels=ETIQUETAS_DECIL).rename('rank_decil')
+
+    @cached_property
+    def cuartil(self):
+        return pd.qcut(self.df[self.rank], q=4, labels=ETIQUETAS_CUARTIL).rename('cuartil')
+
+    @cached_property
+    def rank_bin(self):
+        return pd.cut(self.df[self.rank], bins=20, labels=False).rename('rank_bin')
+
+    @cached_property
+    def indicador_num(self):
+        return (self.df[self.id_lvl].astype(str)
+                .str.extract(r'\.(\d+)\.', expand=False).astype(float).rename('indicador_num'))
+
+    @cached_property
+    def tendencia(self):
+        """Recta de ajuste score ~ rank (np.poly1d)."""
+        return np.poly1d(np.polyfit(self.df[self.rank], self.df[self.score], 1))
+
+
+_AGREGADOS = OrderedDict()
+_LOCK = threading.Lock()
+MAX_AGREGADOS = 64
+
+
+def obtener_agregados(df, id_lvl, score, rank):
+    """Agregados de `df` para el nivel y columnas dados (memoizados por contenido)."""
+    clave = (huella_df(df), id_lvl, score, rank)
+    with _LOCK:
+        agregados = _AGREGADOS.get(clave)
+        if agregados is not None:
+            _AGREGADOS.move_to_end(clave)
+            return agregados
+    agregados = Agregados(df, id_lvl, score, rank)
+    with _LOCK:
+        _AGREGADOS[clave] = agregados
+        while len(_AGREGADOS) > MAX_AGREGADOS:
+            _AGREGADOS.popitem(last=False)
+    return agregados
@@ -0,0 +1,148 @@
+"""
+CACHE DE FIGURAS PARA LAS VISUALIZACIONES viz_*
+================================================
+
+Cache LRU delante de cada función `viz_*` de `visualizaciones_ods.py`.
+La clave es (huella del DataFrame, visualización, columnas de nivel /
+score / rank, título, top_n): volver a pulsar "Generar Visualización"
+sobre el mismo resultado de búsqueda devuelve la figura ya construida.
+
+- La huella se calcula con `pd.util.hash_pandas_object` sobre el
+  DataFrame recibido (valores, índice y nombres de columnas).
+- El tamaño de cada figura se estima con su serialización pickle; al
+  superar `max_bytes` se expulsan las menos usadas recientemente.
+- `estadisticas()` reporta aciertos, fallos y tasa de acierto por
+  visualización.
+
+Las figuras devueltas se comparten entre llamadas: tratarlas como de solo
+lectura.
+"""
+
+import hashlib
+import inspect
+import os
+import pickle
+import threading
+from collections import OrderedDict
+from functools import wraps
+
+import pandas as pd
+
+from src.utils.instrumentacion import logger
+
+# Tamaño asumido para figuras que no se pueden serializar con pickle
+TAMANO_POR_DEFECTO = 2 * 2**20
+
+
+def huella_df(df):
+    """Huella estable del contenido de un DataFrame (valores, índice y columnas)."""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(repr((df.shape, list(map(str, df.columns)))).encode('utf-8'))
+    h.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    return h.hexdigest()
+
+
+def tamano_figura(fig):
+    try:
+        return len(pickle.dumps(fig, protocol=pickle.HIGHEST_PROTOCOL))
+    except Exception:
+        return TAMANO_POR_DEFECTO
+
+
+class CacheFiguras:
+    """LRU de figuras acotado por memoria (thread-safe)."""
+
+    def __init__(self, max_bytes=256 * 2**20):
+        self.max_bytes = max_bytes
+        self.activa = True
+        self._entradas = OrderedDict()   # clave -> (figura, bytes)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._aciertos = {}
+        self._fallos = {}
+        self.expulsiones = 0
+
+    def obtener(self, clave):
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            viz = clave[1]
+            if entrada is None:
+                self._fallos[viz] = self._fallos.get(viz, 0) + 1
+                return None
+            self._entradas.move_to_end(clave)
+            self._aciertos[viz] = self._aciertos.get(viz, 0) + 1
+            return entrada[0]
+
+    def guardar(self, clave, fig):
+        peso = tamano_figura(fig)
+        if peso > self.max_bytes:
+            return
+        with self._lock:
+            previa = self._entradas.pop(clave, None)
+            if previa is not None:
+                self._bytes -= previa[1]
+            self._entradas[clave] = (fig, peso)
+            self._bytes += peso
+            while self._bytes > self.max_bytes:
+                _, (_, peso_expulsado) = self._entradas.popitem(last=False)
+                self._bytes -= peso_expulsado
+                self.expulsiones += 1
+
+    def limpiar(self):
+        with self._lock:
+            self._entradas.clear()
+            self._bytes = 0
+            self._aciertos.clear()
+            self._fallos.clear()
+            self.expulsiones = 0
+
+    def estadisticas(self):
+        """Aciertos, fallos y tasa de acierto (global y por visualización)."""
+        with self._lock:
+            por_viz = {}
+            for viz in sorted(set(self._aciertos) | set(self._fallos)):
+                a, f = self._aciertos.get(viz, 0), self._fallos.get(viz, 0)
+                por_viz[viz] = {'aciertos': a, 'fallos': f, 'tasa_acierto': a / (a + f) if a + f else 0.0}
+            aciertos, fallos = sum(self._aciertos.values()), sum(self._fallos.values())
+            return {
+                'entradas': len(self._entradas),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'expulsiones': self.expulsiones,
+                'aciertos': aciertos,
+                'fallos': fallos,
+                'tasa_acierto': aciertos / (aciertos + fallos) if aciertos + fallos else 0.0,
+                'por_viz': por_viz,
+            }
+
+
+CACHE_FIGURAS = CacheFiguras(max_bytes=int(os.environ.get('VOCES_ODS_CACHE_FIGURAS_MB', '256')) * 2**20)
+
+
+def cachear_figura(viz_id, cache=None):
+    """
+    Decorador para `viz_*(df, ...)`: busca la figura en el cache antes de
+    construirla. El resto de argumentos (id_lvl, score, rank, titulo, top_n)
+    forman parte de la clave con sus valores por defecto aplicados.
+    """
+    def decorador(funcion):
+        firma = inspect.signature(funcion)
+
+        @wraps(funcion)
+        def envoltura(df, *args, **kwargs):
+            c = cache or CACHE_FIGURAS
+            if not c.activa:
+                return funcion(df, *args, **kwargs)
+            argumentos = firma.bind(df, *args, **kwargs)
+            argumentos.apply_defaults()
+            parametros = tuple((k, v) for k, v in argumentos.arguments.items() if k != 'df')
+            clave = (huella_df(df), viz_id, parametros)
+            fig = c.obtener(clave)
+            if fig is None:
+                fig = funcion(df, *args, **kwargs)
+                c.guardar(clave, fig)
+            else:
+                logger.debug('cache de figuras: acierto', extra={'campos': {'viz': viz_id}})
+            return fig
+        return envoltura
+    return decorador
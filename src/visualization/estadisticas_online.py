@@ -0,0 +1,278 @@
+"""
+ESTADÍSTICAS EN STREAMING
+=========================
+
+Versión incremental de los agregados que usa `analisis_estadistico`
+(`src.visualization.agregados.Agregados`) para resultados que no caben en
+memoria: los datos llegan por lotes (particiones Parquet, lotes de
+`clasificar_lote`) y solo se conserva un resumen de tamaño acotado.
+
+- Media y varianza (global y por grupo): Welford por lotes; cada lote se
+  resume con numpy/pandas y se combina con el acumulado con la fórmula de
+  Chan et al. (estable, sin sumas de cuadrados grandes).
+- Correlación rank vs score: comomento combinado de la misma forma.
+- Cuantiles: sketch KLL (`SketchKLL`, error de rango ~1.7/k).
+- Top-N por rank: como mucho `top_n` filas entre lotes.
+
+`EstadisticasOnline` expone los mismos atributos que `Agregados`
+(`global_`, `por_grupo`, `correlacion`, `top`), así que el reporte de
+`analisis_estadistico` sirve para ambos. Dos acumuladores se pueden
+combinar con `fusionar` (p. ej. uno por worker).
+
+Las rutas se leen por lotes con `src.utils.carga_resultados.leer_por_lotes`
+(markdown, CSV, Parquet o Arrow).
+"""
+
+import math
+
+import numpy as np
+import pandas as pd
+
+from src.utils.carga_resultados import leer_por_lotes
+from src.visualization.agregados import TOP_N
+
+ESTADISTICOS_GRUPO = ['count', 'mean', 'std', 'min', 'max']
+
+
+# ============================================================================
+# SKETCH KLL DE CUANTILES
+# ============================================================================
+
+class SketchKLL:
+    """
+    Sketch KLL (Karnin, Lang y Liberty, 2016): compactadores por nivel; al
+    llenarse uno se ordena y pasa al siguiente una de cada dos muestras
+    (peso x2). Memoria O(k) y error de rango ~1.7/k.
+    """
+
+    def __init__(self, k=256, c=2 / 3, semilla=0):
+        self.k = k
+        self.c = c
+        self.n = 0
+        self.niveles = [np.empty(0)]
+        self._rng = np.random.default_rng(semilla)
+
+    def _capacidad(self, nivel):
+        altura = len(self.niveles)
+        return max(2, math.ceil(self.k * self.c ** (altura - 1 - nivel)))
+
+    def _compactar(self):
+        nivel = 0
+        while nivel < len(self.niveles):
+            datos = self.niveles[nivel]
+            if len(datos) > self._capacidad(nivel):
+                if nivel + 1 == len(self.niveles):
+                    self.niveles.append(np.empty(0))
+                datos = np.sort(datos)
+                # Con longitud impar, el último elemento se queda en el nivel
+                resto = datos[len(datos) - len(datos) % 2:]
+                pares = datos[:len(datos) - len(datos) % 2]
+                promovidos = pares[self._rng.integers(2)::2]
+                self.niveles[nivel + 1] = np.concatenate([self.niveles[nivel + 1], promovidos])
+                self.niveles[nivel] = resto
+            nivel += 1
+
+    def actualizar(self, valores):
+        valores = np.asarray(valores, dtype=np.float64)
+        valores = valores[~np.isnan(valores)]
+        if len(valores):
+            self.n += len(valores)
+            self.niveles[0] = np.concatenate([self.niveles[0], valores])
+            self._compactar()
+
+    def fusionar(self, otro):
+        while len(self.niveles) < len(otro.niveles):
+            self.niveles.append(np.empty(0))
+        for nivel, datos in enumerate(otro.niveles):
+            self.niveles[nivel] = np.concatenate([self.niveles[nivel], datos])
+        self.n += otro.n
+        self._compactar()
+
+    def cuantiles(self, qs):
+        if self.n == 0:
+            return np.full(len(qs), np.nan)
+        valores = np.concatenate(self.niveles)
+        pesos = np.concatenate([np.full(len(d), 2.0 ** h) for h, d in enumerate(self.niveles)])
+        orden = np.argsort(valores, kind='stable')
+        acumulado = np.cumsum(pesos[orden])
+        posiciones = np.searchsorted(acumulado, np.asarray(qs) * acumulado[-1], side='left')
+        return valores[orden][np.minimum(posiciones, len(valores) - 1)]
+
+
+# ============================================================================
+# COMBINACIÓN DE MOMENTOS (CHAN ET AL.)
+# ============================================================================
+
+def _combinar(n_a, media_a, m2_a, n_b, media_b, m2_b):
+    """(n, media, M2) de la unión de dos resúmenes; admite arrays alineados."""
+    n = n_a + n_b
+    with np.errstate(invalid='ignore', divide='ignore'):
+        delta = media_b - media_a
+        media = np.where(n > 0, media_a + delta * n_b / n, 0.0)
+        m2 = np.where(n > 0, m2_a + m2_b + delta ** 2 * n_a * n_b / n, 0.0)
+    return n, media, m2
+
+
+class EstadisticasOnline:
+    """Acumulador por lotes con la interfaz de `Agregados` (global_, por_grupo, correlacion, top)."""
+
+    def __init__(self, id_lvl, score, rank, top_n=TOP_N, k=256, semilla=0):
+        self.id_lvl = id_lvl
+        self.score = score
+        self.rank = rank
+        self.top_n = top_n
+        self.lotes = 0
+
+        self.n = 0
+        self.media = 0.0
+        self.m2 = 0.0
+        self.minimo = np.inf
+        self.maximo = -np.inf
+        self.cuantiles = SketchKLL(k=k, semilla=semilla)
+
+        # Correlación rank vs score (pares sin nulos)
+        self._n_xy = 0
+        self._media_x = self._media_y = 0.0
+        self._m2_x = self._m2_y = self._c_xy = 0.0
+
+        self._grupos = pd.DataFrame(columns=['n', 'media', 'm2', 'min', 'max'], dtype=np.float64)
+        self._top = None
+
+    # ------------------------------------------------------------------
+
+    def actualizar(self, lote):
+        """Incorpora un DataFrame con las columnas id_lvl, score y rank."""
+        valores = lote[self.score].to_numpy(dtype=np.float64)
+        validos = valores[~np.isnan(valores)]
+        if len(validos):
+            media_b = validos.mean()
+            self.n, self.media, self.m2 = (float(v) for v in _combinar(
+                self.n, self.media, self.m2, len(validos), media_b, ((validos - media_b) ** 2).sum()))
+            self.minimo = min(self.minimo, validos.min())
+            self.maximo = max(self.maximo, validos.max())
+            self.cuantiles.actualizar(validos)
+
+        rank = lote[self.rank].to_numpy(dtype=np.float64)
+        pares = ~(np.isnan(valores) | np.isnan(rank))
+        if pares.any():
+            x, y = rank[pares], valores[pares]
+            mx, my = x.mean(), y.mean()
+            self._acumular_correlacion(len(x), mx, my, ((x - mx) ** 2).sum(), ((y - my) ** 2).sum(),
+                                       ((x - mx) * (y - my)).sum())
+
+        agrupado = lote[self.score].groupby(lote[self.id_lvl], sort=False, observed=True)
+        resumen = agrupado.agg(['count', 'mean', 'var', 'min', 'max'])
+        resumen = pd.DataFrame({
+            'n': resumen['count'].astype(np.float64),
+            'media': resumen['mean'],
+            'm2': resumen['var'].fillna(0.0) * (resumen['count'] - 1),
+            'min': resumen['min'],
+            'max': resumen['max'],
+        })
+        self._acumular_grupos(resumen)
+
+        candidatos = lote.nsmallest(self.top_n, self.rank)
+        self._acumular_top(candidatos)
+        self.lotes += 1
+        return self
+
+    def fusionar(self, otra):
+        """Combina otro acumulador (mismas columnas) en este."""
+        self.n, self.media, self.m2 = (float(v) for v in _combinar(
+            self.n, self.media, self.m2, otra.n, otra.media, otra.m2))
+        self.minimo = min(self.minimo, otra.minimo)
+        self.maximo = max(self.maximo, otra.maximo)
+        self.cuantiles.fusionar(otra.cuantiles)
+        self._acumular_correlacion(otra._n_xy, otra._media_x, otra._media_y, otra._m2_x, otra._m2_y, otra._c_xy)
+        self._acumular_grupos(otra._grupos)
+        if otra._top is not None:
+            self._acumular_top(otra._top)
+        self.lotes += otra.lotes
+        return self
+
+    def _acumular_correlacion(self, n_b, mx_b, my_b, m2x_b, m2y_b, cxy_b):
+        n_a = self._n_xy
+        if n_b == 0:
+            return
+        n = n_a + n_b
+        dx, dy = mx_b - self._media_x, my_b - self._media_y
+        self._c_xy += cxy_b + dx * dy * n_a * n_b / n
+        self._m2_x += m2x_b + dx * dx * n_a * n_b / n
+        self._m2_y += m2y_b + dy * dy * n_a * n_b / n
+        self._media_x += dx * n_b / n
+        self._media_y += dy * n_b / n
+        self._n_xy = n
+
+    def _acumular_grupos(self, resumen):
+        if self._grupos.empty:
+            self._grupos = resumen.copy()
+            return
+        indice = self._grupos.index.union(resumen.index)
+        a = self._grupos.reindex(indice)
+        b = resumen.reindex(indice)
+        n_a, n_b = a['n'].fillna(0.0).to_numpy(), b['n'].fillna(0.0).to_numpy()
+        n, media, m2 = _combinar(
+            n_a, a['media'].fillna(0.0).to_numpy(), a['m2'].fillna(0.0).to_numpy(),
+            n_b, b['media'].fillna(0.0).to_numpy(), b['m2'].fillna(0.0).to_numpy(),
+        )
+        self._grupos = pd.DataFrame({
+            'n': n, 'media': media, 'm2': m2,
+            'min': np.fmin(a['min'].to_numpy(), b['min'].to_numpy()),
+            'max': np.fmax(a['max'].to_numpy(), b['max'].to_numpy()),
+        }, index=indice)
+
+    def _acumular_top(self, candidatos):
+        if self._top is None:
+            self._top = candidatos.nsmallest(self.top_n, self.rank)
+        else:
+            self._top = pd.concat([self._top, candidatos]).nsmallest(self.top_n, self.rank)
+
+    # ------------------------------------------------------------------
+    # Interfaz de `Agregados`
+    # ------------------------------------------------------------------
+
+    @property
+    def global_(self):
+        """Como `Series.describe()` (los cuartiles salen del sketch KLL)."""
+        q1, q2, q3 = self.cuantiles.cuantiles([0.25, 0.5, 0.75])
+        std = math.sqrt(self.m2 / (self.n - 1)) if self.n > 1 else np.nan
+        return pd.Series({
+            'count': float(self.n), 'mean': self.media if self.n else np.nan, 'std': std,
+            'min': self.minimo if self.n else np.nan, '25%': q1, '50%': q2, '75%': q3,
+            'max': self.maximo if self.n else np.nan,
+        }, name=self.score)
+
+    @property
+    def por_grupo(self):
+        g = self._grupos.sort_index()
+        with np.errstate(invalid='ignore', divide='ignore'):
+            std = np.where(g['n'] > 1, np.sqrt(g['m2'] / (g['n'] - 1)), np.nan)
+        resultado = pd.DataFrame({
+            'count': g['n'].astype(np.int64), 'mean': g['media'], 'std': std, 'min': g['min'], 'max': g['max'],
+        }, index=g.index)
+        resultado.index.name = self.id_lvl
+        return resultado[ESTADISTICOS_GRUPO]
+
+    @property
+    def correlacion(self):
+        if self._n_xy < 2 or self._m2_x == 0 or self._m2_y == 0:
+            return np.nan
+        return self._c_xy / math.sqrt(self._m2_x * self._m2_y)
+
+    @property
+    def top(self):
+        return self._top if self._top is not None else pd.DataFrame(columns=[self.id_lvl, self.score, self.rank])
+
+
+# ============================================================================
+# ALIMENTACIÓN POR LOTES
+# ============================================================================
+
+def estadisticas_por_lotes(lotes, id_lvl, score, rank, top_n=TOP_N):
+    """`EstadisticasOnline` alimentado con un iterable de DataFrames o la ruta de una exportación."""
+    if isinstance(lotes, (str, bytes)) or hasattr(lotes, '__fspath__'):
+        lotes = leer_por_lotes(lotes, columnas=[id_lvl, score, rank])
+    estadisticas = EstadisticasOnline(id_lvl, score, rank, top_n=top_n)
+    for lote in lotes:
+        estadisticas.actualizar(lote)
+    return estadisticas
@@ -0,0 +1,340 @@
+"""
+EXPORTACIÓN DE REPORTES EN LOTE
+===============================
+
+`generar_todas_visualizaciones` genera las diez figuras de un solo
+resultado, una tras otra y con nombres fijos en el directorio de trabajo.
+Este módulo exporta el conjunto de figuras de muchas iniciativas
+clasificadas en paralelo:
+
+- Cada reporte se construye en un worker de un pool de procesos ('spawn',
+  igual que `render_estatico`) y se escribe como un paquete propio:
+  - `html`: un único archivo autocontenido (plotly.js incrustado una vez,
+    heatmaps como imágenes `data:` en base64);
+  - `zip`: `index.html` + un solo `plotly-<versión>.min.js` compartido por
+    todas las figuras + los heatmaps como PNG.
+- Presupuesto de tiempo por reporte (`limite_segundos`): se interrumpe
+  con `SIGALRM` dentro del worker (donde exista) y, en todo caso, se
+  comprueba entre figura y figura. Un reporte que lo supera queda con
+  estado `tiempo_agotado` y no deja archivo a medias.
+- Progreso: `progreso(resultado, hechos, total)` se llama al terminar cada
+  reporte (por defecto imprime una línea) y al final se escribe
+  `indice.json` con el estado, la ruta, el tamaño y la duración de cada uno.
+
+`reportes_desde_lote` convierte la tabla ODS de `clasificar_lote` en un
+DataFrame por iniciativa, con el score normalizado como en `search`.
+"""
+
+import base64
+import html
+import io
+import json
+import multiprocessing
+import os
+import re
+import signal
+import threading
+import time
+import unicodedata
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from pathlib import Path
+
+from src.utils.instrumentacion import logger
+from src.visualization.imagenes import DPI
+
+FORMATOS_REPORTE = ('html', 'zip')
+
+# Parámetros de las visualizaciones: (id_lvl, score, rank, titulo)
+NIVEL_REPORTE = ('ODS_ID', 'ods_similaridad_cos_normalized', 'ods_rank', 'ODS')
+
+# (clave, título de la sección, nombre de la función viz, kwargs extra);
+# mismas figuras y claves que `generar_todas_visualizaciones`
+FIGURAS_REPORTE = [
+    ('viz1_boxplot', 'Distribución de similaridad', 'viz_1_distribucion_por_ods', {}),
+    ('viz2_heatmap', 'Heatmap por rango de ranking', 'viz_2_heatmap_ods_ranking', {}),
+    ('viz3_scatter3d', 'Dispersión 3D', 'viz_3_scatter_3d_interactivo', {}),
+    ('viz4_radar', 'Radar por ODS', 'viz_4_radar_chart_ods', {}),
+    ('viz5_sunburst', 'Jerarquía (sunburst)', 'viz_5_sunburst_jerarquia', {}),
+    ('viz6_topn', 'Top indicadores por ODS', 'viz_6_top_indicadores_por_ods', {'top_n': 5}),
+    ('viz7_stream', 'Stream graph', 'viz_7_streamgraph_similaridad', {}),
+    ('viz8_violin', 'Violin plot', 'viz_8_violin_plot_ods', {}),
+    ('viz9_dashboard', 'Dashboard de métricas', 'viz_9_dashboard_metricas', {}),
+    ('viz10_matriz', 'Matriz de transición', 'viz_10_matriz_transicion', {}),
+]
+
+PLANTILLA_REPORTE = """<!DOCTYPE html>
+<html lang="es">
+<head>
+<meta charset="utf-8">
+<title>{titulo}</title>
+<style>
+body {{ font-family: Arial, sans-serif; margin: 24px; color: #222; }}
+h1 {{ color: #003DA5; font-size: 22px; }}
+h2 {{ color: #2E5090; font-size: 18px; margin-top: 32px; }}
+img {{ max-width: 100%; height: auto; }}
+</style>
+{script}
+</head>
+<body>
+<h1>{titulo}</h1>
+{secciones}
+</body>
+</html>
+"""
+
+
+# ============================================================================
+# DATOS DE ENTRADA
+# ============================================================================
+
+def reportes_desde_lote(df_ods, nombres=None):
+    """
+    Lista de (nombre, DataFrame), uno por iniciativa, a partir de la tabla
+    ODS de `clasificar_lote` (columna INICIATIVA), con
+    `ods_similaridad_cos_normalized` escalado a [0, 1] dentro de cada
+    iniciativa (lo mismo que hace `search`). Es una lista y no un dict:
+    dos iniciativas con el mismo texto dan dos reportes; el nombre solo es
+    el título (los archivos se numeran por posición).
+    """
+    reportes = []
+    for iniciativa, df in df_ods.groupby('INICIATIVA', sort=True):
+        df = df.drop(columns='INICIATIVA').reset_index(drop=True)
+        scores = df['ods_similaridad_cos']
+        rango = scores.max() - scores.min()
+        df['ods_similaridad_cos_normalized'] = (scores - scores.min()) / rango if rango > 0 else 0.0
+        nombre = nombres[iniciativa] if nombres is not None else f'Iniciativa {iniciativa}'
+        reportes.append((nombre, df))
+    return reportes
+
+
+def nombre_archivo(indice, nombre, largo=60):
+    """`0007-texto-de-la-iniciativa`: único por posición y legible."""
+    texto = unicodedata.normalize('NFKD', str(nombre)).encode('ascii', 'ignore').decode('ascii')
+    texto = re.sub(r'[^A-Za-z0-9]+', '-', texto).strip('-').lower()[:largo].rstrip('-')
+    return f'{indice:04d}-{texto or "reporte"}'
+
+
+# ============================================================================
+# CONSTRUCCIÓN DE UN REPORTE (SE EJECUTA EN EL WORKER)
+# ============================================================================
+
+@contextmanager
+def limite_tiempo(segundos):
+    """Lanza TimeoutError si el bloque dura más de `segundos` (solo hilo principal con SIGALRM)."""
+    if (not segundos or not hasattr(signal, 'setitimer')
+            or threading.current_thread() is not threading.main_thread()):
+        yield
+        return
+
+    def agotado(signum, frame):
+        raise TimeoutError(f'El reporte superó {segundos} s')
+
+    anterior = signal.signal(signal.SIGALRM, agotado)
+    signal.setitimer(signal.ITIMER_REAL, segundos)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, anterior)
+
+
+def construir_figuras(df, nivel=NIVEL_REPORTE, limite_segundos=None, inicio=None):
+    """
+    Lista de (clave, título, tipo, contenido) con las figuras del reporte:
+    tipo 'plotly' → JSON con arrays tipados; tipo 'imagen' → bytes PNG.
+    """
+    from src.visualization import visualizaciones_ods
+    from src.visualization.figuras_rapidas import figura_json
+    from src.visualization.imagenes import codificar_figura
+
+    inicio = inicio or time.perf_counter()
+    figuras = []
+    for clave, titulo, funcion, kwargs in FIGURAS_REPORTE:
+        if limite_segundos and time.perf_counter() - inicio > limite_segundos:
+            raise TimeoutError(f'El reporte superó {limite_segundos} s (antes de {clave})')
+        # Sin el cache de figuras: cada reporte es un resultado distinto
+        construir = getattr(visualizaciones_ods, funcion).__wrapped__
+        if funcion == 'viz_1_distribucion_por_ods':
+            id_lvl, score, _, titulo_nivel = nivel
+            fig = construir(df, id_lvl, score, titulo_nivel)
+        else:
+            fig = construir(df, *nivel, **kwargs)
+        if hasattr(fig, 'savefig'):
+            figuras.append((clave, titulo, 'imagen', codificar_figura(fig, 'png', DPI)))
+        else:
+            figuras.append((clave, titulo, 'plotly', figura_json(fig, arrays_tipados=True)))
+    return figuras
+
+
+def _seccion(clave, titulo, tipo, contenido, src_imagen=None):
+    if tipo == 'imagen':
+        return f'<h2>{html.escape(titulo)}</h2>\n<img src="{src_imagen}" alt="{html.escape(titulo)}">'
+    figura = contenido.replace('</', '<\\/')
+    return (
+        f'<h2>{html.escape(titulo)}</h2>\n'
+        f'<div id="{clave}" class="plotly-graph-div" style="width:100%;"></div>\n'
+        f'<script>(function(){{var f={figura};'
+        f'Plotly.newPlot("{clave}",f.data,f.layout,{{"responsive":true}});}})();</script>'
+    )
+
+
+def empaquetar_html(titulo, figuras):
+    """HTML autocontenido: plotly.js incrustado una vez e imágenes en base64."""
+    import plotly.offline
+    secciones = []
+    for clave, titulo_fig, tipo, contenido in figuras:
+        src = None
+        if tipo == 'imagen':
+            src = 'data:image/png;base64,' + base64.b64encode(contenido).decode('ascii')
+        secciones.append(_seccion(clave, titulo_fig, tipo, contenido, src))
+    script = f'<script type="text/javascript">{plotly.offline.get_plotlyjs()}</script>'
+    return PLANTILLA_REPORTE.format(
+        titulo=html.escape(titulo), script=script, secciones='\n'.join(secciones)
+    ).encode('utf-8')
+
+
+def empaquetar_zip(titulo, figuras):
+    """ZIP con `index.html`, un plotly.js compartido y las imágenes como archivos."""
+    import plotly.offline
+    from src.visualization.plotlyjs import NOMBRE_PLOTLYJS
+
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+        secciones = []
+        for clave, titulo_fig, tipo, contenido in figuras:
+            src = None
+            if tipo == 'imagen':
+                src = f'imagenes/{clave}.png'
+                # PNG ya comprimido: se guarda sin volver a comprimir
+                zf.writestr(src, contenido, compress_type=zipfile.ZIP_STORED)
+            secciones.append(_seccion(clave, titulo_fig, tipo, contenido, src))
+        zf.writestr(NOMBRE_PLOTLYJS, plotly.offline.get_plotlyjs())
+        zf.writestr('index.html', PLANTILLA_REPORTE.format(
+            titulo=html.escape(titulo),
+            script=f'<script src="{NOMBRE_PLOTLYJS}"></script>',
+            secciones='\n'.join(secciones),
+        ))
+    return buffer.getvalue()
+
+
+def exportar_reporte(nombre, df, ruta, formato='html', nivel=NIVEL_REPORTE, limite_segundos=None):
+    """
+    Construye y escribe un reporte; devuelve un dict con su estado
+    ('ok', 'tiempo_agotado' o 'error') en lugar de lanzar la excepción.
+    """
+    inicio = time.perf_counter()
+    resultado = {'nombre': nombre, 'ruta': str(ruta), 'filas': len(df)}
+    try:
+        with limite_tiempo(limite_segundos):
+            figuras = construir_figuras(df, nivel, limite_segundos, inicio)
+            empaquetar = empaquetar_zip if formato == 'zip' else empaquetar_html
+            contenido = empaquetar(str(nombre), figuras)
+        ruta = Path(ruta)
+        temporal = ruta.with_name(f'{ruta.name}.{os.getpid()}.tmp')
+        temporal.write_bytes(contenido)
+        os.replace(temporal, ruta)
+        resultado.update(estado='ok', bytes=len(contenido))
+    except TimeoutError as e:
+        resultado.update(estado='tiempo_agotado', error=str(e))
+    except Exception as e:
+        resultado.update(estado='error', error=f'{type(e).__name__}: {e}')
+    resultado['segundos'] = round(time.perf_counter() - inicio, 3)
+    return resultado
+
+
+# ============================================================================
+# LOTE EN PARALELO
+# ============================================================================
+
+def _iniciar_worker_reportes():
+    # Librerías de dibujo importadas al arrancar: no cuentan en el presupuesto del primer reporte
+    from src.visualization.render_estatico import _iniciar_worker, _precargar
+    _iniciar_worker()
+    _precargar()
+
+
+def imprimir_progreso(resultado, hechos, total):
+    detalle = (f"{resultado['bytes'] / 1024:.0f} KB" if resultado['estado'] == 'ok'
+               else resultado.get('error', ''))
+    print(f"  [{hechos}/{total}] {resultado['estado']:14s} {resultado['segundos']:6.1f} s  "
+          f"{Path(resultado['ruta']).name}  {detalle}")
+
+
+def exportar_reportes(reportes, salida, formato='html', workers=None, limite_segundos=120.0,
+                      nivel=NIVEL_REPORTE, progreso=imprimir_progreso):
+    """
+    Exporta un reporte por cada entrada de `reportes` ({nombre: DataFrame}
+    o lista de pares) en `salida`, en paralelo.
+
+    Parámetros:
+    -----------
+    formato : str
+        'html' (archivo autocontenido) o 'zip' (plotly.js compartido).
+    workers : int o None
+        Procesos del pool (None = núcleos disponibles; 0 = en este proceso).
+    limite_segundos : float o None
+        Presupuesto de tiempo de cada reporte.
+    progreso : callable o None
+        `progreso(resultado, hechos, total)` al terminar cada reporte.
+
+    Retorna:
+    --------
+    list : un dict por reporte (mismo orden de entrada) con nombre, ruta,
+    estado, bytes, segundos y error.
+    """
+    if formato not in FORMATOS_REPORTE:
+        raise ValueError(f"formato debe ser uno de {FORMATOS_REPORTE}, no {formato!r}")
+    salida = Path(salida)
+    salida.mkdir(parents=True, exist_ok=True)
+    pares = list(reportes.items() if hasattr(reportes, 'items') else reportes)
+    tareas = [
+        (nombre, df, salida / f'{nombre_archivo(i, nombre)}.{formato}')
+        for i, (nombre, df) in enumerate(pares, 1)
+    ]
+
+    inicio = time.perf_counter()
+    resultados = [None] * len(tareas)
+
+    def registrar(i, resultado, hechos):
+        resultados[i] = resultado
+        if resultado['estado'] != 'ok':
+            logger.warning('exportacion: reporte fallido', extra={'campos': {
+                'reporte': resultado['nombre'], 'estado': resultado['estado'], 'error': resultado.get('error')}})
+        if progreso is not None:
+            progreso(resultado, hechos, len(tareas))
+
+    if workers == 0:
+        for i, (nombre, df, ruta) in enumerate(tareas):
+            registrar(i, exportar_reporte(nombre, df, ruta, formato, nivel, limite_segundos), i + 1)
+    elif tareas:
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_iniciar_worker_reportes,
+        ) as pool:
+            futuros = {
+                pool.submit(exportar_reporte, nombre, df, ruta, formato, nivel, limite_segundos): i
+                for i, (nombre, df, ruta) in enumerate(tareas)
+            }
+            for hechos, futuro in enumerate(as_completed(futuros), 1):
+                i = futuros[futuro]
+                try:
+                    resultado = futuro.result()
+                except BrokenProcessPool as e:
+                    nombre, df, ruta = tareas[i]
+                    resultado = {'nombre': nombre, 'ruta': str(ruta), 'filas': len(df),
+                                 'estado': 'error', 'error': f'BrokenProcessPool: {e}', 'segundos': 0.0}
+                registrar(i, resultado, hechos)
+
+    indice = {
+        'formato': formato,
+        'limite_segundos': limite_segundos,
+        'segundos': round(time.perf_counter() - inicio, 3),
+        'reportes': resultados,
+    }
+    with open(salida / 'indice.json', 'w', encoding='utf-8') as f:
+        json.dump(indice, f, ensure_ascii=False, indent=1, default=str)
+    return resultados
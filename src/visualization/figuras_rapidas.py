@@ -0,0 +1,163 @@
+"""
+CONSTRUCCIÓN RÁPIDA DE FIGURAS PLOTLY
+=====================================
+
+`go.Figure` / `add_trace` validan cada propiedad de cada traza; en las
+gráficas pequeñas de la app eso cuesta más que preparar los datos. Este
+módulo arma la figura directamente como diccionario (`data` + `layout`):
+
+- `PLANTILLA`: la plantilla de plotly activa, serializada una sola vez y
+  compartida por todas las figuras (es lo que `go.Figure` incrusta en
+  `layout.template` al serializar).
+- `nueva_figura(data, layout)`: `FiguraLigera` con las trazas como dicts
+  y el layout ya plantillado. Con `VOCES_ODS_FIGURAS_LIGERAS=0` devuelve
+  un `go.Figure` validado (ruta original, útil para depurar y comparar).
+- `FiguraLigera.to_json()`: serializa con orjson; los arrays numéricos de
+  numpy/pandas se escriben sin pasar por listas de Python.
+  Con `arrays_tipados=True` se codifican como arrays tipados de plotly.js
+  (`{"dtype": "f8", "bdata": <base64>}`, plotly.js ≥ 2.28) cuando ocupan
+  menos que el texto: lo usan `to_html` / `write_html`, pero no
+  `gr.Plot`, cuyo plotly.js embebido es anterior a ese formato. Si el
+  plotly.js del paquete `plotly` instalado (el que se sirve o se incrusta)
+  es anterior a 2.28 (`ARRAYS_TIPADOS` falso) se escriben listas.
+- `figura_json(fig)`: la misma serialización para cualquier figura
+  (también `go.Figure`), usada por los fragmentos HTML de `plotlyjs.py`.
+
+`gr.Plot` acepta la `FiguraLigera` tal cual (llama a `to_json()`). Las
+figuras se comparten a través del cache: tratarlas como de solo lectura.
+"""
+
+import base64
+import os
+
+import numpy as np
+import orjson
+import pandas as pd
+import plotly.graph_objects as go
+import plotly.io as pio
+import plotly.offline
+
+FIGURAS_LIGERAS = os.environ.get('VOCES_ODS_FIGURAS_LIGERAS', '1') != '0'
+
+PLANTILLA = pio.templates[pio.templates.default].to_plotly_json()
+
+# plotly.js que trae el paquete plotly: los arrays tipados requieren ≥ 2.28
+VERSION_PLOTLYJS = plotly.offline.get_plotlyjs_version()
+ARRAYS_TIPADOS = tuple(int(parte) for parte in VERSION_PLOTLYJS.split('.')[:2]) >= (2, 28)
+
+# Arrays más cortos que esto no compensan la codificación base64
+MIN_ARRAY_TIPADO = 16
+
+# dtype de numpy -> dtype de array tipado de plotly.js
+DTYPES_TIPADOS = {
+    'float64': 'f8', 'float32': 'f4',
+    'int32': 'i4', 'int16': 'i2', 'int8': 'i1',
+    'uint32': 'u4', 'uint16': 'u2', 'uint8': 'u1',
+}
+
+
+def _a_array(valor):
+    """Series / Index / listas numéricas -> ndarray (None si no es numérico)."""
+    if isinstance(valor, (pd.Series, pd.Index)):
+        valor = valor.to_numpy()
+    if isinstance(valor, np.ndarray) and valor.dtype.kind in 'biuf':
+        return valor
+    return None
+
+
+def _por_defecto(valor):
+    """Tipos que orjson no serializa por sí mismo."""
+    if isinstance(valor, (pd.Series, pd.Index)):
+        valor = valor.to_numpy()
+    if isinstance(valor, np.ndarray):
+        if valor.dtype.kind in 'biuf':
+            return np.ascontiguousarray(valor)
+        return valor.tolist()
+    if isinstance(valor, np.generic):
+        return valor.item()
+    if isinstance(valor, pd.Timestamp):
+        return valor.isoformat()
+    raise TypeError(f'Tipo no serializable: {type(valor).__name__}')
+
+
+def _tipar(valor):
+    """Copia del árbol con los arrays numéricos largos como arrays tipados de plotly.js."""
+    if not ARRAYS_TIPADOS:
+        return valor
+    if isinstance(valor, dict):
+        return {k: _tipar(v) for k, v in valor.items()}
+    if isinstance(valor, (list, tuple)):
+        return [_tipar(v) for v in valor]
+    array = _a_array(valor)
+    if array is None or array.ndim != 1 or len(array) < MIN_ARRAY_TIPADO:
+        return valor
+    if array.dtype.kind == 'b':
+        array = array.astype(np.uint8)
+    elif array.dtype == np.int64 or array.dtype == np.uint64:
+        # plotly.js no tiene enteros de 64 bits
+        info = np.iinfo(np.int32)
+        array = array.astype(np.int32) if info.min <= array.min() and array.max() <= info.max else array.astype(np.float64)
+    dtype = DTYPES_TIPADOS.get(array.dtype.name)
+    if dtype is None:
+        return valor
+    # Solo si ocupa menos que el texto (p. ej. no en arrays cortos llenos de ceros)
+    array = np.ascontiguousarray(array)
+    if 4 * -(-array.nbytes // 3) >= len(orjson.dumps(array, option=orjson.OPT_SERIALIZE_NUMPY)):
+        return valor
+    return {'dtype': dtype, 'bdata': base64.b64encode(array.tobytes()).decode('ascii')}
+
+
+def _serializar(valor):
+    return orjson.dumps(
+        valor,
+        default=_por_defecto,
+        option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS,
+    ).decode('utf-8')
+
+
+class FiguraLigera:
+    """Figura plotly como dict (`data` + `layout`), sin validación de propiedades."""
+
+    __slots__ = ('data', 'layout')
+
+    def __init__(self, data, layout):
+        self.data = data
+        self.layout = layout
+
+    def to_dict(self):
+        return {'data': self.data, 'layout': self.layout}
+
+    to_plotly_json = to_dict
+
+    def to_json(self, arrays_tipados=False):
+        return _serializar(_tipar(self.to_dict()) if arrays_tipados else self.to_dict())
+
+    def to_html(self, **kwargs):
+        return pio.to_html(_tipar(self.to_dict()), validate=False, **kwargs)
+
+    def write_html(self, archivo, **kwargs):
+        return pio.write_html(_tipar(self.to_dict()), archivo, validate=False, **kwargs)
+
+    def a_figura(self):
+        """`go.Figure` validado equivalente (para APIs que lo requieran)."""
+        return go.Figure(self.to_dict())
+
+
+def nueva_figura(data, layout):
+    """
+    Figura a partir de trazas (dicts con 'type') y layout (dict). El
+    layout recibe la plantilla compartida si no trae una propia.
+    """
+    if not FIGURAS_LIGERAS:
+        return go.Figure(data=data, layout=layout)
+    if 'template' not in layout:
+        layout = {**layout, 'template': PLANTILLA}
+    return FiguraLigera(data, layout)
+
+
+def figura_json(fig, arrays_tipados=False):
+    """JSON compacto de una figura (`FiguraLigera` o `go.Figure`)."""
+    if isinstance(fig, FiguraLigera):
+        return fig.to_json(arrays_tipados)
+    figura = fig.to_plotly_json()
+    return _serializar(_tipar(figura) if arrays_tipados else figura)
@@ -0,0 +1,82 @@
+"""
+IMÁGENES EN MEMORIA CON NOMBRES POR CONTENIDO
+=============================================
+
+Las figuras estáticas se codifican en memoria (`BytesIO`, PNG o WebP) y se
+publican con un nombre derivado del hash de su contenido
+(`<prefijo>-<sha256[:16]>.<ext>`). Así:
+
+- dos sesiones nunca se pisan la imagen: contenidos distintos → nombres
+  distintos;
+- una imagen ya publicada no se vuelve a escribir (el hash sirve de cache);
+- `gr.Image` recibe la ruta final directamente, sin archivos intermedios.
+
+El directorio se limita a `max_archivos` imágenes; se borran primero las
+publicadas o reutilizadas hace más tiempo.
+"""
+
+import hashlib
+import io
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+FORMATOS = {'png': 'png', 'webp': 'webp'}
+FORMATO_IMAGEN = os.environ.get('VOCES_ODS_FORMATO_IMAGEN', 'png').lower()
+DPI = 150
+
+
+def codificar_figura(fig, formato=FORMATO_IMAGEN, dpi=DPI):
+    """Bytes de una figura matplotlib codificada en memoria (PNG o WebP)."""
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format=FORMATOS[formato], dpi=dpi, bbox_inches='tight')
+    return buffer.getvalue()
+
+
+class AlmacenImagenes:
+    """Publica bytes de imagen como archivos direccionados por contenido (thread-safe)."""
+
+    def __init__(self, directorio=None, max_archivos=2000):
+        self.directorio = Path(directorio or Path(tempfile.gettempdir()) / 'voces_ods_imagenes')
+        self.max_archivos = max_archivos
+        self._rutas = OrderedDict()   # hash -> ruta
+        self._lock = threading.Lock()
+        self.escrituras = 0
+        self.reutilizadas = 0
+
+    def publicar(self, contenido, formato='png', prefijo='imagen'):
+        """Ruta del archivo con estos bytes (lo escribe solo si no existía)."""
+        digest = hashlib.sha256(contenido).hexdigest()[:16]
+        with self._lock:
+            ruta = self._rutas.get(digest)
+            if ruta is not None and ruta.exists():
+                self._rutas.move_to_end(digest)
+                self.reutilizadas += 1
+                return str(ruta)
+
+            self.directorio.mkdir(parents=True, exist_ok=True)
+            ruta = self.directorio / f'{prefijo}-{digest}.{FORMATOS[formato]}'
+            if ruta.exists():
+                self.reutilizadas += 1
+            else:
+                # Escritura atómica: nunca se sirve un archivo a medio escribir
+                temporal = ruta.with_suffix(ruta.suffix + f'.{threading.get_ident()}.tmp')
+                temporal.write_bytes(contenido)
+                os.replace(temporal, ruta)
+                self.escrituras += 1
+            self._rutas[digest] = ruta
+
+            while len(self._rutas) > self.max_archivos:
+                _, vieja = self._rutas.popitem(last=False)
+                vieja.unlink(missing_ok=True)
+        return str(ruta)
+
+    def estadisticas(self):
+        with self._lock:
+            return {'archivos': len(self._rutas), 'escrituras': self.escrituras,
+                    'reutilizadas': self.reutilizadas, 'directorio': str(self.directorio)}
+
+
+IMAGENES = AlmacenImagenes(max_archivos=int(os.environ.get('VOCES_ODS_MAX_IMAGENES', '2000')))
@@ -0,0 +1,100 @@
+"""
+MUESTREO DE PUNTOS PARA GRÁFICAS GRANDES
+========================================
+
+Con resultados masivos (miles de iniciativas × indicadores) los scatter
+envían al navegador un punto por fila y la página se bloquea. Por encima
+de un presupuesto de puntos (`PRESUPUESTO_PUNTOS`, variable de entorno
+`VOCES_ODS_PRESUPUESTO_PUNTOS`) las visualizaciones pasan a modo de datos
+grandes:
+
+- `lttb(x, y, n)`: Largest-Triangle-Three-Buckets para series 2D ordenadas
+  por x (conserva picos y forma de la curva).
+- `muestreo_voxel(coordenadas, n, prioridad)`: rejilla regular sobre las
+  coordenadas normalizadas; cada celda ocupada conserva al menos un punto
+  y el resto del presupuesto se reparte en proporción a su densidad. Dentro
+  de cada celda se conservan primero los puntos de menor `prioridad`
+  (p. ej. el rank).
+- `etiqueta_muestreo(n, total)`: texto "muestra/total" para títulos.
+
+Todas devuelven índices posicionales ordenados, sin modificar la entrada.
+"""
+
+import os
+
+import numpy as np
+
+PRESUPUESTO_PUNTOS = int(os.environ.get('VOCES_ODS_PRESUPUESTO_PUNTOS', '5000'))
+
+
+def requiere_muestreo(total, presupuesto=None):
+    presupuesto = PRESUPUESTO_PUNTOS if presupuesto is None else presupuesto
+    return 0 < presupuesto < total
+
+
+def lttb(x, y, n):
+    """Índices de `n` puntos de (x, y) según LTTB (x ordenado ascendente)."""
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    total = len(x)
+    if n >= total or n < 3:
+        return np.arange(total) if n >= total else np.linspace(0, total - 1, max(n, 1)).astype(int)
+
+    # Primer y último punto fijos; n-2 cubetas para el resto
+    limites = np.linspace(1, total - 1, n - 1).astype(int)
+    indices = np.empty(n, dtype=int)
+    indices[0], indices[-1] = 0, total - 1
+    # Promedio de cada cubeta (más el último punto como cubeta final)
+    cortes = np.append(limites, total)
+    tamanos = np.diff(cortes)
+    medias_x = np.add.reduceat(x, cortes[:-1]) / tamanos
+    medias_y = np.add.reduceat(y, cortes[:-1]) / tamanos
+    anterior = 0
+    for i in range(n - 2):
+        ini, fin = limites[i], limites[i + 1]
+        # El tercer vértice es el promedio de la cubeta siguiente
+        mx, my = medias_x[i + 1], medias_y[i + 1]
+        ax, ay = x[anterior], y[anterior]
+        areas = np.abs((ax - mx) * (y[ini:fin] - ay) - (ax - x[ini:fin]) * (my - ay))
+        anterior = ini + int(areas.argmax())
+        indices[i + 1] = anterior
+    return indices
+
+
+def muestreo_voxel(coordenadas, n, prioridad=None):
+    """
+    Índices de como mucho `n` filas de `coordenadas` (array total × d)
+    conservando la densidad relativa por celda de una rejilla regular.
+    """
+    coordenadas = np.asarray(coordenadas, dtype=float)
+    if coordenadas.ndim == 1:
+        coordenadas = coordenadas[:, None]
+    total, dim = coordenadas.shape
+    if n >= total:
+        return np.arange(total)
+
+    # Normalizar cada eje a [0, 1] (NaN → 0: p. ej. número de indicador en nivel ODS)
+    coordenadas = np.nan_to_num(coordenadas)
+    minimo, rango = coordenadas.min(axis=0), np.ptp(coordenadas, axis=0)
+    normalizadas = (coordenadas - minimo) / np.where(rango > 0, rango, 1)
+
+    # Resolución con como mucho n/2 celdas: deja presupuesto para repartir por densidad
+    resolucion = max(1, int((n / 2) ** (1 / dim)))
+    celdas = np.minimum((normalizadas * resolucion).astype(np.int64), resolucion - 1)
+    claves = np.ravel_multi_index(celdas.T, (resolucion,) * dim)
+
+    prioridad = np.arange(total) if prioridad is None else np.asarray(prioridad)
+    orden = np.lexsort((prioridad, claves))
+    claves_ordenadas = claves[orden]
+    _, inicio, conteo = np.unique(claves_ordenadas, return_index=True, return_counts=True)
+
+    # Cuota por celda: 1 + parte proporcional del presupuesto restante (suma ≤ n)
+    ocupadas = len(conteo)
+    cuota = 1 + np.floor(conteo * max(n - ocupadas, 0) / total).astype(int)
+    posicion = np.arange(total) - np.repeat(inicio, conteo)
+    conservar = posicion < np.repeat(cuota, conteo)
+    return np.sort(orden[conservar])[:n]
+
+
+def etiqueta_muestreo(n, total):
+    return f'{n:,} de {total:,} puntos ({n / total:.1%})'
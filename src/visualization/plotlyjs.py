@@ -0,0 +1,54 @@
+"""
+PLOTLY.JS LOCAL (SIN CDN)
+=========================
+
+Las figuras exportadas como HTML (`plotly_to_html`, exportaciones) cargaban
+plotly.js desde el CDN, lo que falla en servidores sin salida a internet.
+Este módulo:
+
+- copia el plotly.js que trae el paquete `plotly` a los estáticos del
+  servidor (`src.utils.estaticos`) con la versión en el nombre
+  (`plotly-<versión>.min.js`): se sirve con cache inmutable y el
+  navegador lo descarga una sola vez;
+- `figura_html(fig)`: fragmento HTML compacto (div + `Plotly.newPlot`) que
+  referencia el script local y envía la figura como JSON con arrays
+  tipados en base64 para las columnas numéricas (si ese plotly.js los
+  soporta, ver `figuras_rapidas.ARRAYS_TIPADOS`).
+"""
+
+import json
+import uuid
+from pathlib import Path
+
+import plotly.offline
+
+from src.utils.estaticos import DIRECTORIO_ESTATICOS, publicar_estatico, url_estatico
+from src.visualization.figuras_rapidas import VERSION_PLOTLYJS, figura_json
+
+NOMBRE_PLOTLYJS = f'plotly-{VERSION_PLOTLYJS}.min.js'
+URL_PLOTLYJS = url_estatico(NOMBRE_PLOTLYJS)
+
+
+def publicar_plotlyjs(directorio=None):
+    """Ruta local del plotly.js versionado (lo escribe solo la primera vez)."""
+    ruta = Path(directorio or DIRECTORIO_ESTATICOS) / NOMBRE_PLOTLYJS
+    if ruta.exists():
+        return ruta
+    return publicar_estatico(NOMBRE_PLOTLYJS, plotly.offline.get_plotlyjs().encode('utf-8'), directorio)
+
+
+def figura_html(fig, url_plotlyjs=URL_PLOTLYJS, config=None):
+    """
+    Fragmento HTML de una figura plotly (`go.Figure` o `FiguraLigera`) que
+    carga plotly.js desde `url_plotlyjs` (por defecto el servido localmente).
+    """
+    div_id = f'fig-{uuid.uuid4().hex[:12]}'
+    # "</" dentro de un <script> cerraría la etiqueta antes de tiempo
+    figura = figura_json(fig, arrays_tipados=True).replace('</', '<\\/')
+    configuracion = json.dumps(config or {'responsive': True})
+    return (
+        f'<div id="{div_id}" class="plotly-graph-div" style="width:100%;"></div>'
+        f'<script src="{url_plotlyjs}"></script>'
+        f'<script>(function(){{var f={figura};'
+        f'Plotly.newPlot("{div_id}",f.data,f.layout,{configuracion});}})();</script>'
+    )
@@ -0,0 +1,143 @@
+"""
+RENDER DE FIGURAS ESTÁTICAS EN UN POOL DE PROCESOS
+==================================================
+
+Los heatmaps de matplotlib/seaborn (`viz_2_heatmap_ods_ranking` y
+`viz_10_matriz_transicion`) se dibujan y rasterizan en procesos aislados:
+cada worker construye la figura con la API orientada a objetos de Agg y
+devuelve los bytes de la imagen. Varias sesiones pueden pedir heatmaps a la vez
+sin compartir el estado global de pyplot y sin bloquear el GIL del
+servidor.
+
+- `max_workers = 0` dibuja en el propio proceso (mismo resultado, sin pool).
+- Cada render tiene un tiempo máximo; al agotarse se terminan los
+  workers del pool (un worker colgado no libera su lugar con `cancel`).
+  Ese pool, o uno roto (p. ej. un worker muere), se recrea en la
+  siguiente petición.
+- Los bytes (PNG o WebP, codificados en memoria) se guardan en
+  `CACHE_FIGURAS` con la huella del DataFrame, así que repetir la petición
+  no vuelve a cruzar al pool.
+"""
+
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as TiempoAgotado
+from concurrent.futures.process import BrokenProcessPool
+
+from src.utils.instrumentacion import logger, medir_etapa
+from src.visualization.cache_figuras import CACHE_FIGURAS, huella_df
+from src.visualization.imagenes import DPI, FORMATO_IMAGEN, codificar_figura
+
+# Visualizaciones estáticas que se pueden delegar al pool
+VIZ_ESTATICAS = {
+    'viz_2': 'viz_2_heatmap_ods_ranking',
+    'viz_10': 'viz_10_matriz_transicion',
+}
+
+
+def _iniciar_worker():
+    os.environ['MPLBACKEND'] = 'Agg'
+    import matplotlib
+    matplotlib.use('Agg')
+
+
+def _precargar():
+    import src.visualization.visualizaciones_ods  # noqa: F401  (plotly, seaborn, estilos)
+    return os.getpid()
+
+
+def dibujar_imagen(viz_id, df, args, kwargs, dpi=DPI, formato=FORMATO_IMAGEN):
+    """Construye la figura `viz_id` y la devuelve codificada en `formato` (se ejecuta en el worker)."""
+    from src.visualization import visualizaciones_ods
+    funcion = getattr(visualizaciones_ods, VIZ_ESTATICAS[viz_id])
+    # Sin el cache de figuras del worker: el cache útil es el de bytes del proceso principal
+    fig = funcion.__wrapped__(df, *args, **kwargs)
+    return codificar_figura(fig, formato, dpi)
+
+
+class RenderizadorEstatico:
+
+    def __init__(self, max_workers=2, timeout_segundos=60.0, cache=None):
+        self.max_workers = max_workers
+        self.timeout_segundos = timeout_segundos
+        self.cache = cache or CACHE_FIGURAS
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def _executor(self):
+        with self._lock:
+            if self._pool is None:
+                # 'spawn': el servidor tiene hilos (Gradio, torch) y no es seguro hacer fork
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_iniciar_worker,
+                )
+            return self._pool
+
+    def _reiniciar(self, pool=None, terminar=False):
+        """
+        Descarta el pool actual (solo si sigue siendo `pool`, cuando se pasa:
+        otro hilo pudo haberlo recreado ya). Con `terminar` mata sus workers.
+        """
+        with self._lock:
+            if self._pool is None or (pool is not None and self._pool is not pool):
+                return
+            pool, self._pool = self._pool, None
+        # shutdown() suelta la referencia a los procesos: tomarlos antes
+        procesos = list((pool._processes or {}).values())
+        pool.shutdown(wait=False, cancel_futures=True)
+        if terminar:
+            for proceso in procesos:
+                proceso.terminate()
+
+    def calentar(self):
+        """Arranca los workers e importa las librerías de dibujo (evita el costo en la primera petición)."""
+        if self.max_workers <= 0:
+            return []
+        pool = self._executor()
+        futuros = [pool.submit(_precargar) for _ in range(self.max_workers)]
+        return sorted({f.result(timeout=self.timeout_segundos) for f in futuros})
+
+    def renderizar(self, viz_id, df, *args, dpi=DPI, formato=FORMATO_IMAGEN, **kwargs):
+        """
+        Imagen (bytes PNG o WebP) de la visualización `viz_id` para `df` y los
+        argumentos de la función viz (id_lvl, score, rank, titulo).
+        """
+        clave = (huella_df(df), f'{viz_id}_{formato}', (args, tuple(sorted(kwargs.items())), dpi))
+        if self.cache.activa:
+            imagen = self.cache.obtener(clave)
+            if imagen is not None:
+                return imagen
+
+        with medir_etapa('render_estatico'):
+            if self.max_workers <= 0:
+                imagen = dibujar_imagen(viz_id, df, args, kwargs, dpi, formato)
+            else:
+                pool = self._executor()
+                futuro = pool.submit(dibujar_imagen, viz_id, df, args, kwargs, dpi, formato)
+                try:
+                    imagen = futuro.result(timeout=self.timeout_segundos)
+                except TiempoAgotado:
+                    # El worker sigue ocupado con la tarea: terminarlo y recrear el pool
+                    self._reiniciar(pool, terminar=True)
+                    logger.warning('render estatico: tiempo agotado',
+                                   extra={'campos': {'viz': viz_id, 'timeout_s': self.timeout_segundos}})
+                    raise TimeoutError(f'El render de {viz_id} superó {self.timeout_segundos} s')
+                except BrokenProcessPool:
+                    self._reiniciar(pool)
+                    raise
+
+        if self.cache.activa:
+            self.cache.guardar(clave, imagen)
+        return imagen
+
+    def cerrar(self):
+        self._reiniciar()
+
+
+RENDER_ESTATICO = RenderizadorEstatico(
+    max_workers=int(os.environ.get('VOCES_ODS_RENDER_WORKERS', '2')),
+    timeout_segundos=float(os.environ.get('VOCES_ODS_RENDER_TIMEOUT', '60')),
+)
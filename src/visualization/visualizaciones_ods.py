@@ -15,45 +15,107 @@ import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
 from matplotlib.gridspec import GridSpec
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
 import plotly.graph_objects as go
 import plotly.express as px
 from plotly.subplots import make_subplots
 import warnings
 
+from src.utils.carga_resultados import FILAS_LOTE, cargar_resultados
+from src.visualization.cache_figuras import cachear_figura
+from src.visualization.agregados import obtener_agregados
+from src.visualization.estadisticas_online import estadisticas_por_lotes
+from src.visualization.figuras_rapidas import nueva_figura
+from src.visualization.muestreo import (
+    PRESUPUESTO_PUNTOS, requiere_muestreo, lttb, muestreo_voxel, etiqueta_muestreo
+)
+
 warnings.filterwarnings('ignore')
 
 # Configuración estética
 plt.style.use('seaborn-v0_8-darkgrid')
 sns.set_palette("husl")
 
+# Paleta por ODS y partes fijas del layout de las gráficas armadas con
+# `nueva_figura` (se construyen una vez; cada llamada solo añade título y datos)
+COLORES = px.colors.qualitative.Plotly
+
+LAYOUT_VIZ_1 = {
+    'yaxis': {'title': {'text': 'Similaridad Coseno'}},
+    'height': 600,
+    'showlegend': False,
+    'hovermode': 'x unified',
+}
+
+LAYOUT_VIZ_3 = {
+    'scene': {
+        'xaxis': {'title': {'text': 'ODS ID'}},
+        'yaxis': {'title': {'text': 'Número de Indicador'}},
+        'zaxis': {'title': {'text': 'Similaridad Coseno'}},
+        'camera': {'eye': {'x': 1.5, 'y': 1.5, 'z': 1.3}},
+    },
+    'height': 700,
+    'showlegend': True,
+}
+
+LAYOUT_VIZ_4 = {
+    'polar': {
+        'radialaxis': {
+            'visible': True,
+            'range': [0.85, 0.95],  # Ajustar según datos reales
+        }
+    },
+    'showlegend': True,
+    'height': 600,
+}
+
+LAYOUT_VIZ_7 = {
+    'title': {'text': 'Stream Graph: Contribución de cada ODS por Rango de Ranking<br><sub>Evolución de relevancia normalizada</sub>'},
+    'xaxis': {'title': {'text': 'Rango de Ranking (agrupado)'}},
+    'yaxis': {'title': {'text': 'Contribución Porcentual'}},
+    'height': 600,
+    'hovermode': 'x unified',
+}
+
+LAYOUT_VIZ_8 = {
+    'title': {'text': 'Violin Plot: Distribución de Densidad de Similaridad por ODS<br><sub>Análisis detallado de concentración de valores</sub>'},
+    'yaxis': {'title': {'text': 'Similaridad Coseno'}},
+    'xaxis': {'title': {'text': 'Objetivo de Desarrollo Sostenible'}},
+    'height': 600,
+    'showlegend': False,
+}
+
 # ============================================================================
 # 1. CARGA Y PREPARACIÓN DE DATOS
 # ============================================================================
 
-def cargar_datos(ruta_archivo):
+def cargar_datos(ruta_archivo, columnas=None, filas_lote=FILAS_LOTE):
     """
-    Carga los datos desde el archivo markdown y los convierte a DataFrame
+    Carga los datos (tabla markdown, CSV, Parquet o Arrow) por lotes y con
+    tipos compactos: IDs categóricos, scores float32 y ranks int32, con los
+    espacios de los textos ya eliminados (ver `src.utils.carga_resultados`)
     """
-    # Leer el archivo saltando la línea de separación
-    df = pd.read_csv(ruta_archivo, sep='|', skiprows=[1])
-    
-    # Limpiar columnas (eliminar espacios)
-    df.columns = df.columns.str.strip()
-    
-    # Eliminar columnas vacías (primera y última por el formato markdown)
-    df = df.drop(df.columns[[0, -1]], axis=1)
-    
-    # Limpiar espacios en valores de texto
-    for col in df.select_dtypes(include=['object']).columns:
-        df[col] = df[col].str.strip()
-    
-    return df
+    return cargar_resultados(ruta_archivo, columnas=columnas, filas_lote=filas_lote)
+
+
+def valores_planos(df, columnas):
+    """
+    Copia superficial de `df` con las columnas categóricas indicadas como
+    valores planos: plotly express agrupa por todas las categorías, también
+    las que no aparecen en los datos
+    """
+    categoricas = [c for c in dict.fromkeys(columnas) if isinstance(df[c].dtype, pd.CategoricalDtype)]
+    if not categoricas:
+        return df
+    return df.assign(**{c: df[c].to_numpy(dtype=df[c].cat.categories.dtype) for c in categoricas})
 
 
 # ============================================================================
 # 2. GRÁFICA 1: DISTRIBUCIÓN DE SIMILARIDAD POR ODS (Box Plot Interactivo)
 # ============================================================================
 
+@cachear_figura('viz_1')
 def viz_1_distribucion_por_ods(df, id_lvl, score, titulo):
     """
     LÓGICA: Esta visualización muestra la distribución de valores de similaridad
@@ -69,39 +131,36 @@ def viz_1_distribucion_por_ods(df, id_lvl, score, titulo):
     - Outliers superiores → Indicadores específicos muy relevantes
     """
     
-    fig = go.Figure()
+    trazas = []
     
     for idx, ods in enumerate(sorted(df['ODS_ID'].unique())):
         datos_ods = df[df['ODS_ID'] == ods][score]
         
-        fig.add_trace(go.Box(
+        trazas.append(dict(
+            type='box',
             y=datos_ods,
             name=f'ODS {ods}',
             boxmean='sd',  # Mostrar media y desviación estándar
-            marker_color=px.colors.qualitative.Plotly[int(ods) % len(px.colors.qualitative.Plotly)]
+            marker=dict(color=COLORES[int(ods) % len(COLORES)])
         ))
     
-    fig.update_layout(
-        title={
+    return nueva_figura(trazas, {
+        **LAYOUT_VIZ_1,
+        'title': {
             'text': f'Distribución de Similaridad Coseno por {titulo}<br><sub>Análisis de dispersión y tendencia central por objetivo</sub>',
             'x': 0.5,
             'xanchor': 'center'
         },
-        # xaxis_title='Objetivo de Desarrollo Sostenible',
-        xaxis_title=id_lvl,
-        yaxis_title='Similaridad Coseno',
-        height=600,
-        showlegend=False,
-        hovermode='x unified'
-    )
-    
-    return fig
+        # 'xaxis': {'title': {'text': 'Objetivo de Desarrollo Sostenible'}},
+        'xaxis': {'title': {'text': id_lvl}},
+    })
 
 
 # ============================================================================
 # 3. GRÁFICA 2: HEATMAP DE SIMILARIDAD (ODS vs Rango de Ranking)
 # ============================================================================
 
+@cachear_figura('viz_2')
 def viz_2_heatmap_ods_ranking(df, id_lvl, score, rank, titulo):
     """
     LÓGICA: Matriz de calor que muestra la intensidad de similaridad en función
@@ -118,25 +177,28 @@ def viz_2_heatmap_ods_ranking(df, id_lvl, score, rank, titulo):
     - Diagonal descendente → Comportamiento esperado (mayor rank → menor similaridad)
     """
     
-    # Crear deciles de ranking
-    df['rank_decil'] = pd.qcut(df[rank], q=10, labels=[f'D{i+1}' for i in range(10)])
+    agregados = obtener_agregados(df, id_lvl, score, rank)
     
-    # Crear matriz pivote
-    pivot_table = df.pivot_table(
-        values=score,
-        index=id_lvl,
-        columns='rank_decil',
-        aggfunc='mean'
+    # Matriz pivote: promedio por nivel y decil de ranking (sin añadir columnas a df);
+    # todos los deciles, pero solo los niveles presentes aunque el ID sea categórico
+    pivot_table = (
+        df[score]
+        .groupby([valores_planos(df, [id_lvl])[id_lvl], agregados.rank_decil], observed=False)
+        .mean()
+        .unstack('rank_decil')
     )
     
-    fig, ax = plt.subplots(figsize=(14, 8))
+    # API orientada a objetos (sin el estado global de pyplot): segura entre hilos
+    fig = Figure(figsize=(14, 8))
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
     
     sns.heatmap(
         pivot_table,
         annot=True,
         fmt='.3f',
         cmap='RdYlGn',
-        center=df[score].median(),
+        center=agregados.global_['50%'],
         cbar_kws={'label': 'Similaridad Coseno Promedio'},
         linewidths=0.5,
         ax=ax
@@ -151,7 +213,7 @@ def viz_2_heatmap_ods_ranking(df, id_lvl, score, rank, titulo):
     ax.set_xlabel('Decil de Ranking (D1=Top 10%, D10=Bottom 10%)', fontsize=12)
     ax.set_ylabel(id_lvl, fontsize=12)
     
-    plt.tight_layout()
+    fig.tight_layout()
     return fig
 
 
@@ -159,7 +221,8 @@ def viz_2_heatmap_ods_ranking(df, id_lvl, score, rank, titulo):
 # 4. GRÁFICA 3: SCATTER PLOT 3D (ODS, Indicador, Similaridad)
 # ============================================================================
 
-def viz_3_scatter_3d_interactivo(df, id_lvl, score, rank, titulo):
+@cachear_figura('viz_3')
+def viz_3_scatter_3d_interactivo(df, id_lvl, score, rank, titulo, max_puntos=None):
     """
     LÓGICA: Visualización tridimensional que permite explorar la relación
     entre tres variables:
@@ -174,19 +237,39 @@ def viz_3_scatter_3d_interactivo(df, id_lvl, score, rank, titulo):
     - Clusters verticales → Varios indicadores de un ODS son similares
     - Puntos grandes en altura → Indicadores relevantes y bien posicionados
     - Permite rotar e interactuar para descubrir patrones espaciales
-    """
     
-    # Extraer número de indicador
-    df['indicador_num'] = df[id_lvl].str.extract(r'\.(\d+)\.').astype(float)
-    
-    fig = go.Figure()
+    DATOS GRANDES: por encima de `max_puntos` (PRESUPUESTO_PUNTOS por
+    defecto) se dibuja una muestra por vóxeles de (ODS, indicador,
+    similaridad) que conserva la densidad y, en cada vóxel, los puntos
+    mejor rankeados; el subtítulo indica muestra/total.
+    """
     
-    for ods in sorted(df['ODS_ID'].unique()):
-        datos_ods = df[df['ODS_ID'] == ods]
+    # Número de indicador (Series aparte, df no se modifica)
+    indicador_num = obtener_agregados(df, id_lvl, score, rank).indicador_num
+    
+    subtitulo = 'Exploración espacial de patrones de relevancia'
+    datos = df
+    if requiere_muestreo(len(df), max_puntos):
+        presupuesto = PRESUPUESTO_PUNTOS if max_puntos is None else max_puntos
+        posiciones = muestreo_voxel(
+            np.column_stack([df['ODS_ID'], indicador_num, df[score]]),
+            presupuesto,
+            prioridad=df[rank].to_numpy()
+        )
+        datos = df.iloc[posiciones]
+        indicador_num = indicador_num.iloc[posiciones]
+        subtitulo += ' · muestra de ' + etiqueta_muestreo(len(datos), len(df))
+    
+    trazas = []
+    
+    for ods in sorted(datos['ODS_ID'].unique()):
+        filtro = datos['ODS_ID'] == ods
+        datos_ods = datos[filtro]
         
-        fig.add_trace(go.Scatter3d(
+        trazas.append(dict(
+            type='scatter3d',
             x=datos_ods['ODS_ID'],
-            y=datos_ods['indicador_num'],
+            y=indicador_num[filtro],
             z=datos_ods[score],
             mode='markers',
             name=f'ODS {ods}',
@@ -202,25 +285,17 @@ def viz_3_scatter_3d_interactivo(df, id_lvl, score, rank, titulo):
                           '<extra></extra>'
         ))
     
-    fig.update_layout(
-        title='Visualización 3D: ODS × Indicador × Similaridad<br><sub>Exploración espacial de patrones de relevancia</sub>',
-        scene=dict(
-            xaxis_title='ODS ID',
-            yaxis_title='Número de Indicador',
-            zaxis_title='Similaridad Coseno',
-            camera=dict(eye=dict(x=1.5, y=1.5, z=1.3))
-        ),
-        height=700,
-        showlegend=True
-    )
-    
-    return fig
+    return nueva_figura(trazas, {
+        **LAYOUT_VIZ_3,
+        'title': {'text': f'Visualización 3D: ODS × Indicador × Similaridad<br><sub>{subtitulo}</sub>'},
+    })
 
 
 # ============================================================================
 # 5. GRÁFICA 4: RADAR CHART - Similaridad Promedio por ODS
 # ============================================================================
 
+@cachear_figura('viz_4')
 def viz_4_radar_chart_ods(df, id_lvl, score, rank, titulo):
     """
     LÓGICA: Gráfico de radar (spider chart) que muestra la similaridad promedio
@@ -235,55 +310,45 @@ def viz_4_radar_chart_ods(df, id_lvl, score, rank, titulo):
     - Simetría → Iniciativa balanceada entre ODS vs. especializada
     """
     
-    # Calcular promedios por ODS
-    ods_stats = df.groupby(id_lvl).agg({
-        score: ['mean', 'max', 'count']
-    }).reset_index()
-    
+    # Promedios por ODS (estadísticos compartidos, ya ordenados por nivel)
+    ods_stats = obtener_agregados(df, id_lvl, score, rank).por_grupo[['mean', 'max', 'count']].reset_index()
     ods_stats.columns = [id_lvl, 'sim_promedio', 'sim_max', 'count_indicadores']
-    ods_stats = ods_stats.sort_values(id_lvl)
-    
-    fig = go.Figure()
-    
-    # Similaridad promedio
-    fig.add_trace(go.Scatterpolar(
-        r=ods_stats['sim_promedio'],
-        theta=['ODS ' + str(x) for x in ods_stats[id_lvl]],
-        fill='toself',
-        name='Similaridad Promedio',
-        line_color='blue',
-        fillcolor='rgba(0, 0, 255, 0.2)'
-    ))
-    
-    # Similaridad máxima
-    fig.add_trace(go.Scatterpolar(
-        r=ods_stats['sim_max'],
-        theta=['ODS ' + str(x) for x in ods_stats[id_lvl]],
-        fill='toself',
-        name='Similaridad Máxima',
-        line_color='red',
-        fillcolor='rgba(255, 0, 0, 0.1)'
-    ))
     
-    fig.update_layout(
-        polar=dict(
-            radialaxis=dict(
-                visible=True,
-                range=[0.85, 0.95]  # Ajustar según datos reales
-            )
+    theta = ['ODS ' + str(x) for x in ods_stats[id_lvl]]
+    trazas = [
+        # Similaridad promedio
+        dict(
+            type='scatterpolar',
+            r=ods_stats['sim_promedio'],
+            theta=theta,
+            fill='toself',
+            name='Similaridad Promedio',
+            line=dict(color='blue'),
+            fillcolor='rgba(0, 0, 255, 0.2)'
         ),
-        title=f'Radar Chart: Perfil de Similaridad por {titulo}<br><sub>Comparación de promedios y máximos</sub>',
-        showlegend=True,
-        height=600
-    )
+        # Similaridad máxima
+        dict(
+            type='scatterpolar',
+            r=ods_stats['sim_max'],
+            theta=theta,
+            fill='toself',
+            name='Similaridad Máxima',
+            line=dict(color='red'),
+            fillcolor='rgba(255, 0, 0, 0.1)'
+        ),
+    ]
     
-    return fig
+    return nueva_figura(trazas, {
+        **LAYOUT_VIZ_4,
+        'title': {'text': f'Radar Chart: Perfil de Similaridad por {titulo}<br><sub>Comparación de promedios y máximos</sub>'},
+    })
 
 
 # ============================================================================
 # 6. GRÁFICA 5: SUNBURST - Jerarquía ODS → Indicadores
 # ============================================================================
 
+@cachear_figura('viz_5')
 def viz_5_sunburst_jerarquia(df, id_lvl, score, rank, titulo):
     """
     LÓGICA: Diagrama de sunburst (sol radiante) que muestra la jerarquía
@@ -300,9 +365,12 @@ def viz_5_sunburst_jerarquia(df, id_lvl, score, rank, titulo):
     """
     
     # Preparar datos para sunburst
-    df_sun = df.copy()
+    df_sun = valores_planos(df, ['ODS_ID', id_lvl]).copy()
     df_sun['ods_label'] = 'ODS ' + df_sun['ODS_ID'].astype(str)
-    df_sun['path'] = df_sun['ods_label'] + ' / ' + df_sun[id_lvl]
+    df_sun['path'] = df_sun['ods_label'] + ' / ' + df_sun[id_lvl].astype(str)
+    # El score normalizado vale 0 en el último puesto: un tamaño mínimo evita
+    # sectores de peso total cero (px no puede promediar su color)
+    df_sun['tamano'] = df_sun[score].clip(lower=1e-6)
     
     # Limitar a top 100 para mejor visualización
     df_sun_top = df_sun.nsmallest(100, rank)
@@ -310,7 +378,7 @@ def viz_5_sunburst_jerarquia(df, id_lvl, score, rank, titulo):
     fig = px.sunburst(
         df_sun_top,
         path=['ods_label', id_lvl],
-        values=score,
+        values='tamano',
         color=score,
         color_continuous_scale='Viridis',
         hover_data=[rank],
@@ -329,6 +397,7 @@ def viz_5_sunburst_jerarquia(df, id_lvl, score, rank, titulo):
 # 7. GRÁFICA 6: CASCADA - Top Indicadores por ODS
 # ============================================================================
 
+@cachear_figura('viz_6')
 def viz_6_top_indicadores_por_ods(df, id_lvl, score, rank, titulo, top_n=3):
     """
     LÓGICA: Para cada ODS, muestra los top N indicadores con mayor similaridad
@@ -346,7 +415,7 @@ def viz_6_top_indicadores_por_ods(df, id_lvl, score, rank, titulo, top_n=3):
     """
     
     # Obtener top N por ODS
-    top_indicadores = df.groupby('ODS_ID').apply(
+    top_indicadores = valores_planos(df, ['ODS_ID', id_lvl]).groupby('ODS_ID').apply(
         lambda x: x.nsmallest(top_n, rank)
     ).reset_index(drop=True)
     
@@ -373,6 +442,7 @@ def viz_6_top_indicadores_por_ods(df, id_lvl, score, rank, titulo, top_n=3):
 # 8. GRÁFICA 7: STREAM GRAPH - Evolución de Similaridad
 # ============================================================================
 
+@cachear_figura('viz_7')
 def viz_7_streamgraph_similaridad(df, id_lvl, score, rank, titulo):
     """
     LÓGICA: Gráfico de área apilada que muestra cómo contribuye cada ODS
@@ -388,43 +458,42 @@ def viz_7_streamgraph_similaridad(df, id_lvl, score, rank, titulo):
     - Permite ver qué ODS domina en qué rangos de relevancia
     """
     
-    # Crear bins de ranking
-    df['rank_bin'] = pd.cut(df[rank], bins=20, labels=False)
+    # Bins de ranking (Series aparte, df no se modifica)
+    rank_bin = obtener_agregados(df, id_lvl, score, rank).rank_bin
     
     # Agrupar por rank_bin y ODS
-    stream_data = df.groupby(['rank_bin', id_lvl])[score].sum().reset_index()
+    stream_data = df[score].groupby([rank_bin, df[id_lvl]], observed=True).sum().reset_index()
     
     # Pivotar para streamgraph
     stream_pivot = stream_data.pivot(index='rank_bin', columns=id_lvl, values=score).fillna(0)
-    
-    fig = go.Figure()
-    
-    for ods in stream_pivot.columns:
-        fig.add_trace(go.Scatter(
-            x=stream_pivot.index,
-            y=stream_pivot[ods],
+
+    # Una traza por columna (miles a nivel INDICADOR): arrays de numpy en
+    # lugar de una Series por columna del índice categórico
+    x = stream_pivot.index.to_numpy()
+    y = np.ascontiguousarray(stream_pivot.to_numpy().T)
+
+    trazas = [
+        dict(
+            type='scatter',
+            x=x,
+            y=y[i],
             mode='lines',
             name=f'ODS {ods}',
             stackgroup='one',
             groupnorm='percent',  # Normalizar a porcentaje
             hovertemplate='ODS %{fullData.name}<br>Contribución: %{y:.1f}%<extra></extra>'
-        ))
-    
-    fig.update_layout(
-        title='Stream Graph: Contribución de cada ODS por Rango de Ranking<br><sub>Evolución de relevancia normalizada</sub>',
-        xaxis_title='Rango de Ranking (agrupado)',
-        yaxis_title='Contribución Porcentual',
-        height=600,
-        hovermode='x unified'
-    )
+        )
+        for i, ods in enumerate(stream_pivot.columns)
+    ]
     
-    return fig
+    return nueva_figura(trazas, LAYOUT_VIZ_7)
 
 
 # ============================================================================
 # 9. GRÁFICA 8: VIOLIN PLOT - Comparación Detallada de Distribuciones
 # ============================================================================
 
+@cachear_figura('viz_8')
 def viz_8_violin_plot_ods(df, id_lvl, score, rank, titulo):
     """
     LÓGICA: Similar al box plot pero muestra la distribución completa de
@@ -440,37 +509,31 @@ def viz_8_violin_plot_ods(df, id_lvl, score, rank, titulo):
     - Permite ver distribuciones no normales que el box plot no captura
     """
     
-    fig = go.Figure()
+    trazas = []
     
     for ods in sorted(df[id_lvl].unique()):
         datos_ods = df[df[id_lvl] == ods][score]
         
-        fig.add_trace(go.Violin(
+        trazas.append(dict(
+            type='violin',
             y=datos_ods,
             name=f'ODS {ods}',
-            box_visible=True,
-            meanline_visible=True,
-            fillcolor=px.colors.qualitative.Plotly[int(ods) % len(px.colors.qualitative.Plotly)],
+            box=dict(visible=True),
+            meanline=dict(visible=True),
+            fillcolor=COLORES[int(ods) % len(COLORES)],
             opacity=0.6,
             x0=f'ODS {ods}'
         ))
     
-    fig.update_layout(
-        title='Violin Plot: Distribución de Densidad de Similaridad por ODS<br><sub>Análisis detallado de concentración de valores</sub>',
-        yaxis_title='Similaridad Coseno',
-        xaxis_title='Objetivo de Desarrollo Sostenible',
-        height=600,
-        showlegend=False
-    )
-    
-    return fig
+    return nueva_figura(trazas, LAYOUT_VIZ_8)
 
 
 # ============================================================================
 # 10. GRÁFICA 9: DASHBOARD INTEGRADO - Métricas Clave
 # ============================================================================
 
-def viz_9_dashboard_metricas(df, id_lvl, score, rank, titulo):
+@cachear_figura('viz_9')
+def viz_9_dashboard_metricas(df, id_lvl, score, rank, titulo, max_puntos=None):
     """
     LÓGICA: Dashboard con múltiples paneles que resume las métricas clave:
     - Panel 1: Top 10 indicadores con mayor similaridad
@@ -483,15 +546,33 @@ def viz_9_dashboard_metricas(df, id_lvl, score, rank, titulo):
     - Permite validar que el ranking está bien correlacionado con similaridad
     - Identifica outliers o problemas en el cálculo
     - Facilita comunicación de resultados a stakeholders
+    
+    DATOS GRANDES: por encima de `max_puntos` (PRESUPUESTO_PUNTOS por
+    defecto) el panel 4 usa WebGL (Scattergl) y una muestra LTTB de la
+    curva rank vs similaridad (el título del panel indica muestra/total),
+    y el histograma se agrega en el servidor.
     """
     
+    agregados = obtener_agregados(df, id_lvl, score, rank)
+    
+    # Puntos del panel 4 (todos, o una muestra LTTB ordenada por rank)
+    titulo_panel_4 = 'Correlación: Rank vs Similaridad'
+    datos_scatter, Scatter = df, go.Scatter
+    muestreado = requiere_muestreo(len(df), max_puntos)
+    if muestreado:
+        presupuesto = PRESUPUESTO_PUNTOS if max_puntos is None else max_puntos
+        orden = np.argsort(df[rank].to_numpy(), kind='stable')
+        posiciones = lttb(df[rank].to_numpy()[orden], df[score].to_numpy()[orden], presupuesto)
+        datos_scatter, Scatter = df.iloc[orden[posiciones]], go.Scattergl
+        titulo_panel_4 += f'<br><sup>{etiqueta_muestreo(len(datos_scatter), len(df))}</sup>'
+    
     fig = make_subplots(
         rows=2, cols=2,
         subplot_titles=(
             'Top 10 Indicadores por Similaridad',
             'Estadísticas por ODS',
             'Distribución Global de Similaridad',
-            'Correlación: Rank vs Similaridad'
+            titulo_panel_4
         ),
         specs=[
             [{"type": "bar"}, {"type": "table"}],
@@ -500,11 +581,11 @@ def viz_9_dashboard_metricas(df, id_lvl, score, rank, titulo):
     )
     
     # Panel 1: Top 10
-    top_10 = df.nsmallest(10, rank)
+    top_10 = agregados.top.head(10)
     fig.add_trace(
         go.Bar(
             x=top_10[score],
-            y=top_10['indicador_id'],
+            y=top_10[id_lvl].astype(str),
             orientation='h',
             marker_color='lightblue',
             text=top_10[score].round(4),
@@ -514,7 +595,7 @@ def viz_9_dashboard_metricas(df, id_lvl, score, rank, titulo):
     )
     
     # Panel 2: Tabla de estadísticas
-    stats_ods = df.groupby(id_lvl)[score].agg(['mean', 'std', 'min', 'max', 'count']).reset_index()
+    stats_ods = agregados.por_grupo[['mean', 'std', 'min', 'max', 'count']].reset_index()
     stats_ods.columns = ['ODS', 'Media', 'Std', 'Min', 'Max', 'Count']
     stats_ods = stats_ods.round(4)
     
@@ -530,42 +611,49 @@ def viz_9_dashboard_metricas(df, id_lvl, score, rank, titulo):
         row=1, col=2
     )
     
-    # Panel 3: Histograma
-    fig.add_trace(
-        go.Histogram(
+    # Panel 3: Histograma (con datos grandes se envían las 30 barras, no los valores)
+    if muestreado:
+        frecuencias, bordes = np.histogram(df[score], bins=30)
+        histograma = go.Bar(
+            x=(bordes[:-1] + bordes[1:]) / 2,
+            y=frecuencias,
+            width=np.diff(bordes),
+            marker_color='indianred',
+            name='Distribución'
+        )
+    else:
+        histograma = go.Histogram(
             x=df[score],
             nbinsx=30,
             marker_color='indianred',
             name='Distribución'
-        ),
-        row=2, col=1
-    )
+        )
+    fig.add_trace(histograma, row=2, col=1)
     
     # Panel 4: Scatter rank vs similaridad
     fig.add_trace(
-        go.Scatter(
-            x=df[rank],
-            y=df[score],
+        Scatter(
+            x=datos_scatter[rank],
+            y=datos_scatter[score],
             mode='markers',
             marker=dict(
                 size=5,
-                color=df[id_lvl],
+                color=datos_scatter['ODS_ID'],
                 colorscale='Viridis',
                 showscale=True,
                 colorbar=dict(title="ODS", x=1.15)
             ),
-            text=df['indicador_id']
+            text=datos_scatter[id_lvl]
         ),
         row=2, col=2
     )
     
     # Añadir línea de tendencia
-    z = np.polyfit(df[rank], df[score], 1)
-    p = np.poly1d(z)
+    p = agregados.tendencia
     fig.add_trace(
-        go.Scatter(
-            x=df[rank],
-            y=p(df[rank]),
+        Scatter(
+            x=datos_scatter[rank],
+            y=p(datos_scatter[rank]),
             mode='lines',
             line=dict(color='red', dash='dash'),
             name='Tendencia'
@@ -594,6 +682,7 @@ def viz_9_dashboard_metricas(df, id_lvl, score, rank, titulo):
 # 11. GRÁFICA 10: MATRIZ DE TRANSICIÓN - Cambios de ODS por Ranking
 # ============================================================================
 
+@cachear_figura('viz_10')
 def viz_10_matriz_transicion(df, id_lvl, score, rank, titulo):
     """
     LÓGICA: Muestra cómo cambia el ODS dominante a medida que avanzamos
@@ -608,13 +697,15 @@ def viz_10_matriz_transicion(df, id_lvl, score, rank, titulo):
     - Ayuda a explicar por qué ciertos ODS aparecen más arriba
     """
     
-    # Crear cuartiles
-    df['cuartil'] = pd.qcut(df[rank], q=4, labels=['Q1 (Top)', 'Q2', 'Q3', 'Q4 (Bottom)'])
+    # Cuartiles de ranking (Series aparte, df no se modifica)
+    cuartil = obtener_agregados(df, id_lvl, score, rank).cuartil
     
     # Contar presencia de ODS por cuartil
-    matriz = pd.crosstab(df[id_lvl], df['cuartil'], normalize='columns') * 100
+    matriz = pd.crosstab(df[id_lvl], cuartil, normalize='columns') * 100
     
-    fig, ax = plt.subplots(figsize=(12, 8))
+    fig = Figure(figsize=(12, 8))
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
     
     sns.heatmap(
         matriz,
@@ -635,7 +726,7 @@ def viz_10_matriz_transicion(df, id_lvl, score, rank, titulo):
     ax.set_xlabel('Cuartil de Ranking', fontsize=12)
     ax.set_ylabel('ODS ID', fontsize=12)
     
-    plt.tight_layout()
+    fig.tight_layout()
     return fig
 
 
@@ -750,41 +841,54 @@ def generar_todas_visualizaciones(ruta_archivo, guardar=True, formato='html'):
 # 13. ANÁLISIS ESTADÍSTICO COMPLEMENTARIO
 # ============================================================================
 
-def analisis_estadistico(df):
+def analisis_estadistico(df, id_lvl='ODS_ID', score='ods_similaridad_cos', rank='ods_rank'):
     """
     Genera estadísticas descriptivas complementarias para el análisis
+    (a partir de los agregados compartidos con las visualizaciones)
+    """
+    agregados = obtener_agregados(df, id_lvl, score, rank)
+    return imprimir_analisis(agregados, id_lvl)
+
+
+def analisis_estadistico_online(lotes, id_lvl='ODS_ID', score='ods_similaridad_cos', rank='ods_rank'):
     """
+    Mismo análisis que `analisis_estadistico` para resultados que no caben
+    en memoria: `lotes` es un iterable de DataFrames (p. ej. los lotes de
+    `clasificar_lote`) o la ruta de un Parquet / directorio de particiones.
+    Los cuartiles son aproximados (sketch KLL).
+    """
+    agregados = estadisticas_por_lotes(lotes, id_lvl, score, rank)
+    return imprimir_analisis(agregados, id_lvl)
+
+
+def imprimir_analisis(agregados, id_lvl):
+    """Imprime el reporte a partir de `Agregados` o `EstadisticasOnline`"""
     print("\n" + "="*70)
     print("ANÁLISIS ESTADÍSTICO COMPLEMENTARIO")
     print("="*70)
     
     print("\n1. ESTADÍSTICAS GLOBALES")
     print("-" * 70)
-    print(f"   Similaridad media: {df[score].mean():.4f}")
-    print(f"   Desviación estándar: {df[score].std():.4f}")
-    print(f"   Similaridad mínima: {df[score].min():.4f}")
-    print(f"   Similaridad máxima: {df[score].max():.4f}")
-    print(f"   Mediana: {df[score].median():.4f}")
+    print(f"   Similaridad media: {agregados.global_['mean']:.4f}")
+    print(f"   Desviación estándar: {agregados.global_['std']:.4f}")
+    print(f"   Similaridad mínima: {agregados.global_['min']:.4f}")
+    print(f"   Similaridad máxima: {agregados.global_['max']:.4f}")
+    print(f"   Mediana: {agregados.global_['50%']:.4f}")
     
     print("\n2. ESTADÍSTICAS POR ODS")
     print("-" * 70)
-    stats_ods = df.groupby(id_lvl)[score].agg([
-        ('count', 'count'),
-        ('mean', 'mean'),
-        ('std', 'std'),
-        ('min', 'min'),
-        ('max', 'max')
-    ]).round(4)
+    stats_ods = agregados.por_grupo.round(4)
     print(stats_ods.to_string())
     
     print("\n3. ODS MÁS REPRESENTADOS EN TOP 50")
     print("-" * 70)
-    top_50_ods = df.nsmallest(50, rank)[id_lvl].value_counts()
+    # IDs categóricos: value_counts incluiría las categorías no observadas con 0
+    top_50_ods = agregados.top[id_lvl].value_counts()[lambda conteos: conteos > 0]
     print(top_50_ods.to_string())
     
     print("\n4. CORRELACIÓN RANK vs SIMILARIDAD")
     print("-" * 70)
-    correlacion = df[rank].corr(df[score])
+    correlacion = agregados.correlacion
     print(f"   Correlación de Pearson: {correlacion:.4f}")
     print(f"   Interpretación: {'Negativa fuerte' if correlacion < -0.7 else 'Negativa moderada' if correlacion < -0.4 else 'Negativa débil'}")
     print(f"   (Esperado: correlación negativa, a mayor rank → menor similaridad)")